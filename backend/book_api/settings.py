@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import tempfile
 from datetime import timedelta
 from pathlib import Path
 from decouple import config
@@ -51,6 +52,7 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
     "storages",
     "bookapp",
     "rest_framework",
@@ -188,9 +190,44 @@ MEDIA_ROOT = BASE_DIR / "media"
 
 # EPUB File Upload Configuration
 MAX_EPUB_FILE_SIZE = 50 * 1024 * 1024  # 50MB in bytes
+MAX_EPUB_UNCOMPRESSED_SIZE = 256 * 1024 * 1024  # Total decompressed-bytes budget
+MAX_EPUB_ENTRIES = 10000
+MAX_EPUB_COMPRESSION_RATIO = 100
 ALLOWED_EPUB_EXTENSIONS = ['.epub']
 EPUB_UPLOAD_DIR = 'epub_files/'
 
+# HTML extraction backend for EPUB chapters: 'html.parser', 'lxml' or 'stream'
+# (compare them with `python manage.py benchmark_html_extraction`)
+EPUB_HTML_EXTRACTION_BACKEND = config('EPUB_HTML_EXTRACTION_BACKEND', default='html.parser')
+
+# Extract the chapters of large EPUB books in a pool of this many processes
+# (below 2 keeps extraction serial); books whose spine documents total fewer
+# bytes than the threshold are always extracted serially
+EPUB_PARALLEL_EXTRACTION_WORKERS = config('EPUB_PARALLEL_EXTRACTION_WORKERS', default=0, cast=int)
+EPUB_PARALLEL_EXTRACTION_MIN_BYTES = config('EPUB_PARALLEL_EXTRACTION_MIN_BYTES', default=8 * 1024 * 1024, cast=int)
+
+# Per-process LRU cache of parsed EPUB files (approximate memory budget in bytes)
+EPUB_HANDLER_CACHE_MAX_BYTES = config('EPUB_HANDLER_CACHE_MAX_BYTES', default=256 * 1024 * 1024, cast=int)
+
+# Cache lifetimes (seconds) for chapter and TOC responses of public books:
+# browsers / shared caches such as a CDN. Responses carry ETag and Last-Modified.
+BOOK_CONTENT_CACHE_MAX_AGE = config('BOOK_CONTENT_CACHE_MAX_AGE', default=300, cast=int)
+BOOK_CONTENT_CDN_MAX_AGE = config('BOOK_CONTENT_CDN_MAX_AGE', default=3600, cast=int)
+# Same for images, stylesheets and fonts served from inside EPUB files
+BOOK_RESOURCE_CACHE_MAX_AGE = config('BOOK_RESOURCE_CACHE_MAX_AGE', default=86400, cast=int)
+
+# Characters per segment when a chapter is requested with ?segment=N
+CHAPTER_SEGMENT_SIZE = config('CHAPTER_SEGMENT_SIZE', default=20000, cast=int)
+
+# Node-local disk cache of EPUB files downloaded from S3/MinIO, shared by all
+# workers on the host (size limit in bytes, 0 disables it)
+EPUB_DISK_CACHE_DIR = config('EPUB_DISK_CACHE_DIR', default=str(Path(tempfile.gettempdir()) / 'book_club_epub_cache'))
+EPUB_DISK_CACHE_MAX_BYTES = config('EPUB_DISK_CACHE_MAX_BYTES', default=2 * 1024 * 1024 * 1024, cast=int)
+
+# Process uploaded EPUB files in `python manage.py run_ingest_worker` instead of
+# inside the upload request
+EPUB_BACKGROUND_INGESTION = config('EPUB_BACKGROUND_INGESTION', default=False, cast=bool)
+
 # File Upload Size Limits
 DATA_UPLOAD_MAX_MEMORY_SIZE = 52428800  # 50MB
 FILE_UPLOAD_MAX_MEMORY_SIZE = 52428800  # 50MB
@@ -204,7 +241,7 @@ AUTH_USER_MODEL = "bookapp.CustomUser"
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
         "rest_framework_simplejwt.authentication.JWTAuthentication",
-    )
+    ),
 }
 
 SIMPLE_JWT = {
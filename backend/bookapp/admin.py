@@ -1,11 +1,17 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
+from django.urls import reverse
+from django.utils.html import format_html_join
+from django.utils.safestring import mark_safe
 from django.utils.translation import gettext_lazy as _
 
+from .duplicates import find_possible_duplicates
 from .models import (
     Book,
+    BookChapter,
     BookComment,
     CustomUser,
+    EpubIngestJob,
     Hashtag,
     Notification,
     PrizeBoard,
@@ -94,11 +100,43 @@ class BookAdmin(admin.ModelAdmin):
         "created_at",
         "description",
     )
+    readonly_fields = ("possible_duplicates",)
+
+    @admin.display(description="Возможные дубликаты")
+    def possible_duplicates(self, obj):
+        duplicates = find_possible_duplicates(obj) if obj.pk else []
+        if not duplicates:
+            return "—"
+        return format_html_join(
+            mark_safe("<br>"),
+            '<a href="{}">{}</a> ({}%)',
+            (
+                (reverse("admin:bookapp_book_change", args=[other.pk]), other.title, round(similarity * 100))
+                for other, similarity in duplicates
+            ),
+        )
 
 
 admin.site.register(Book, BookAdmin)
 
 
+class BookChapterAdmin(admin.ModelAdmin):
+    list_display = ("book", "index", "title", "file_name")
+    search_fields = ("book__title", "title")
+
+
+admin.site.register(BookChapter, BookChapterAdmin)
+
+
+class EpubIngestJobAdmin(admin.ModelAdmin):
+    list_display = ("book", "status", "stage", "progress", "attempts", "created_at", "finished_at")
+    list_filter = ("status",)
+    search_fields = ("book__title", "error")
+
+
+admin.site.register(EpubIngestJob, EpubIngestJobAdmin)
+
+
 class HashtagAdmin(admin.ModelAdmin):
     list_display = ("name",)
     search_fields = ("name",)
@@ -0,0 +1,223 @@
+"""
+Trimmed and pre-compressed chapter responses.
+
+`get_book_chapter` can return only the HTML or only the plain text of a
+chapter, optionally split into segments of about CHAPTER_SEGMENT_SIZE
+characters. Rendered JSON bodies are compressed once per variant and
+encoding and stored in BookChapterBody next to the chapter, so repeated page
+turns are served without re-rendering or re-compressing.
+"""
+
+import gzip
+import logging
+from typing import Dict, List, Optional
+
+from bs4 import BeautifulSoup
+from django.conf import settings
+
+from .models import BookChapter, BookChapterBody
+
+try:
+    import brotli
+except ImportError:  # Optional: gzip only
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+CHAPTER_FORMATS = ("both", "html", "text")
+
+DEFAULT_SEGMENT_SIZE = 20000
+
+
+def get_segment_size() -> int:
+    """Characters per chapter segment (CHAPTER_SEGMENT_SIZE setting)."""
+    return getattr(settings, "CHAPTER_SEGMENT_SIZE", DEFAULT_SEGMENT_SIZE)
+
+
+def _pack(pieces: List[str], size: int, separator: str) -> List[str]:
+    """Greedily join pieces into segments of at most `size` characters."""
+    segments = []
+    current = []
+    current_size = 0
+
+    for piece in pieces:
+        added = len(piece) + (len(separator) if current else 0)
+        if current and current_size + added > size:
+            segments.append(separator.join(current))
+            current = []
+            current_size = 0
+            added = len(piece)
+        current.append(piece)
+        current_size += added
+
+    if current:
+        segments.append(separator.join(current))
+    return segments or [""]
+
+
+def split_text_segments(text: str, size: int) -> List[str]:
+    """
+    Split plain text into segments at line boundaries.
+
+    Lines longer than a segment are cut at `size` characters.
+
+    Args:
+        text: Chapter text
+        size: Maximum segment length in characters
+
+    Returns:
+        List of segments (at least one)
+    """
+    lines = []
+    for line in text.split("\n"):
+        while len(line) > size:
+            lines.append(line[:size])
+            line = line[size:]
+        lines.append(line)
+    return _pack(lines, size, "\n")
+
+
+def split_html_segments(html_content: str, size: int) -> List[str]:
+    """
+    Split chapter HTML into segments between top-level body elements.
+
+    Every segment is a well-formed body fragment; an element larger than a
+    segment is kept whole.
+
+    Args:
+        html_content: Sanitized chapter HTML
+        size: Target segment length in characters
+
+    Returns:
+        List of HTML fragments (at least one)
+    """
+    soup = BeautifulSoup(html_content, "html.parser")
+    container = soup.body or soup
+    pieces = [str(node) for node in container.children if str(node).strip()]
+    return _pack(pieces, size, "\n")
+
+
+def build_chapter_payload(chapter: Dict, fmt: str = "both", segment: Optional[int] = None) -> Dict:
+    """
+    Select the requested representation of a chapter.
+
+    Args:
+        chapter: Chapter dictionary as returned by EPUBHandler.get_chapters()
+        fmt: 'html', 'text' or 'both'
+        segment: Segment number (0-based) for 'html' or 'text', or None for
+            the whole chapter
+
+    Returns:
+        Chapter dictionary without the unused field; segmented responses get
+        'segment' and 'total_segments'
+
+    Raises:
+        IndexError: If the segment does not exist
+    """
+    payload = {key: chapter[key] for key in ("id", "title", "file_name")}
+    field = {"html": "html_content", "text": "content"}.get(fmt)
+
+    if field is None:
+        payload["content"] = chapter["content"]
+        payload["html_content"] = chapter["html_content"]
+        return payload
+
+    if segment is None:
+        payload[field] = chapter[field]
+        return payload
+
+    if fmt == "html":
+        segments = split_html_segments(chapter[field], get_segment_size())
+    else:
+        segments = split_text_segments(chapter[field], get_segment_size())
+
+    if segment >= len(segments):
+        raise IndexError(f"Segment {segment} out of range ({len(segments)} segments)")
+
+    payload[field] = segments[segment]
+    payload["segment"] = segment
+    payload["total_segments"] = len(segments)
+    return payload
+
+
+def chapter_variant(fmt: str, segment: Optional[int]) -> str:
+    """Key identifying one representation of a chapter."""
+    return f"{fmt}:{'' if segment is None else segment}"
+
+
+def available_encodings() -> List[str]:
+    """Content codings we can produce, most preferred first."""
+    return ["br", "gzip"] if brotli is not None else ["gzip"]
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """
+    Pick the best supported content coding accepted by the client.
+
+    Args:
+        accept_encoding: Value of the Accept-Encoding header
+
+    Returns:
+        'br', 'gzip' or None for an uncompressed response
+    """
+    accepted = set()
+    for part in (accept_encoding or "").split(","):
+        coding, _, params = part.strip().partition(";")
+        params = params.replace(" ", "")
+        if coding and params not in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            accepted.add(coding.lower())
+
+    for encoding in available_encodings():
+        if encoding in accepted or "*" in accepted:
+            return encoding
+    return None
+
+
+def compress_body(body: bytes, encoding: str) -> bytes:
+    """Compress a response body with 'br' or 'gzip'."""
+    if encoding == "br":
+        return brotli.compress(body, quality=9)
+    return gzip.compress(body, compresslevel=6, mtime=0)
+
+
+def get_stored_body(book, index: int, variant: str, encoding: str, etag: str) -> Optional[bytes]:
+    """
+    Fetch a stored compressed chapter body.
+
+    Args:
+        book: Book the chapter belongs to
+        index: Chapter index
+        variant: Value from chapter_variant()
+        encoding: 'br' or 'gzip'
+        etag: ETag of the response; bodies stored for an older one are ignored
+
+    Returns:
+        Compressed body or None
+    """
+    body = BookChapterBody.objects.filter(
+        chapter__book=book,
+        chapter__index=index,
+        variant=variant,
+        encoding=encoding,
+        etag=etag,
+    ).values_list("body", flat=True).first()
+    return bytes(body) if body is not None else None
+
+
+def store_body(chapter: BookChapter, variant: str, encoding: str, etag: str, body: bytes) -> None:
+    """
+    Store a compressed chapter body, replacing one stored for an older ETag.
+
+    Args:
+        chapter: Stored chapter row
+        variant: Value from chapter_variant()
+        encoding: 'br' or 'gzip'
+        etag: ETag of the response the body belongs to
+        body: Compressed body
+    """
+    BookChapterBody.objects.update_or_create(
+        chapter=chapter,
+        variant=variant,
+        encoding=encoding,
+        defaults={"etag": etag, "body": body},
+    )
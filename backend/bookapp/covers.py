@@ -0,0 +1,223 @@
+"""
+Book cover extraction and resized variants.
+
+EPUB books without an uploaded image get the cover embedded in the archive.
+Every featured image is resized with Pillow into card, detail and retina
+widths, each encoded as WebP and JPEG, so listings can load a few kilobytes
+per card instead of the original upload. Variant file names are kept in
+`Book.featured_image_variants`.
+"""
+
+import logging
+import posixpath
+from io import BytesIO
+from typing import Dict, Optional, Tuple
+
+from django.core.files.base import ContentFile
+from django.db import transaction
+from PIL import Image, ImageOps
+
+from .epub_handler import EPUBPackage
+from .models import Book
+
+logger = logging.getLogger(__name__)
+
+# Variant name -> target width in pixels; *_2x are for high-density screens
+COVER_VARIANT_WIDTHS = {
+    "card": 300,
+    "card_2x": 600,
+    "detail": 280,
+    "detail_2x": 560,
+}
+
+# Encoded formats: variant key -> (Pillow format, file extension, save options)
+COVER_FORMATS = {
+    "webp": ("WEBP", "webp", {"quality": 80, "method": 4}),
+    "jpeg": ("JPEG", "jpg", {"quality": 82, "optimize": True, "progressive": True}),
+}
+
+# Embedded covers larger than this are ignored
+MAX_COVER_BYTES = 20 * 1024 * 1024
+
+# Raster formats accepted as embedded covers (SVG covers are skipped)
+COVER_MEDIA_TYPES = {"image/jpeg", "image/png", "image/gif", "image/webp"}
+
+
+def extract_epub_cover(epub_path: str) -> Optional[Tuple[bytes, str]]:
+    """
+    Read the cover image of an EPUB file.
+
+    Args:
+        epub_path: Path to the EPUB file
+
+    Returns:
+        Tuple of (image bytes, file name inside the archive), or None if the
+        book has no usable cover
+    """
+    try:
+        package = EPUBPackage(epub_path)
+    except ValueError as e:
+        logger.warning(f"Cannot open EPUB for cover extraction: {e}")
+        return None
+
+    try:
+        item = package.cover_item()
+        if item is None or item["media_type"] not in COVER_MEDIA_TYPES:
+            return None
+        if package.item_size(item) > MAX_COVER_BYTES:
+            return None
+        return package.read_item(item), posixpath.basename(item["href"])
+    except KeyError:
+        # Manifest entry without a file in the archive
+        return None
+    finally:
+        package.close()
+
+
+def _encode_variant(image: Image.Image, image_format: str, options: Dict) -> bytes:
+    """Encode an image, flattening transparency onto white for JPEG."""
+    if image_format == "JPEG" and image.mode != "RGB":
+        background = Image.new("RGB", image.size, (255, 255, 255))
+        if image.mode in ("RGBA", "LA"):
+            background.paste(image, mask=image.getchannel("A"))
+        else:
+            background.paste(image.convert("RGB"))
+        image = background
+
+    output = BytesIO()
+    image.save(output, image_format, **options)
+    return output.getvalue()
+
+
+def build_image_variants(image_file, source_name: str, storage) -> Dict:
+    """
+    Resize an image into every cover variant and store the results.
+
+    Images are never upscaled.
+
+    Args:
+        image_file: Binary file object with the original image
+        source_name: Storage name of the original, used to name the variants
+        storage: Storage the variants are saved to
+
+    Returns:
+        Variants dictionary as kept in Book.featured_image_variants:
+        {"source": source_name, "card": {"width", "height", "webp", "jpeg"}, ...}
+    """
+    with Image.open(image_file) as original:
+        original = ImageOps.exif_transpose(original)
+        if original.mode not in ("RGB", "RGBA"):
+            original = original.convert("RGBA" if "transparency" in original.info else "RGB")
+
+        stem = posixpath.splitext(posixpath.basename(source_name))[0]
+        variants = {"source": source_name}
+
+        for variant, width in COVER_VARIANT_WIDTHS.items():
+            width = min(width, original.width)
+            height = max(1, round(original.height * width / original.width))
+            resized = original.resize((width, height), Image.LANCZOS)
+
+            entry = {"width": width, "height": height}
+            for key, (image_format, extension, options) in COVER_FORMATS.items():
+                name = f"book_img/variants/{stem}_{variant}.{extension}"
+                entry[key] = storage.save(name, ContentFile(_encode_variant(resized, image_format, options)))
+            variants[variant] = entry
+
+    return variants
+
+
+def delete_image_variants(variants: Optional[Dict], storage) -> None:
+    """Delete the stored files of a variants dictionary."""
+    for variant in COVER_VARIANT_WIDTHS:
+        entry = (variants or {}).get(variant) or {}
+        for key in COVER_FORMATS:
+            if entry.get(key):
+                storage.delete(entry[key])
+
+
+def refresh_cover_variants(book: Book) -> bool:
+    """
+    Regenerate the variants of a book's featured image if it changed.
+
+    Args:
+        book: Saved Book instance
+
+    Returns:
+        True if the stored variants were replaced
+    """
+    source_name = book.featured_image.name if book.featured_image else ""
+    current = book.featured_image_variants or {}
+    if current.get("source", "") == source_name:
+        return False
+
+    storage = book.featured_image.storage
+    variants = {}
+    if source_name:
+        try:
+            with book.featured_image.open("rb") as image_file:
+                variants = build_image_variants(image_file, source_name, storage)
+        except (OSError, Image.DecompressionBombError) as e:
+            # Unreadable image: keep serving the original only
+            logger.warning(f"Cannot build cover variants for book {book.id}: {e}")
+            variants = {"source": source_name}
+
+    # Old files go only once the new variants are committed
+    transaction.on_commit(lambda: delete_image_variants(current, storage))
+    Book.objects.filter(pk=book.pk).update(featured_image_variants=variants)
+    book.featured_image_variants = variants
+    return True
+
+
+def attach_epub_cover(book: Book, epub_path: str) -> bool:
+    """
+    Use the cover embedded in an EPUB file as the book's featured image.
+
+    Books that already have an image keep it.
+
+    Args:
+        book: Saved Book instance
+        epub_path: Path to the book's EPUB file
+
+    Returns:
+        True if a cover was attached
+    """
+    if book.featured_image:
+        return False
+
+    cover = extract_epub_cover(epub_path)
+    if cover is None:
+        return False
+
+    data, file_name = cover
+    book.featured_image.save(file_name, ContentFile(data), save=False)
+    Book.objects.filter(pk=book.pk).update(featured_image=book.featured_image.name)
+    refresh_cover_variants(book)
+    logger.info(f"Attached EPUB cover to book '{book.title}' (ID: {book.id})")
+    return True
+
+
+def cover_variant_urls(book: Book) -> Optional[Dict]:
+    """
+    Get the URLs of a book's cover variants for API responses.
+
+    Args:
+        book: Book instance
+
+    Returns:
+        {"card": {"width", "height", "webp", "jpeg"}, ...} with URLs, or None
+        if no variants were generated
+    """
+    variants = book.featured_image_variants or {}
+    storage = Book._meta.get_field("featured_image").storage
+
+    urls = {}
+    for variant in COVER_VARIANT_WIDTHS:
+        entry = variants.get(variant)
+        if not entry:
+            continue
+        urls[variant] = {
+            "width": entry["width"],
+            "height": entry["height"],
+            **{key: storage.url(entry[key]) for key in COVER_FORMATS if entry.get(key)},
+        }
+    return urls or None
@@ -0,0 +1,252 @@
+"""
+Near-duplicate detection for books.
+
+The text of every book is reduced to a MinHash signature: for each of
+MINHASH_PERMUTATIONS hash functions, the minimum hash over the book's
+word shingles. The share of equal positions in two signatures estimates the
+Jaccard similarity of the two shingle sets, so slightly different editions of
+the same text get close signatures.
+
+Signatures are cut into LSH_BANDS bands, each stored as an indexed bucket key
+(`BookLSHBucket`). Only books sharing at least one bucket with a book are
+compared with it, so a lookup is a few index scans instead of a pass over
+the whole catalog.
+"""
+
+import hashlib
+import re
+import zlib
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Count, QuerySet
+
+from .models import Book, BookChapter, BookLSHBucket, BookSignature
+
+# Words per shingle
+SHINGLE_WORDS = 5
+
+# Hash functions in a signature; LSH_BANDS bands of MINHASH_PERMUTATIONS / LSH_BANDS rows
+MINHASH_PERMUTATIONS = 128
+LSH_BANDS = 16
+LSH_ROWS = MINHASH_PERMUTATIONS // LSH_BANDS
+
+# Books estimated at least this similar are reported as possible duplicates;
+# close to the LSH threshold (1 / LSH_BANDS) ** (1 / LSH_ROWS) ~= 0.71
+DUPLICATE_MIN_SIMILARITY = 0.7
+
+# Candidates compared per lookup, most shared buckets first
+LSH_MAX_CANDIDATES = 200
+
+# Shingles hashed per NumPy step, bounding the (chunk x permutations) matrix
+MINHASH_CHUNK_SIZE = 8192
+
+# Seed of the hash function parameters; changing it invalidates stored signatures
+MINHASH_SEED = 1
+
+WORD_RE = re.compile(r"\w+")
+
+# Longer tokens are hashed by their first this many characters
+MAX_WORD_LENGTH = 64
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+# Multiplier combining the word hashes of a shingle (wraps modulo 2**64)
+_SHINGLE_BASE = np.uint64(1_099_511_628_211)
+
+# Universal hash functions h(x) = (a * x + b) mod p, truncated to 32 bits
+_random = np.random.RandomState(MINHASH_SEED)
+_PERMUTATION_A = _random.randint(1, 1 << 32, size=MINHASH_PERMUTATIONS, dtype=np.uint64)
+_PERMUTATION_B = _random.randint(0, 1 << 32, size=MINHASH_PERMUTATIONS, dtype=np.uint64)
+
+
+def text_shingles(text: str) -> np.ndarray:
+    """
+    Hash the word shingles of a text.
+
+    Words are lowercased, cut to MAX_WORD_LENGTH characters and hashed; the
+    hashes of SHINGLE_WORDS consecutive words are then combined with array
+    arithmetic.
+
+    Args:
+        text: Plain text
+
+    Returns:
+        Sorted array of distinct 32-bit shingle hashes (as uint64); a text
+        shorter than one shingle gives a single hash of all its words
+    """
+    # Words are hashed one by one: a fixed-width array of the words would be
+    # sized by the longest token times the word count
+    word_hashes = np.fromiter(
+        (
+            zlib.crc32(match.group()[:MAX_WORD_LENGTH].encode("utf-8"))
+            for match in WORD_RE.finditer(text.lower())
+        ),
+        dtype=np.uint64,
+    )
+    if not len(word_hashes):
+        return np.empty(0, dtype=np.uint64)
+
+    width = min(SHINGLE_WORDS, len(word_hashes))
+    count = len(word_hashes) - width + 1
+    shingles = np.zeros(count, dtype=np.uint64)
+    for offset in range(width):
+        shingles = shingles * _SHINGLE_BASE + word_hashes[offset:offset + count]
+
+    return np.unique((shingles >> np.uint64(32)) ^ (shingles & _MAX_HASH))
+
+
+def minhash(shingles: np.ndarray, signature: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Compute the MinHash signature of a set of shingle hashes.
+
+    Args:
+        shingles: 32-bit shingle hashes as returned by text_shingles()
+        signature: Signature of other text to merge into (the signature of
+            a union is the element-wise minimum)
+
+    Returns:
+        Array of MINHASH_PERMUTATIONS uint64 values below 2**32
+    """
+    if signature is None:
+        signature = np.full(MINHASH_PERMUTATIONS, _MAX_HASH, dtype=np.uint64)
+
+    for start in range(0, len(shingles), MINHASH_CHUNK_SIZE):
+        chunk = shingles[start:start + MINHASH_CHUNK_SIZE]
+        # a, x < 2**32, so a * x + b never overflows uint64
+        hashed = (np.outer(chunk, _PERMUTATION_A) + _PERMUTATION_B) % _MERSENNE_PRIME & _MAX_HASH
+        np.minimum(signature, hashed.min(axis=0), out=signature)
+
+    return signature
+
+
+def lsh_keys(signature: np.ndarray) -> List[int]:
+    """
+    Split a signature into LSH band keys.
+
+    Args:
+        signature: MinHash signature
+
+    Returns:
+        One signed 64-bit key per band, covering the band number and values
+    """
+    rows = signature.astype("<u4").reshape(LSH_BANDS, LSH_ROWS)
+    return [
+        int.from_bytes(
+            hashlib.blake2b(bytes([band]) + rows[band].tobytes(), digest_size=8).digest(),
+            "big",
+            signed=True,
+        )
+        for band in range(LSH_BANDS)
+    ]
+
+
+def pack_signature(signature: np.ndarray) -> bytes:
+    """Serialize a signature for BookSignature.minhash."""
+    return signature.astype("<u4").tobytes()
+
+
+def unpack_signature(data) -> np.ndarray:
+    """Read a signature stored in BookSignature.minhash."""
+    return np.frombuffer(bytes(data), dtype="<u4").astype(np.uint64)
+
+
+def estimate_similarity(first: np.ndarray, second: np.ndarray) -> float:
+    """Estimated Jaccard similarity of the texts behind two signatures."""
+    return float(np.mean(first == second))
+
+
+def _book_texts(book: Book) -> Iterable[str]:
+    """Texts of a book: the stored chapters of an EPUB, else the content."""
+    if book.content_type == "epub":
+        return (
+            BookChapter.objects.filter(book=book)
+            .order_by("index")
+            .values_list("content", flat=True)
+            .iterator(chunk_size=20)
+        )
+    return [book.content or ""]
+
+
+def update_book_signature(book: Book) -> Optional[BookSignature]:
+    """
+    Recompute the MinHash signature and LSH buckets of a book.
+
+    EPUB books are hashed chapter by chapter from the stored chapters, so
+    the whole text is never held in memory.
+
+    Args:
+        book: Saved Book instance, with its chapters stored
+
+    Returns:
+        The stored BookSignature, or None if the book has no text
+    """
+    signature = None
+    shingle_count = 0
+    for text in _book_texts(book):
+        shingles = text_shingles(text)
+        if len(shingles):
+            signature = minhash(shingles, signature)
+            shingle_count += len(shingles)
+
+    with transaction.atomic():
+        BookLSHBucket.objects.filter(book=book).delete()
+        if signature is None:
+            BookSignature.objects.filter(book=book).delete()
+            return None
+
+        stored, _ = BookSignature.objects.update_or_create(
+            book=book,
+            defaults={"minhash": pack_signature(signature), "shingle_count": shingle_count},
+        )
+        BookLSHBucket.objects.bulk_create(
+            BookLSHBucket(book=book, key=key) for key in set(lsh_keys(signature))
+        )
+
+    return stored
+
+
+def find_possible_duplicates(
+    book: Book,
+    books: Optional[QuerySet] = None,
+    min_similarity: float = DUPLICATE_MIN_SIMILARITY,
+    limit: int = 10,
+) -> List[Tuple[Book, float]]:
+    """
+    Find books whose text is probably a near copy of a book's text.
+
+    Args:
+        book: Book with a stored signature
+        books: Only consider these books (e.g. the ones visible to a user)
+        min_similarity: Lowest estimated Jaccard similarity reported
+        limit: Maximum number of books returned
+
+    Returns:
+        (book, estimated similarity) pairs, most similar first
+    """
+    stored = BookSignature.objects.filter(book=book).first()
+    if stored is None:
+        return []
+
+    signature = unpack_signature(stored.minhash)
+    candidates = BookLSHBucket.objects.filter(key__in=lsh_keys(signature)).exclude(book=book)
+    if books is not None:
+        candidates = candidates.filter(book__in=books)
+    candidate_ids = list(
+        candidates.values("book")
+        .annotate(shared=Count("id"))
+        .order_by("-shared")
+        .values_list("book", flat=True)[:LSH_MAX_CANDIDATES]
+    )
+    if not candidate_ids:
+        return []
+
+    scored = []
+    for other in BookSignature.objects.filter(book_id__in=candidate_ids).select_related("book"):
+        similarity = estimate_similarity(signature, unpack_signature(other.minhash))
+        if similarity >= min_similarity:
+            scored.append((other.book, similarity))
+
+    scored.sort(key=lambda pair: pair[1], reverse=True)
+    return scored[:limit]
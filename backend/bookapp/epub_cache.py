@@ -0,0 +1,159 @@
+"""
+Process-wide cache of parsed EPUBHandler instances.
+
+Each gunicorn worker keeps recently used handlers in memory so that readers
+paging through a book reuse the parsed archive instead of downloading and
+parsing it again on every request.
+"""
+
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Hashable, Optional
+
+from django.conf import settings
+
+from .epub_handler import EPUBHandler
+from .epub_storage import epub_file_identity, local_epub_path, open_range_file
+
+logger = logging.getLogger(__name__)
+
+
+class EPUBHandlerCache:
+    """LRU cache of EPUBHandler instances bounded by an approximate byte budget."""
+
+    def __init__(self, max_bytes: int):
+        """
+        Initialize an empty cache.
+
+        Args:
+            max_bytes: Approximate memory budget for all cached handlers
+        """
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (handler, size)
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Optional[EPUBHandler]:
+        """
+        Return the cached handler for a key and mark it as recently used.
+
+        Args:
+            key: Identity of the EPUB file and handler mode
+
+        Returns:
+            Cached EPUBHandler or None
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: Hashable, handler: EPUBHandler, size: int) -> None:
+        """
+        Store a handler, evicting least recently used entries to stay in budget.
+
+        Handlers larger than the whole budget are not cached.
+
+        Args:
+            key: Identity of the EPUB file and handler mode
+            handler: Parsed handler
+            size: Approximate memory used by the handler in bytes
+        """
+        if size > self.max_bytes:
+            logger.debug(f"EPUB {key} ({size} bytes) exceeds handler cache budget")
+            return
+
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.current_bytes -= previous[1]
+
+            self._entries[key] = (handler, size)
+            self.current_bytes += size
+
+            while self.current_bytes > self.max_bytes:
+                evicted_key, (_, evicted_size) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted_size
+                self.evictions += 1
+                logger.debug(f"Evicted EPUB handler for {evicted_key} ({evicted_size} bytes)")
+
+    def clear(self) -> None:
+        """Drop all cached handlers and reset counters."""
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def stats(self) -> Dict:
+        """
+        Get cache counters.
+
+        Returns:
+            Dictionary with hits, misses, evictions, entries and byte usage
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "current_bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+
+epub_handler_cache = EPUBHandlerCache(
+    getattr(settings, "EPUB_HANDLER_CACHE_MAX_BYTES", 256 * 1024 * 1024)
+)
+
+
+def get_epub_handler(epub_field_file, lazy: bool = False) -> Optional[EPUBHandler]:
+    """
+    Get a parsed EPUBHandler for a stored EPUB file, using the process cache.
+
+    Args:
+        epub_field_file: Django FileField instance pointing to an EPUB file
+        lazy: Return a lazy handler that extracts chapters on demand; its
+            archive stays open while it is cached. Files in S3/MinIO are
+            then read with range requests instead of being downloaded
+
+    Returns:
+        EPUBHandler (with chapters already extracted unless lazy), or None if
+        there is no file
+    """
+    if not epub_field_file:
+        return None
+
+    identity = epub_file_identity(epub_field_file)
+    key = (identity, lazy)
+    handler = epub_handler_cache.get(key)
+    if handler is not None:
+        return handler
+
+    range_file = open_range_file(epub_field_file, identity) if lazy else None
+    if range_file is not None:
+        handler = EPUBHandler(range_file, lazy=True)
+        epub_handler_cache.put(key, handler, handler.approximate_size())
+        return handler
+
+    with local_epub_path(epub_field_file) as epub_path:
+        if not epub_path:
+            return None
+        handler = EPUBHandler(epub_path, lazy=lazy)
+
+    if not lazy:
+        # Extract chapters before caching so the size estimate includes them
+        handler.get_chapters()
+    epub_handler_cache.put(key, handler, handler.approximate_size())
+    return handler
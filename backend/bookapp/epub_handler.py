@@ -2,38 +2,447 @@
 EPUB file handling utilities for parsing and extracting content from EPUB books.
 """
 
+import hashlib
 import logging
-from typing import Dict, List, Optional, Tuple
+import multiprocessing
+import os
+import posixpath
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import IO, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import unquote
+import ebooklib
 from ebooklib import epub
-from bs4 import BeautifulSoup
+from lxml import etree
+
+from .html_extraction import (
+    ExtractedDocument,
+    ExtractionBackend,
+    decode_document,
+    extract_document,
+    get_extraction_backend,
+)
+
+CONTAINER_PATH = 'META-INF/container.xml'
+CONTAINER_NAMESPACE = 'urn:oasis:names:tc:opendocument:xmlns:container'
+OPF_NAMESPACE = 'http://www.idpf.org/2007/opf'
+DC_NAMESPACE = 'http://purl.org/dc/elements/1.1/'
+NCX_NAMESPACE = 'http://www.daisy.org/z3986/2005/ncx/'
+XHTML_NAMESPACE = 'http://www.w3.org/1999/xhtml'
+OPF_MEDIA_TYPE = 'application/oebps-package+xml'
+XHTML_MEDIA_TYPE = 'application/xhtml+xml'
+
+# Parallel chapter extraction defaults when Django settings are not configured
+DEFAULT_PARALLEL_EXTRACTION_WORKERS = 0
+DEFAULT_PARALLEL_EXTRACTION_MIN_BYTES = 8 * 1024 * 1024
+
+# Package documents come from user uploads: never resolve entities or fetch DTDs
+XML_PARSER = etree.XMLParser(resolve_entities=False, no_network=True)
 
 logger = logging.getLogger(__name__)
 
 
+def _parallel_extraction_settings() -> Tuple[int, int]:
+    """Get (workers, minimum spine bytes) for parallel chapter extraction."""
+    from django.conf import settings
+
+    if not settings.configured:
+        return DEFAULT_PARALLEL_EXTRACTION_WORKERS, DEFAULT_PARALLEL_EXTRACTION_MIN_BYTES
+
+    return (
+        getattr(settings, 'EPUB_PARALLEL_EXTRACTION_WORKERS', DEFAULT_PARALLEL_EXTRACTION_WORKERS),
+        getattr(settings, 'EPUB_PARALLEL_EXTRACTION_MIN_BYTES', DEFAULT_PARALLEL_EXTRACTION_MIN_BYTES),
+    )
+
+
+class EPUBPackage:
+    """
+    Minimal reader for the OPF package of an EPUB archive.
+
+    Only META-INF/container.xml and the OPF document are parsed when the
+    package is opened; manifest items are decompressed on demand.
+    """
+
+    def __init__(self, source):
+        """
+        Open the archive and parse its package document.
+
+        Args:
+            source: Path to the EPUB file or a seekable binary file object
+        """
+        try:
+            self.zip_file = zipfile.ZipFile(source)
+            self.opf_path = self._find_opf_path()
+            self.opf_dir = posixpath.dirname(self.opf_path)
+            opf_bytes = self.read(self.opf_path)
+            self.opf_size = len(opf_bytes)
+            self.opf_root = etree.fromstring(opf_bytes, XML_PARSER)
+        except (zipfile.BadZipFile, KeyError, etree.XMLSyntaxError) as e:
+            raise ValueError(f"Invalid EPUB file: {e}")
+
+        self.manifest = self._parse_manifest()
+        self.spine = self._parse_spine()
+        self._items_by_href = None
+
+    def read(self, path: str) -> bytes:
+        """
+        Read and decompress a single archive entry.
+
+        Args:
+            path: Entry path inside the archive
+
+        Returns:
+            Entry content
+        """
+        return self.zip_file.read(posixpath.normpath(path))
+
+    def item_path(self, href: str) -> str:
+        """
+        Resolve a manifest href (relative to the OPF document) to an archive path.
+
+        Args:
+            href: Manifest href
+
+        Returns:
+            Path of the entry inside the archive
+        """
+        return posixpath.normpath(posixpath.join(self.opf_dir, href))
+
+    def read_item(self, item: Dict) -> bytes:
+        """
+        Read the content of a manifest item.
+
+        Args:
+            item: Manifest entry as stored in `self.manifest`
+
+        Returns:
+            Item content
+        """
+        return self.read(self.item_path(item['href']))
+
+    def find_item(self, href: str) -> Optional[Dict]:
+        """
+        Find a manifest item by its href.
+
+        Args:
+            href: Path relative to the OPF document, URL-encoded or not
+
+        Returns:
+            Manifest entry or None
+        """
+        if self._items_by_href is None:
+            self._items_by_href = {
+                posixpath.normpath(item['href']): item for item in self.manifest.values()
+            }
+        return self._items_by_href.get(posixpath.normpath(unquote(href)))
+
+    def item_size(self, item: Dict) -> int:
+        """
+        Get the uncompressed size of a manifest item.
+
+        Args:
+            item: Manifest entry as stored in `self.manifest`
+
+        Returns:
+            Size in bytes
+        """
+        return self.zip_file.getinfo(self.item_path(item['href'])).file_size
+
+    def open_item(self, item: Dict) -> IO[bytes]:
+        """
+        Open a manifest item for streaming without reading it into memory.
+
+        Args:
+            item: Manifest entry as stored in `self.manifest`
+
+        Returns:
+            Seekable binary file object, to be closed by the caller
+        """
+        return self.zip_file.open(self.item_path(item['href']))
+
+    def spine_documents(self) -> List[Dict]:
+        """
+        Get the XHTML documents referenced by the spine, in reading order.
+
+        Returns:
+            List of manifest entries
+        """
+        return [
+            self.manifest[idref]
+            for idref in self.spine
+            if idref in self.manifest and self.manifest[idref]['media_type'] == XHTML_MEDIA_TYPE
+        ]
+
+    def spine_document_positions(self) -> List[Tuple[int, str]]:
+        """
+        Get where each spine document sits in the full spine.
+
+        EPUB CFIs address spine items by their position among all itemrefs,
+        while chapter ids only count XHTML documents.
+
+        Returns:
+            (position, idref) pairs in the order of spine_documents()
+        """
+        return [
+            (position, idref)
+            for position, idref in enumerate(self.spine)
+            if idref in self.manifest and self.manifest[idref]['media_type'] == XHTML_MEDIA_TYPE
+        ]
+
+    def get_dc_values(self, name: str) -> List[str]:
+        """
+        Get the values of a Dublin Core metadata element.
+
+        Args:
+            name: Element name, e.g. 'title' or 'creator'
+
+        Returns:
+            List of element texts in document order
+        """
+        metadata = self.opf_root.find(f'{{{OPF_NAMESPACE}}}metadata')
+        if metadata is None:
+            return []
+
+        return [
+            (element.text or '').strip()
+            for element in metadata.iter(f'{{{DC_NAMESPACE}}}{name}')
+        ]
+
+    def cover_item(self) -> Optional[Dict]:
+        """
+        Find the cover image of the package.
+
+        Looks for the EPUB 3 `cover-image` manifest property, then the
+        EPUB 2 `<meta name="cover">` reference, then the first image in the
+        manifest.
+
+        Returns:
+            Manifest entry of the cover image, or None if there are no images
+        """
+        images = [item for item in self.manifest.values() if item['media_type'].startswith('image/')]
+
+        for item in images:
+            if 'cover-image' in item['properties']:
+                return item
+
+        metadata = self.opf_root.find(f'{{{OPF_NAMESPACE}}}metadata')
+        if metadata is not None:
+            for meta in metadata.iter(f'{{{OPF_NAMESPACE}}}meta'):
+                if meta.get('name') == 'cover':
+                    item = self.manifest.get(meta.get('content', ''))
+                    if item and item['media_type'].startswith('image/'):
+                        return item
+
+        return images[0] if images else None
+
+    def table_of_contents(self) -> Optional[List[Dict]]:
+        """
+        Parse the table of contents from the NCX or navigation document.
+
+        The NCX referenced by the spine wins over the EPUB 3 navigation
+        document, as in ebooklib. Only that one document is decompressed.
+        Entries have the same shape as EPUBHandler._parse_toc_items() output,
+        with hrefs relative to the OPF document.
+
+        Returns:
+            Flat list of entries (id, title, level, href) in document order,
+            or None if the package has no usable table of contents
+        """
+        spine_element = self.opf_root.find(f'{{{OPF_NAMESPACE}}}spine')
+        ncx_item = self.manifest.get(spine_element.get('toc', '')) if spine_element is not None else None
+        nav_item = next(
+            (item for item in self.manifest.values() if 'nav' in item['properties']), None
+        )
+
+        for item, parse in ((ncx_item, self._parse_ncx), (nav_item, self._parse_nav)):
+            if item is None:
+                continue
+            try:
+                root = etree.fromstring(self.read_item(item), XML_PARSER)
+            except (KeyError, etree.XMLSyntaxError) as e:
+                logger.warning(f"Cannot read table of contents {item['href']}: {e}")
+                continue
+
+            nodes = parse(root, posixpath.dirname(item['href']))
+            if nodes:
+                return self._flatten_toc(nodes)
+
+        return None
+
+    def close(self):
+        """Close the underlying archive."""
+        self.zip_file.close()
+
+    @staticmethod
+    def _toc_href(base_dir: str, href: str) -> str:
+        """Make a TOC href relative to the OPF directory instead of its document."""
+        path, hash_mark, anchor = href.partition('#')
+        if not path:
+            return ''
+        return posixpath.normpath(posixpath.join(base_dir, path)) + hash_mark + anchor
+
+    def _parse_ncx(self, root, base_dir: str) -> List[Tuple]:
+        """Parse NCX navPoints into nested (title, href, children) tuples."""
+        def nav_points(parent) -> List[Tuple]:
+            nodes = []
+            for point in parent.iterchildren(f'{{{NCX_NAMESPACE}}}navPoint'):
+                label = point.find(f'{{{NCX_NAMESPACE}}}navLabel/{{{NCX_NAMESPACE}}}text')
+                content = point.find(f'{{{NCX_NAMESPACE}}}content')
+                nodes.append((
+                    (label.text or '').strip() if label is not None else '',
+                    self._toc_href(base_dir, content.get('src', '')) if content is not None else '',
+                    nav_points(point),
+                ))
+            return nodes
+
+        nav_map = root.find(f'{{{NCX_NAMESPACE}}}navMap')
+        return nav_points(nav_map) if nav_map is not None else []
+
+    def _parse_nav(self, root, base_dir: str) -> List[Tuple]:
+        """Parse the toc <nav> list into nested (title, href, children) tuples."""
+        def text_of(element) -> str:
+            return ' '.join(''.join(element.itertext()).split())
+
+        def list_items(list_element) -> List[Tuple]:
+            nodes = []
+            for li in list_element.iterchildren(f'{{{XHTML_NAMESPACE}}}li'):
+                link = li.find(f'{{{XHTML_NAMESPACE}}}a')
+                label = link if link is not None else li.find(f'{{{XHTML_NAMESPACE}}}span')
+                sublist = li.find(f'{{{XHTML_NAMESPACE}}}ol')
+                nodes.append((
+                    text_of(label) if label is not None else '',
+                    self._toc_href(base_dir, link.get('href', '')) if link is not None else '',
+                    list_items(sublist) if sublist is not None else [],
+                ))
+            return nodes
+
+        # Any attribute equal to "toc" (epub:type, role) marks the TOC nav
+        for nav in root.iter(f'{{{XHTML_NAMESPACE}}}nav'):
+            if 'toc' in nav.attrib.values():
+                list_element = nav.find(f'{{{XHTML_NAMESPACE}}}ol')
+                return list_items(list_element) if list_element is not None else []
+        return []
+
+    def _flatten_toc(self, nodes: List[Tuple], level: int = 0) -> List[Dict]:
+        """Flatten nested TOC tuples into entries with level-based ids."""
+        entries = []
+        for idx, (title, href, children) in enumerate(nodes):
+            entries.append({
+                'id': f"{level}-{idx}",
+                'title': title,
+                'level': level,
+                'href': href,
+            })
+            entries.extend(self._flatten_toc(children, level + 1))
+        return entries
+
+    def _find_opf_path(self) -> str:
+        """Locate the OPF package document through META-INF/container.xml."""
+        container = etree.fromstring(self.read(CONTAINER_PATH), XML_PARSER)
+
+        for root_file in container.iter(f'{{{CONTAINER_NAMESPACE}}}rootfile'):
+            if root_file.get('media-type') == OPF_MEDIA_TYPE and root_file.get('full-path'):
+                return root_file.get('full-path')
+
+        raise KeyError('OPF package document not found in container.xml')
+
+    def _parse_manifest(self) -> Dict[str, Dict]:
+        """Parse manifest items keyed by their id."""
+        manifest = {}
+        manifest_element = self.opf_root.find(f'{{{OPF_NAMESPACE}}}manifest')
+        if manifest_element is None:
+            return manifest
+
+        for element in manifest_element.iter(f'{{{OPF_NAMESPACE}}}item'):
+            item_id = element.get('id')
+            href = element.get('href')
+            if not item_id or not href:
+                continue
+
+            manifest[item_id] = {
+                'id': item_id,
+                'href': unquote(href),
+                'media_type': element.get('media-type', ''),
+                'properties': element.get('properties', '').split(),
+            }
+
+        return manifest
+
+    def _parse_spine(self) -> List[str]:
+        """Parse spine item references in reading order."""
+        spine_element = self.opf_root.find(f'{{{OPF_NAMESPACE}}}spine')
+        if spine_element is None:
+            return []
+
+        return [
+            element.get('idref')
+            for element in spine_element.iter(f'{{{OPF_NAMESPACE}}}itemref')
+            if element.get('idref')
+        ]
+
+
 class EPUBHandler:
     """Handler for EPUB file parsing and content extraction."""
 
-    def __init__(self, epub_file_path: str):
+    def __init__(
+        self,
+        epub_file_path,
+        lazy: bool = False,
+        extraction_backend: Optional[ExtractionBackend] = None,
+        parallel_workers: Optional[int] = None,
+    ):
         """
         Initialize EPUB handler with file path.
 
         Args:
-            epub_file_path: Path to the EPUB file
+            epub_file_path: Path to the EPUB file, or a seekable binary file
+                object (lazy mode only, ebooklib needs a path)
+            lazy: Only read the OPF package up front and extract chapters on
+                demand instead of loading every item with ebooklib
+            extraction_backend: HTML extraction backend; defaults to the one
+                configured in settings
+            parallel_workers: Processes extracting chapters of books above
+                EPUB_PARALLEL_EXTRACTION_MIN_BYTES; defaults to the
+                EPUB_PARALLEL_EXTRACTION_WORKERS setting, below 2 extraction
+                stays serial
         """
         self.epub_file_path = epub_file_path
+        self.lazy = lazy
+        self.extractor = extraction_backend or get_extraction_backend()
+        self.parallel_workers, self.parallel_min_bytes = _parallel_extraction_settings()
+        if parallel_workers is not None:
+            self.parallel_workers = parallel_workers
         self.book = None
+        self.package = None
         self._chapters = None  # Cache for parsed chapters
         self._toc = None  # Cache for table of contents
-        self._load_book()
+        self._spine_positions = None  # Cache for _spine_position()
+
+        if lazy:
+            self._load_package()
+        else:
+            self._load_book()
 
     def _load_book(self):
         """Load the EPUB file."""
+        if not isinstance(self.epub_file_path, (str, os.PathLike)):
+            raise ValueError("Full EPUB parsing requires a file path")
+
         try:
             self.book = epub.read_epub(self.epub_file_path)
         except Exception as e:
             logger.error(f"Error loading EPUB file: {e}")
             raise ValueError(f"Invalid EPUB file: {e}")
 
+    def _load_package(self):
+        """Open the EPUB archive and read only its OPF package document."""
+        try:
+            self.package = EPUBPackage(self.epub_file_path)
+        except Exception as e:
+            logger.error(f"Error loading EPUB package: {e}")
+            raise ValueError(f"Invalid EPUB file: {e}")
+
     def validate_epub(self) -> Tuple[bool, Optional[str]]:
         """
         Validate EPUB file structure.
@@ -42,6 +451,13 @@ class EPUBHandler:
             Tuple of (is_valid, error_message)
         """
         try:
+            if self.lazy:
+                if not self.package.get_dc_values('title'):
+                    return False, "Missing title metadata"
+                if not self.package.manifest:
+                    return False, "EPUB file has no content"
+                return True, None
+
             if not self.book:
                 return False, "Failed to load EPUB file"
 
@@ -65,6 +481,9 @@ class EPUBHandler:
         Returns:
             Dictionary containing book metadata
         """
+        if self.lazy:
+            return self._get_package_metadata()
+
         metadata = {}
 
         try:
@@ -93,10 +512,27 @@ class EPUBHandler:
 
         return metadata
 
+    def _get_package_metadata(self) -> Dict:
+        """Extract metadata from the OPF package (lazy mode)."""
+        def first_value(name: str, default: str) -> str:
+            values = self.package.get_dc_values(name)
+            return values[0] if values else default
+
+        return {
+            'title': first_value('title', 'Unknown'),
+            'author': first_value('creator', 'Unknown'),
+            'language': first_value('language', 'en'),
+            'description': first_value('description', ''),
+            'publisher': first_value('publisher', ''),
+        }
+
     def get_chapters(self) -> List[Dict]:
         """
         Extract chapters from EPUB file.
 
+        Chapters follow the spine (reading order), so a chapter id is the
+        position of its document in the spine.
+
         Returns:
             List of dictionaries containing chapter information
         """
@@ -107,24 +543,8 @@ class EPUBHandler:
         chapters = []
 
         try:
-            items = list(self.book.get_items_of_type(epub.ITEM_DOCUMENT))
-
-            for idx, item in enumerate(items):
-                content_html = item.get_content().decode('utf-8')
-                text_content = self._html_to_text(content_html)
-
-                # Try to extract chapter title from content
-                soup = BeautifulSoup(content_html, 'html.parser')
-                title_tag = soup.find(['h1', 'h2', 'title'])
-                chapter_title = title_tag.get_text().strip() if title_tag else f"Chapter {idx + 1}"
-
-                chapters.append({
-                    'id': idx,
-                    'title': chapter_title,
-                    'content': text_content,
-                    'html_content': content_html,
-                    'file_name': item.get_name()
-                })
+            for chapter in self._iter_extracted_chapters():
+                chapters.append(chapter)
 
         except Exception as e:
             logger.error(f"Error extracting chapters: {e}")
@@ -133,10 +553,209 @@ class EPUBHandler:
         self._chapters = chapters
         return chapters
 
+    def iter_chapters(self, known_chapters: Optional[Dict[str, str]] = None) -> Iterator[Dict]:
+        """
+        Yield chapters one at a time without caching them.
+
+        In lazy mode each spine document is decompressed only when reached,
+        so memory use is bounded by the largest chapter rather than the book.
+        Unlike get_chapters(), an unreadable document raises instead of
+        silently ending the book, so ingestion fails and keeps the data
+        already stored.
+
+        Args:
+            known_chapters: Content hash -> title of chapters that are
+                already stored; matching documents are not extracted and an
+                unchanged-chapter stub (id, title, file_name, content_hash and
+                unchanged=True) is yielded instead
+
+        Yields:
+            Chapter dictionaries in spine order
+        """
+        if self._chapters is not None:
+            yield from self._chapters
+            return
+
+        yield from self._iter_extracted_chapters(known_chapters or {})
+
+    def _iter_extracted_chapters(self, known_chapters: Optional[Dict[str, str]] = None) -> Iterator[Dict]:
+        """
+        Extract spine documents in order, in a process pool for large books.
+
+        Workers receive raw document bytes and return the extracted
+        document; at most two documents per worker are in flight, so memory
+        stays bounded while chapters are yielded in spine order.
+
+        Args:
+            known_chapters: See iter_chapters()
+        """
+        known_chapters = known_chapters or {}
+        documents = self._iter_spine_documents()
+
+        if not self._use_parallel_extraction():
+            for idx, (file_name, content) in enumerate(documents):
+                content_hash = hashlib.sha256(content).hexdigest()
+                if content_hash in known_chapters:
+                    yield self._unchanged_chapter(idx, file_name, content_hash, known_chapters)
+                else:
+                    yield self._extract_chapter(idx, file_name, content, content_hash)
+            return
+
+        logger.info(f"Extracting chapters with {self.parallel_workers} processes")
+        # Spawned, not forked: the caller may hold database connections or threads
+        with ProcessPoolExecutor(
+            max_workers=self.parallel_workers,
+            mp_context=multiprocessing.get_context('spawn'),
+        ) as pool:
+            pending = deque()
+
+            def next_chapter() -> Dict:
+                idx, file_name, content_hash, future = pending.popleft()
+                if future is None:
+                    return self._unchanged_chapter(idx, file_name, content_hash, known_chapters)
+                return self._build_chapter(idx, file_name, future.result(), content_hash)
+
+            for idx, (file_name, content) in enumerate(documents):
+                content_hash = hashlib.sha256(content).hexdigest()
+                future = None
+                if content_hash not in known_chapters:
+                    future = pool.submit(extract_document, self.extractor.name, content)
+                pending.append((idx, file_name, content_hash, future))
+                if len(pending) >= self.parallel_workers * 2:
+                    yield next_chapter()
+
+            while pending:
+                yield next_chapter()
+
+    def _use_parallel_extraction(self) -> bool:
+        """Check whether the book is large enough to extract in parallel."""
+        if self.parallel_workers < 2:
+            return False
+
+        if self.lazy:
+            documents = self.package.spine_documents()
+            sizes = [self.package.item_size(entry) for entry in documents]
+        else:
+            sizes = [len(item.content or b'') for item in self._get_spine_documents()]
+
+        return len(sizes) > 1 and sum(sizes) >= self.parallel_min_bytes
+
+    def _extract_chapter(
+        self, idx: int, file_name: str, content: bytes, content_hash: Optional[str] = None
+    ) -> Dict:
+        """
+        Build the chapter dictionary for one spine document.
+
+        Args:
+            idx: Chapter id (spine position)
+            file_name: Document path relative to the OPF directory
+            content: Raw document bytes
+            content_hash: SHA-256 of `content`, computed if not given
+
+        Returns:
+            Chapter dictionary
+        """
+        # Title, text and sanitized HTML all come from a single parse
+        return self._build_chapter(
+            idx,
+            file_name,
+            self.extractor.extract(decode_document(content)),
+            content_hash or hashlib.sha256(content).hexdigest(),
+        )
+
+    def _build_chapter(
+        self, idx: int, file_name: str, document: ExtractedDocument, content_hash: str
+    ) -> Dict:
+        """Build the chapter dictionary from an extracted document."""
+        return {
+            'id': idx,
+            'title': document.title or f"Chapter {idx + 1}",
+            'content': document.text,
+            'html_content': document.html,
+            'file_name': file_name,
+            'content_hash': content_hash,
+            'spine_position': self._spine_position(idx),
+        }
+
+    def _unchanged_chapter(
+        self, idx: int, file_name: str, content_hash: str, known_chapters: Dict[str, str]
+    ) -> Dict:
+        """Build the stub yielded for a document that is already stored."""
+        return {
+            'id': idx,
+            'title': known_chapters[content_hash],
+            'file_name': file_name,
+            'content_hash': content_hash,
+            'spine_position': self._spine_position(idx),
+            'unchanged': True,
+        }
+
+    def _spine_position(self, idx: int) -> int:
+        """
+        Get the position of a chapter among all spine itemrefs.
+
+        EPUB CFIs count every itemref, chapter ids only XHTML documents.
+        """
+        if self._spine_positions is None:
+            if self.lazy:
+                self._spine_positions = [
+                    position for position, _ in self.package.spine_document_positions()
+                ]
+            else:
+                self._spine_positions = [
+                    position
+                    for position, (idref, _linear) in enumerate(self.book.spine)
+                    if (item := self.book.get_item_with_id(idref)) is not None
+                    and item.get_type() == ebooklib.ITEM_DOCUMENT
+                ]
+        return self._spine_positions[idx]
+
+    def _iter_spine_documents(self) -> Iterator[Tuple[str, bytes]]:
+        """
+        Iterate over spine documents as (file_name, raw bytes) pairs.
+
+        Raw archive bytes are used in both modes (ebooklib's get_content()
+        re-renders documents and drops their <head>). In lazy mode each
+        document is decompressed only when reached.
+        """
+        if self.lazy:
+            for entry in self.package.spine_documents():
+                yield entry['href'], self.package.read_item(entry)
+        else:
+            for item in self._get_spine_documents():
+                yield item.get_name(), item.content
+
+    def _get_spine_documents(self) -> List:
+        """
+        Get the XHTML documents referenced by the spine, in reading order.
+
+        Returns:
+            List of ebooklib document items
+        """
+        documents = []
+
+        for idref, _linear in self.book.spine:
+            item = self.book.get_item_with_id(idref)
+            if item is not None and item.get_type() == ebooklib.ITEM_DOCUMENT:
+                documents.append(item)
+
+        return documents
+
+    def _spine_file_names(self) -> List[str]:
+        """Get the file names of spine documents without extracting them."""
+        if self.lazy:
+            return [entry['href'] for entry in self.package.spine_documents()]
+        return [item.get_name() for item in self._get_spine_documents()]
+
     def get_table_of_contents(self) -> List[Dict]:
         """
         Extract table of contents from EPUB file.
 
+        Every entry carries `chapter_id` (spine index of the document its
+        href points to, None if it is not a spine document) and `anchor`
+        (fragment inside that document, None if absent), so a client can
+        open a TOC entry with a single chapter request.
+
         Returns:
             List of dictionaries containing TOC structure
         """
@@ -147,11 +766,10 @@ class EPUBHandler:
         toc = []
 
         try:
-            # Get TOC from EPUB
-            book_toc = self.book.toc
+            toc = self._read_toc_entries()
 
-            if isinstance(book_toc, list):
-                toc = self._parse_toc_items(book_toc)
+            if toc:
+                self._resolve_toc_targets(toc)
             else:
                 # Fallback: generate TOC from chapters
                 chapters = self.get_chapters()
@@ -159,7 +777,9 @@ class EPUBHandler:
                     {
                         'id': ch['id'],
                         'title': ch['title'],
-                        'level': 0
+                        'level': 0,
+                        'chapter_id': ch['id'],
+                        'anchor': None,
                     }
                     for ch in chapters
                 ]
@@ -171,6 +791,23 @@ class EPUBHandler:
         self._toc = toc
         return toc
 
+    def _read_toc_entries(self) -> Optional[List[Dict]]:
+        """
+        Read the book's own table of contents.
+
+        In lazy mode only the NCX or navigation document is read from the
+        archive; otherwise ebooklib's parsed TOC is used.
+
+        Returns:
+            Flat list of TOC entries, or None if the book has none
+        """
+        if self.lazy:
+            return self.package.table_of_contents()
+
+        if isinstance(self.book.toc, list):
+            return self._parse_toc_items(self.book.toc)
+        return None
+
     def _parse_toc_items(self, items: List, level: int = 0) -> List[Dict]:
         """
         Recursively parse TOC items.
@@ -211,6 +848,38 @@ class EPUBHandler:
 
         return toc_entries
 
+    def _resolve_toc_targets(self, toc: List[Dict]) -> None:
+        """
+        Add chapter_id and anchor to TOC entries by resolving their hrefs.
+
+        TOC hrefs and spine file names are both relative to the OPF
+        directory; an href that matches no path exactly is matched by file
+        name when that name is unique in the spine.
+
+        Args:
+            toc: Entries produced by _parse_toc_items(), updated in place
+        """
+        by_path = {}
+        by_basename = {}
+        for idx, file_name in enumerate(self._spine_file_names()):
+            path = posixpath.normpath(unquote(file_name))
+            by_path.setdefault(path, idx)
+            by_basename.setdefault(posixpath.basename(path), []).append(idx)
+
+        for entry in toc:
+            path, _, anchor = (entry.get('href') or '').partition('#')
+            chapter_id = None
+            if path:
+                path = posixpath.normpath(unquote(path))
+                chapter_id = by_path.get(path)
+                if chapter_id is None:
+                    candidates = by_basename.get(posixpath.basename(path), [])
+                    if len(candidates) == 1:
+                        chapter_id = candidates[0]
+
+            entry['chapter_id'] = chapter_id
+            entry['anchor'] = unquote(anchor) or None
+
     def get_full_text(self) -> str:
         """
         Extract all text content from EPUB file.
@@ -234,6 +903,8 @@ class EPUBHandler:
         """
         Get specific chapter by ID.
 
+        In lazy mode only the requested document is decompressed and parsed.
+
         Args:
             chapter_id: Chapter identifier
 
@@ -241,6 +912,15 @@ class EPUBHandler:
             Chapter dictionary or None if not found
         """
         try:
+            if self.lazy and self._chapters is None:
+                documents = self.package.spine_documents()
+                if 0 <= chapter_id < len(documents):
+                    entry = documents[chapter_id]
+                    return self._extract_chapter(
+                        chapter_id, entry['href'], self.package.read_item(entry)
+                    )
+                return None
+
             chapters = self.get_chapters()
             for chapter in chapters:
                 if chapter['id'] == chapter_id:
@@ -250,6 +930,40 @@ class EPUBHandler:
 
         return None
 
+    def get_chapter_count(self) -> int:
+        """
+        Get the number of chapters.
+
+        In lazy mode this is the number of spine documents, so no chapter
+        needs to be parsed.
+
+        Returns:
+            Number of chapters
+        """
+        if self.lazy and self._chapters is None:
+            return len(self.package.spine_documents())
+
+        return len(self.get_chapters())
+
+    def approximate_size(self) -> int:
+        """
+        Estimate the memory held by this handler.
+
+        Returns:
+            Approximate size in bytes of loaded items and extracted chapters
+        """
+        size = self.package.opf_size if self.package else 0
+        size += getattr(self.epub_file_path, 'max_cache_bytes', 0)
+
+        if self.book is not None:
+            for item in self.book.get_items():
+                size += len(item.content or b'')
+
+        for chapter in self._chapters or []:
+            size += len(chapter['content']) + len(chapter['html_content'])
+
+        return size
+
     def _html_to_text(self, html_content: str) -> str:
         """
         Convert HTML content to plain text.
@@ -261,21 +975,7 @@ class EPUBHandler:
             Plain text content
         """
         try:
-            soup = BeautifulSoup(html_content, 'html.parser')
-
-            # Remove script and style elements
-            for script in soup(['script', 'style']):
-                script.decompose()
-
-            # Get text
-            text = soup.get_text()
-
-            # Clean up whitespace
-            lines = (line.strip() for line in text.splitlines())
-            chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-            text = '\n'.join(chunk for chunk in chunks if chunk)
-
-            return text
+            return self.extractor.extract(html_content).text
 
         except Exception as e:
             logger.error(f"Error converting HTML to text: {e}")
@@ -283,42 +983,96 @@ class EPUBHandler:
 
     def get_images(self) -> List[Dict]:
         """
-        Extract images from EPUB file.
+        List the images of the EPUB file.
+
+        Image bytes are not loaded; stream a single image with
+        `open_resource()` instead.
 
         Returns:
-            List of dictionaries containing image information
+            List of dictionaries with id, file_name, media_type and size
         """
         images = []
 
         try:
-            image_items = list(self.book.get_items_of_type(epub.ITEM_IMAGE))
-
-            for idx, item in enumerate(image_items):
-                images.append({
-                    'id': idx,
-                    'file_name': item.get_name(),
-                    'media_type': item.media_type,
-                    'content': item.get_content()
-                })
+            if self.lazy:
+                image_items = [
+                    item for item in self.package.manifest.values()
+                    if item['media_type'].startswith('image/')
+                ]
+                for idx, item in enumerate(image_items):
+                    images.append({
+                        'id': idx,
+                        'file_name': item['href'],
+                        'media_type': item['media_type'],
+                        'size': self.package.item_size(item),
+                    })
+            else:
+                image_items = list(self.book.get_items_of_type(ebooklib.ITEM_IMAGE))
+                for idx, item in enumerate(image_items):
+                    images.append({
+                        'id': idx,
+                        'file_name': item.get_name(),
+                        'media_type': item.media_type,
+                        'size': len(item.content or b''),
+                    })
 
         except Exception as e:
             logger.error(f"Error extracting images: {e}")
 
         return images
 
+    def get_resource(self, href: str) -> Optional[Dict]:
+        """
+        Describe a non-document manifest item (image, stylesheet, font...).
+
+        Lazy mode only.
 
-def parse_epub_file(epub_file_path: str) -> Dict:
+        Args:
+            href: Item path relative to the OPF document
+
+        Returns:
+            Manifest entry with an added 'size', or None if there is no such
+            item or it is an XHTML document (served as chapters instead)
+        """
+        item = self.package.find_item(href)
+        if item is None or item['media_type'] == XHTML_MEDIA_TYPE:
+            return None
+
+        try:
+            size = self.package.item_size(item)
+        except KeyError:
+            # Listed in the manifest but missing from the archive
+            return None
+
+        return {**item, 'size': size}
+
+    def open_resource(self, resource: Dict) -> IO[bytes]:
+        """
+        Open a resource returned by `get_resource()` for streaming.
+
+        Args:
+            resource: Resource description
+
+        Returns:
+            Seekable binary file object, to be closed by the caller
+        """
+        return self.package.open_item(resource)
+
+
+def parse_epub_file(epub_file_path: str, parallel_workers: Optional[int] = None) -> Dict:
     """
     Main function to parse EPUB file and extract all relevant information.
 
     Args:
         epub_file_path: Path to the EPUB file
+        parallel_workers: Chapter extraction processes (see EPUBHandler);
+            pass 0 from code that already parses books in parallel
 
     Returns:
         Dictionary containing metadata, chapters, and TOC
     """
     try:
-        handler = EPUBHandler(epub_file_path)
+        handler = EPUBHandler(epub_file_path, parallel_workers=parallel_workers)
 
         # Validate
         is_valid, error_msg = handler.validate_epub()
@@ -343,3 +1097,106 @@ def parse_epub_file(epub_file_path: str) -> Dict:
     except Exception as e:
         logger.error(f"Error parsing EPUB file: {e}")
         raise
+
+
+def probe_epub(source) -> Dict:
+    """
+    Read the metadata, spine and table of contents of an EPUB file without
+    extracting any chapter.
+
+    Only META-INF/container.xml, the OPF package and the NCX or navigation
+    document are decompressed, so the cost does not grow with the number or
+    size of chapters and images. Use it for upload-time checks, title and
+    author autofill and TOC rebuilds; use parse_epub_file() for ingestion.
+
+    Args:
+        source: Path to the EPUB file or a seekable binary file object
+
+    Returns:
+        Dictionary with metadata, spine (spine document file names) and
+        table_of_contents; the table of contents is empty for books without
+        an NCX or navigation document, since building one from chapter
+        titles would extract every chapter
+
+    Raises:
+        ValueError: If the file is not a readable EPUB package
+    """
+    handler = EPUBHandler(source, lazy=True)
+    try:
+        is_valid, error_msg = handler.validate_epub()
+        if not is_valid:
+            raise ValueError(f"Invalid EPUB file: {error_msg}")
+
+        toc = handler._read_toc_entries() or []
+        if toc:
+            handler._resolve_toc_targets(toc)
+
+        return {
+            'metadata': handler.get_metadata(),
+            'spine': handler._spine_file_names(),
+            'table_of_contents': toc,
+        }
+    finally:
+        handler.package.close()
+
+
+def stream_epub_file(epub_file_path, known_chapters: Optional[Dict[str, str]] = None) -> Dict:
+    """
+    Open an EPUB file for ingestion with chapters produced on demand.
+
+    Same data as parse_epub_file(), except that `chapters` is a generator
+    (consume it once, in order) and there is no `full_text`: consumers
+    store, index and measure each chapter as it is yielded, so peak memory
+    is about one chapter whatever the size of the book.
+
+    Books without a table of contents get one built from chapter titles;
+    in that case `table_of_contents` is filled in while the chapters are
+    consumed.
+
+    Args:
+        epub_file_path: Path to the EPUB file or a seekable binary file object
+        known_chapters: Content hash -> title of the chapters already stored
+            for the book; those documents are yielded as unchanged stubs
+            without being extracted (see EPUBHandler.iter_chapters())
+
+    Returns:
+        Dictionary with metadata, table_of_contents, chapters and
+        chapter_count
+
+    Raises:
+        ValueError: If the file is not a valid EPUB
+    """
+    handler = EPUBHandler(epub_file_path, lazy=True)
+
+    is_valid, error_msg = handler.validate_epub()
+    if not is_valid:
+        handler.package.close()
+        raise ValueError(f"Invalid EPUB file: {error_msg}")
+
+    toc = handler._read_toc_entries()
+    if toc:
+        handler._resolve_toc_targets(toc)
+    build_toc = not toc
+    toc = toc or []
+
+    def chapters() -> Iterator[Dict]:
+        try:
+            for chapter in handler.iter_chapters(known_chapters):
+                if build_toc:
+                    toc.append({
+                        'id': chapter['id'],
+                        'title': chapter['title'],
+                        'level': 0,
+                        'chapter_id': chapter['id'],
+                        'anchor': None,
+                    })
+                yield chapter
+        finally:
+            handler.package.close()
+
+    return {
+        'metadata': handler.get_metadata(),
+        'chapters': chapters(),
+        'table_of_contents': toc,
+        'chapter_count': handler.get_chapter_count(),
+    }
@@ -0,0 +1,528 @@
+"""
+Storage helpers for EPUB files kept in S3/MinIO or on the local filesystem.
+
+Uploaded EPUB files are content-addressed: they are stored under their
+SHA-256 digest, so identical uploads share one stored object.
+"""
+
+import hashlib
+import io
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Callable, NamedTuple, Optional, Tuple
+
+from django.conf import settings
+from django.db import connection
+from django.core.files import locks
+
+logger = logging.getLogger(__name__)
+
+# Content-addressed EPUB files live under this prefix
+EPUB_CONTENT_PREFIX = "epub_files/sha256/"
+
+
+@contextmanager
+def local_epub_path(epub_field_file):
+    """
+    Context manager for EPUB file path resolution.
+
+    Handles both local filesystem and remote storage (S3/MinIO). Remote files
+    are served from the node-local disk cache (see EPUBDiskCache), falling
+    back to a temporary copy when the cache is disabled or unusable.
+
+    Args:
+        epub_field_file: Django FileField instance pointing to an EPUB file
+
+    Yields:
+        str: Path to the EPUB file (local or temporary)
+
+    Usage:
+        with local_epub_path(book.epub_file) as path:
+            # Use the path for EPUB processing
+            process_epub(path)
+    """
+    if not epub_field_file:
+        yield None
+        return
+
+    # Remote storages (S3/MinIO) do not implement path()
+    try:
+        local_path = epub_field_file.path
+    except NotImplementedError:
+        local_path = None
+
+    if local_path:
+        yield local_path
+        return
+
+    cached_path = None
+    if epub_disk_cache.enabled:
+        try:
+            cached_path = epub_disk_cache.fetch(epub_field_file)
+        except Exception as e:
+            logger.warning(f"EPUB disk cache unavailable for {epub_field_file.name}: {e}")
+
+    if cached_path:
+        yield cached_path
+        return
+
+    temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".epub")
+    temp_path = temp_file.name
+    temp_file.close()
+
+    try:
+        with epub_field_file.open("rb") as source, open(temp_path, "wb") as dest:
+            for chunk in iter(lambda: source.read(8192), b""):
+                if not chunk:
+                    break
+                dest.write(chunk)
+        yield temp_path
+    finally:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+
+
+def file_sha256(file_obj, chunk_size: int = 1024 * 1024) -> str:
+    """
+    Hash a binary file object from the start, leaving it rewound.
+
+    Args:
+        file_obj: Seekable binary file object (e.g. an UploadedFile)
+        chunk_size: Bytes read per step
+
+    Returns:
+        SHA-256 hex digest of the content
+    """
+    digest = hashlib.sha256()
+    file_obj.seek(0)
+    for chunk in iter(lambda: file_obj.read(chunk_size), b""):
+        digest.update(chunk)
+    file_obj.seek(0)
+    return digest.hexdigest()
+
+
+def epub_content_name(sha256: str) -> str:
+    """Storage name of the EPUB file with the given SHA-256 digest."""
+    return f"{EPUB_CONTENT_PREFIX}{sha256[:2]}/{sha256}.epub"
+
+
+def lock_epub_content(name: str) -> None:
+    """
+    Serialize the reuse and deletion of one stored EPUB file.
+
+    Takes a PostgreSQL advisory lock keyed by the storage name, held until
+    the current transaction ends; call it inside transaction.atomic(). Other
+    databases serialize writes anyway, so nothing is done there.
+
+    Args:
+        name: Storage name of the EPUB file
+    """
+    if connection.vendor != "postgresql":
+        return
+    key = int.from_bytes(hashlib.blake2b(name.encode("utf-8"), digest_size=8).digest(), "big", signed=True)
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_advisory_xact_lock(%s)", [key])
+
+
+def store_epub_content(file_obj, storage) -> Tuple[str, bool]:
+    """
+    Save an EPUB file under its content hash.
+
+    An identical file that is already stored is reused instead of being
+    uploaded again. Call it inside the transaction that saves the book
+    referencing the file: the lock taken here keeps release_epub_file() from
+    deleting a reused file until that book is committed.
+
+    Args:
+        file_obj: Django File (or UploadedFile) with the EPUB content
+        storage: Storage of Book.epub_file
+
+    Returns:
+        Tuple of (storage name, True if an existing object was reused)
+    """
+    name = epub_content_name(file_sha256(file_obj))
+    lock_epub_content(name)
+    if storage.exists(name):
+        return name, True
+    return storage.save(name, file_obj), False
+
+
+class EPUBFileIdentity(NamedTuple):
+    """Identifies one stored version of an EPUB file."""
+
+    name: str
+    size: int
+    etag: str
+
+
+def epub_file_identity(epub_field_file) -> EPUBFileIdentity:
+    """
+    Resolve the storage name, size and ETag of a stored EPUB file.
+
+    Remote (S3/MinIO) files are described by a single HEAD request; local files
+    get a pseudo ETag derived from their modification time and size.
+
+    Args:
+        epub_field_file: Django FileField instance pointing to an EPUB file
+
+    Returns:
+        EPUBFileIdentity for the file
+    """
+    storage = epub_field_file.storage
+    name = epub_field_file.name
+
+    if hasattr(storage, "bucket"):
+        obj = storage.bucket.Object(storage._normalize_name(name))
+        return EPUBFileIdentity(name, obj.content_length, obj.e_tag.strip('"'))
+
+    stat = os.stat(storage.path(name))
+    return EPUBFileIdentity(name, stat.st_size, f"{stat.st_mtime_ns:x}-{stat.st_size:x}")
+
+
+def _copy_stream(source, dest, chunk_size: int = 1024 * 1024):
+    """Copy a binary stream, returning the MD5 hex digest of the copied bytes."""
+    digest = hashlib.md5(usedforsecurity=False)
+    for chunk in iter(lambda: source.read(chunk_size), b""):
+        digest.update(chunk)
+        dest.write(chunk)
+    return digest.hexdigest()
+
+
+class EPUBDiskCache:
+    """
+    Node-local cache of EPUB files downloaded from remote storage.
+
+    Files are keyed by storage name and ETag, so a re-uploaded book never
+    reuses a stale copy. All gunicorn workers on a host share the directory:
+    downloads are written to a temporary file and atomically renamed into
+    place under a per-entry file lock, so concurrent misses for the same file
+    download it once. Least recently used files (by mtime, refreshed on every
+    hit) are evicted once the directory exceeds its size budget.
+
+    Lock files are empty and never deleted: another worker may have one open
+    and be about to lock it, and unlinking it would let a later worker lock a
+    new file under the same name at the same time.
+    """
+
+    SUFFIX = ".epub"
+
+    # Temporary downloads not written to for this long were left behind by a
+    # killed worker
+    STALE_PART_SECONDS = 60 * 60
+
+    def __init__(self, directory: str, max_bytes: int):
+        """
+        Initialize the cache.
+
+        Args:
+            directory: Cache directory, created on first use
+            max_bytes: Size budget for all cached files; 0 disables the cache
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.directory) and self.max_bytes > 0
+
+    def entry_path(self, identity: EPUBFileIdentity) -> str:
+        """Path of the cached copy of one stored file version."""
+        key = hashlib.sha256(f"{identity.name}\0{identity.etag}".encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, key + self.SUFFIX)
+
+    def fetch(self, epub_field_file) -> Optional[str]:
+        """
+        Return a local path for a stored EPUB file, downloading it on a miss.
+
+        Args:
+            epub_field_file: Django FileField instance in remote storage
+
+        Returns:
+            Path inside the cache directory, or None if the file is larger
+            than the whole cache budget
+
+        Raises:
+            ValueError: If the downloaded file does not match its size or
+                checksum
+        """
+        identity = epub_file_identity(epub_field_file)
+        if identity.size > self.max_bytes:
+            return None
+
+        path = self.entry_path(identity)
+        if self._is_valid(path, identity):
+            self._touch(path)
+            return path
+
+        os.makedirs(self.directory, exist_ok=True)
+
+        with open(path + ".lock", "a+b") as lock_file:
+            locks.lock(lock_file, locks.LOCK_EX)
+            try:
+                # Another worker may have finished the download while we waited
+                if not self._is_valid(path, identity):
+                    self._download(epub_field_file, identity, path)
+            finally:
+                locks.unlock(lock_file)
+
+        self.evict()
+        return path
+
+    def _is_valid(self, path: str, identity: EPUBFileIdentity) -> bool:
+        try:
+            return os.path.getsize(path) == identity.size
+        except OSError:
+            return False
+
+    def _touch(self, path: str) -> None:
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+    def _download(self, epub_field_file, identity: EPUBFileIdentity, path: str) -> None:
+        """Download into a temporary file, verify it and rename it into place."""
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as dest, epub_field_file.open("rb") as source:
+                md5 = _copy_stream(source, dest)
+
+            size = os.path.getsize(temp_path)
+            if size != identity.size:
+                raise ValueError(f"size mismatch ({size} != {identity.size})")
+
+            # Single-part S3 uploads use the MD5 of the content as their ETag
+            etag = identity.etag.lower()
+            if len(etag) == 32 and "-" not in etag and md5 != etag:
+                raise ValueError("checksum mismatch")
+
+            os.replace(temp_path, path)
+        except Exception:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            raise
+
+        logger.debug(f"Cached EPUB {identity.name} ({identity.size} bytes) at {path}")
+
+    def evict(self) -> int:
+        """
+        Delete least recently used files until the cache fits its budget.
+
+        Stale temporary downloads are deleted as well.
+
+        Returns:
+            Number of deleted cached files
+        """
+        entries = []
+        stale_before = time.time() - self.STALE_PART_SECONDS
+        try:
+            with os.scandir(self.directory) as it:
+                for entry in it:
+                    if entry.name.endswith(self.SUFFIX):
+                        try:
+                            stat = entry.stat()
+                        except OSError:
+                            continue
+                        entries.append((stat.st_mtime, stat.st_size, entry.path))
+                    elif entry.name.endswith(".part"):
+                        try:
+                            if entry.stat().st_mtime < stale_before:
+                                os.remove(entry.path)
+                        except OSError:
+                            pass
+        except OSError:
+            return 0
+
+        total = sum(size for _, size, _ in entries)
+        deleted = 0
+
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            # Workers that already opened the file keep reading it on POSIX
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            deleted += 1
+
+        return deleted
+
+
+epub_disk_cache = EPUBDiskCache(
+    getattr(settings, "EPUB_DISK_CACHE_DIR", ""),
+    getattr(settings, "EPUB_DISK_CACHE_MAX_BYTES", 0),
+)
+
+
+# Block size and number of blocks kept by RangeReadFile
+RANGE_READ_BLOCK_SIZE = 64 * 1024
+RANGE_READ_MAX_BLOCKS = 32
+
+
+class RangeReadFile(io.RawIOBase):
+    """
+    Read-only, seekable file object that fetches byte ranges on demand.
+
+    zipfile only needs the end-of-central-directory record, the central
+    directory and the entries it actually opens, so a lazily parsed EPUB can
+    be read straight from S3/MinIO without downloading the whole archive.
+    Fetched blocks are kept in a small LRU cache; adjacent missing blocks are
+    fetched with a single request.
+    """
+
+    def __init__(
+        self,
+        fetch_range: Callable[[int, int], bytes],
+        size: int,
+        block_size: int = RANGE_READ_BLOCK_SIZE,
+        max_blocks: int = RANGE_READ_MAX_BLOCKS,
+    ):
+        """
+        Initialize the file object.
+
+        Args:
+            fetch_range: Callable returning bytes start..end (inclusive)
+            size: Total size of the remote object in bytes
+            block_size: Size of cached blocks
+            max_blocks: Maximum number of cached blocks
+        """
+        super().__init__()
+        self._fetch_range = fetch_range
+        self.size = size
+        self.block_size = block_size
+        self.max_blocks = max_blocks
+        self._position = 0
+        self._blocks = OrderedDict()  # block index -> bytes
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.bytes_fetched = 0
+
+    @property
+    def max_cache_bytes(self) -> int:
+        """Upper bound of memory used by the block cache."""
+        return self.block_size * self.max_blocks
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET:
+            position = offset
+        elif whence == io.SEEK_CUR:
+            position = self._position + offset
+        elif whence == io.SEEK_END:
+            position = self.size + offset
+        else:
+            raise ValueError(f"Invalid whence ({whence})")
+
+        if position < 0:
+            raise ValueError("Negative seek position")
+        self._position = position
+        return position
+
+    def readinto(self, buffer) -> int:
+        start = self._position
+        end = min(start + len(buffer), self.size)
+        if start >= end:
+            return 0
+
+        with self._lock:
+            data = self._read_range(start, end)
+
+        buffer[:len(data)] = data
+        self._position += len(data)
+        return len(data)
+
+    def _read_range(self, start: int, end: int) -> bytes:
+        """Return bytes [start, end) assembled from cached or fetched blocks."""
+        first = start // self.block_size
+        last = (end - 1) // self.block_size
+
+        # Blocks of this read are held locally: a read spanning more blocks
+        # than the cache keeps must not lose them to eviction halfway
+        blocks = {}
+        for index in range(first, last + 1):
+            block = self._blocks.get(index)
+            if block is not None:
+                self._blocks.move_to_end(index)
+                blocks[index] = block
+
+        missing = [index for index in range(first, last + 1) if index not in blocks]
+        if missing:
+            blocks.update(self._fetch_blocks(missing[0], missing[-1]))
+
+        data = b"".join(blocks[index] for index in range(first, last + 1))
+        offset = start - first * self.block_size
+
+        while len(self._blocks) > self.max_blocks:
+            self._blocks.popitem(last=False)
+
+        return data[offset:offset + end - start]
+
+    def _fetch_blocks(self, first: int, last: int) -> dict:
+        """Fetch blocks first..last with one range request and cache them."""
+        range_start = first * self.block_size
+        range_end = min((last + 1) * self.block_size, self.size) - 1
+        data = self._fetch_range(range_start, range_end)
+
+        self.requests += 1
+        self.bytes_fetched += len(data)
+
+        blocks = {}
+        for index in range(first, last + 1):
+            offset = (index - first) * self.block_size
+            blocks[index] = data[offset:offset + self.block_size]
+            self._blocks[index] = blocks[index]
+            self._blocks.move_to_end(index)
+
+        return blocks
+
+
+def open_range_file(epub_field_file, identity: Optional[EPUBFileIdentity] = None) -> Optional[RangeReadFile]:
+    """
+    Open a stored EPUB file for range reads if its storage supports them.
+
+    Args:
+        epub_field_file: Django FileField instance pointing to an EPUB file
+        identity: Already resolved identity, saves a HEAD request
+
+    Returns:
+        RangeReadFile for S3/MinIO storages, None for other storages
+    """
+    storage = epub_field_file.storage
+    if not hasattr(storage, "bucket"):
+        return None
+
+    identity = identity or epub_file_identity(epub_field_file)
+    client = storage.connection.meta.client
+    bucket_name = storage.bucket_name
+    key = storage._normalize_name(epub_field_file.name)
+
+    def fetch_range(start: int, end: int) -> bytes:
+        # IfMatch makes a concurrent overwrite fail instead of mixing versions
+        response = client.get_object(
+            Bucket=bucket_name,
+            Key=key,
+            Range=f"bytes={start}-{end}",
+            IfMatch=f'"{identity.etag}"',
+        )
+        return response["Body"].read()
+
+    return RangeReadFile(fetch_range, identity.size)
@@ -0,0 +1,374 @@
+"""
+HTML extraction backends for EPUB documents.
+
+Every backend turns one XHTML document into its title, plain text and
+sanitized HTML from a single parse. The active backend is chosen with the
+EPUB_HTML_EXTRACTION_BACKEND setting; `python manage.py
+benchmark_html_extraction` compares them on real input.
+"""
+
+import codecs
+import html
+import logging
+import re
+from html.parser import HTMLParser
+from typing import Dict, List, NamedTuple, Optional, Type
+
+from bs4 import BeautifulSoup
+
+logger = logging.getLogger(__name__)
+
+# Tags that are never rendered by the reader and may carry active content
+UNSAFE_TAGS = ['script', 'iframe', 'object', 'embed', 'form']
+
+# Headings used as chapter titles, first match in document order wins
+TITLE_TAGS = ['h1', 'h2', 'title']
+
+# Elements whose text is not part of the readable content
+NON_TEXT_TAGS = ['script', 'style']
+
+# Elements that never have an end tag in HTML
+VOID_TAGS = {
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input',
+    'link', 'meta', 'param', 'source', 'track', 'wbr',
+}
+
+DEFAULT_BACKEND = 'html.parser'
+
+# Encoding declared in an XML declaration or a <meta charset> tag
+DECLARED_ENCODING_RE = re.compile(rb'(?:encoding|charset)\s*=\s*["\']?([A-Za-z0-9._-]+)', re.IGNORECASE)
+
+
+class ExtractedDocument(NamedTuple):
+    """Result of extracting one XHTML document."""
+
+    title: Optional[str]
+    text: str
+    html: str
+
+
+def normalize_text(text: str) -> str:
+    """
+    Collapse raw document text into one phrase per line.
+
+    Lines are stripped, split on double spaces and empty chunks dropped.
+
+    Args:
+        text: Text as produced by the parser
+
+    Returns:
+        Normalized plain text
+    """
+    return '\n'.join([
+        chunk
+        for line in text.splitlines()
+        for chunk in (phrase.strip() for phrase in line.split('  '))
+        if chunk
+    ])
+
+
+def is_unsafe_attribute(name: str, value) -> bool:
+    """
+    Check whether an attribute can execute script.
+
+    Args:
+        name: Attribute name
+        value: Attribute value
+
+    Returns:
+        True for event handlers and javascript: URLs
+    """
+    if name.lower().startswith('on'):
+        return True
+    return isinstance(value, str) and value.strip().lower().startswith('javascript:')
+
+
+class ExtractionBackend:
+    """Base class for HTML extraction backends."""
+
+    name = ''
+
+    @classmethod
+    def is_available(cls) -> bool:
+        """Return True if the backend's dependencies are installed."""
+        return True
+
+    def extract(self, html_content: str) -> ExtractedDocument:
+        """
+        Extract title, plain text and sanitized HTML from a document.
+
+        Args:
+            html_content: XHTML document
+
+        Returns:
+            ExtractedDocument
+        """
+        raise NotImplementedError
+
+
+class BeautifulSoupBackend(ExtractionBackend):
+    """BeautifulSoup with the stdlib `html.parser` tree builder."""
+
+    name = 'html.parser'
+
+    def extract(self, html_content: str) -> ExtractedDocument:
+        soup = BeautifulSoup(html_content, 'html.parser')
+
+        title_tag = soup.find(TITLE_TAGS)
+        title = title_tag.get_text().strip() if title_tag else None
+
+        # get_text() already skips <script> and <style> strings
+        text = normalize_text(soup.get_text())
+
+        for tag in soup(UNSAFE_TAGS):
+            tag.decompose()
+
+        for tag in soup.find_all(True):
+            for attr in list(tag.attrs):
+                if is_unsafe_attribute(attr, tag.attrs[attr]):
+                    del tag.attrs[attr]
+
+        return ExtractedDocument(title, text, str(soup))
+
+
+class LxmlBackend(ExtractionBackend):
+    """libxml2 HTML parser through lxml."""
+
+    name = 'lxml'
+
+    @classmethod
+    def is_available(cls) -> bool:
+        try:
+            import lxml.html  # noqa: F401
+        except ImportError:
+            return False
+        return True
+
+    def extract(self, html_content: str) -> ExtractedDocument:
+        import lxml.html
+
+        # lxml refuses str input that carries an XML encoding declaration
+        root = lxml.html.document_fromstring(html_content.encode('utf-8'))
+
+        title_elements = root.xpath('(//h1|//h2|//title)[1]')
+        title = ''.join(title_elements[0].itertext()).strip() if title_elements else None
+
+        text = normalize_text(''.join(
+            root.xpath('//text()[not(ancestor::script) and not(ancestor::style)]')
+        ))
+
+        for element in root.xpath('|'.join(f'//{tag}' for tag in UNSAFE_TAGS)):
+            if element.getparent() is not None:
+                element.drop_tree()
+
+        for element in root.iter():
+            if not isinstance(element.tag, str):
+                continue
+            for attr, value in list(element.attrib.items()):
+                if is_unsafe_attribute(attr, value):
+                    del element.attrib[attr]
+
+        return ExtractedDocument(title, text, lxml.html.tostring(root, encoding='unicode'))
+
+
+class _StreamingExtractor(HTMLParser):
+    """Single-pass event handler behind StreamingBackend."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.text_parts: List[str] = []
+        self.html_parts: List[str] = []
+        self.title: Optional[str] = None
+        self._title_tag: Optional[str] = None
+        self._title_parts: List[str] = []
+        self._non_text_depth = 0
+        # Unsafe element being skipped, and how many of it are open: other
+        # tags inside it may be unclosed or mismatched
+        self._unsafe_tag: Optional[str] = None
+        self._unsafe_depth = 0
+        self._raw_text_tag: Optional[str] = None
+
+    def _format_attrs(self, attrs) -> str:
+        return ''.join(
+            f' {name}' if value is None else f' {name}="{html.escape(value)}"'
+            for name, value in attrs
+            if not is_unsafe_attribute(name, value)
+        )
+
+    def handle_starttag(self, tag, attrs):
+        self._open(tag, attrs, self_closing=False)
+
+    def handle_startendtag(self, tag, attrs):
+        self._open(tag, attrs, self_closing=True)
+
+    def _open(self, tag, attrs, self_closing):
+        has_end_tag = not self_closing and tag not in VOID_TAGS
+
+        if self._unsafe_depth or tag in UNSAFE_TAGS:
+            if has_end_tag and not self._unsafe_depth:
+                self._unsafe_tag = tag
+            if has_end_tag and tag == self._unsafe_tag:
+                self._unsafe_depth += 1
+            # Script text is still consumed by handle_data, but dropped
+            if tag in NON_TEXT_TAGS and has_end_tag:
+                self._non_text_depth += 1
+            return
+
+        if self.title is None and self._title_tag is None and tag in TITLE_TAGS and not self_closing:
+            self._title_tag = tag
+
+        if tag in NON_TEXT_TAGS and not self_closing:
+            self._non_text_depth += 1
+            self._raw_text_tag = tag
+
+        closing = '/' if self_closing else ''
+        self.html_parts.append(f'<{tag}{self._format_attrs(attrs)}{closing}>')
+
+    def handle_endtag(self, tag):
+        if tag in NON_TEXT_TAGS and self._non_text_depth:
+            self._non_text_depth -= 1
+            self._raw_text_tag = None
+
+        if self._unsafe_depth:
+            if tag == self._unsafe_tag:
+                self._unsafe_depth -= 1
+                if not self._unsafe_depth:
+                    self._unsafe_tag = None
+            return
+
+        if tag in UNSAFE_TAGS:
+            return
+
+        if tag == self._title_tag:
+            self.title = ''.join(self._title_parts).strip()
+            self._title_tag = None
+
+        self.html_parts.append(f'</{tag}>')
+
+    def handle_data(self, data):
+        if not self._non_text_depth:
+            self.text_parts.append(data)
+            if self._title_tag is not None:
+                self._title_parts.append(data)
+
+        if self._unsafe_depth:
+            return
+
+        if self._raw_text_tag:
+            self.html_parts.append(data)
+        else:
+            self.html_parts.append(html.escape(data, quote=False))
+
+    def handle_comment(self, data):
+        if not self._unsafe_depth:
+            self.html_parts.append(f'<!--{data}-->')
+
+    def handle_decl(self, decl):
+        self.html_parts.append(f'<!{decl}>')
+
+    def handle_pi(self, data):
+        self.html_parts.append(f'<?{data}>')
+
+
+class StreamingBackend(ExtractionBackend):
+    """Pure-stdlib streaming parser built on html.parser.HTMLParser."""
+
+    name = 'stream'
+
+    def extract(self, html_content: str) -> ExtractedDocument:
+        extractor = _StreamingExtractor()
+        extractor.feed(html_content)
+        extractor.close()
+
+        return ExtractedDocument(
+            extractor.title,
+            normalize_text(''.join(extractor.text_parts)),
+            ''.join(extractor.html_parts),
+        )
+
+
+EXTRACTION_BACKENDS: Dict[str, Type[ExtractionBackend]] = {
+    backend.name: backend
+    for backend in (BeautifulSoupBackend, LxmlBackend, StreamingBackend)
+}
+
+
+def get_extraction_backend(name: Optional[str] = None) -> ExtractionBackend:
+    """
+    Instantiate an extraction backend.
+
+    Args:
+        name: Backend name; defaults to the EPUB_HTML_EXTRACTION_BACKEND
+            setting, or 'html.parser' outside of Django
+
+    Returns:
+        ExtractionBackend instance; falls back to 'html.parser' when the
+        requested backend's dependencies are missing
+
+    Raises:
+        ValueError: If the backend name is unknown
+    """
+    if name is None:
+        from django.conf import settings
+
+        name = DEFAULT_BACKEND
+        if settings.configured:
+            name = getattr(settings, 'EPUB_HTML_EXTRACTION_BACKEND', DEFAULT_BACKEND)
+
+    backend_class = EXTRACTION_BACKENDS.get(name)
+    if backend_class is None:
+        raise ValueError(
+            f"Unknown HTML extraction backend '{name}'. "
+            f"Available: {', '.join(EXTRACTION_BACKENDS)}"
+        )
+
+    if not backend_class.is_available():
+        logger.warning(f"HTML extraction backend '{name}' is not available, using '{DEFAULT_BACKEND}'")
+        backend_class = EXTRACTION_BACKENDS[DEFAULT_BACKEND]
+
+    return backend_class()
+
+
+def decode_document(content: bytes) -> str:
+    """
+    Decode a raw XHTML document.
+
+    UTF-8 is tried first, then the encoding the document declares; bytes
+    that still do not decode are replaced rather than failing the document.
+
+    Args:
+        content: Raw document bytes
+
+    Returns:
+        Document text
+    """
+    try:
+        return content.decode('utf-8')
+    except UnicodeDecodeError:
+        pass
+
+    encoding = 'utf-8'
+    match = DECLARED_ENCODING_RE.search(content[:1024])
+    if match:
+        try:
+            encoding = codecs.lookup(match.group(1).decode('ascii')).name
+        except LookupError:
+            pass
+    return content.decode(encoding, errors='replace')
+
+
+def extract_document(backend_name: str, content: bytes) -> ExtractedDocument:
+    """
+    Decode and extract one raw document with the named backend.
+
+    Module-level so that it can run in the worker process of a process pool
+    (see EPUBHandler parallel extraction).
+
+    Args:
+        backend_name: Name of a registered backend
+        content: Raw document bytes
+
+    Returns:
+        ExtractedDocument
+    """
+    return get_extraction_backend(backend_name).extract(decode_document(content))
@@ -0,0 +1,647 @@
+"""
+EPUB ingestion helpers.
+
+Validates and parses uploaded EPUB files, either inline or through the
+DB-backed job queue drained by `python manage.py run_ingest_worker`, and
+persists the extracted data so that read endpoints can serve chapters from
+the database instead of re-parsing the archive.
+"""
+
+import logging
+import os
+import re
+import tempfile
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .covers import attach_epub_cover, delete_image_variants
+from .duplicates import update_book_signature
+from .epub_handler import EPUBPackage, parse_epub_file, probe_epub, stream_epub_file
+from .epub_storage import local_epub_path, lock_epub_content
+from .models import Book, BookChapter, BookComment, EpubIngestJob
+from .search import update_book_search_vector, update_chapter_search_vectors
+from .validators import validate_epub_central_directory, validate_epub_file_complete
+
+logger = logging.getLogger(__name__)
+
+# Streamed chapters are inserted in batches of at most this many rows...
+CHAPTER_INSERT_BATCH_SIZE = 100
+# ...or this many bytes of text and HTML, whichever comes first
+CHAPTER_INSERT_BATCH_BYTES = 4 * 1024 * 1024
+
+# Length of the text preview kept in Book.content for EPUB books
+CONTENT_PREVIEW_LENGTH = 1000
+
+# Stored chapters are moved above this index while a book is re-ingested, so
+# new rows never collide on (book, index) with the rows they replace
+REINGEST_INDEX_OFFSET = 1_000_000
+
+# Spine step (and optional idref assertion) at the start of an EPUB CFI
+CFI_SPINE_STEP = re.compile(r"^epubcfi\(/6/(\d+)(\[[^\]]*\])?!")
+
+
+def process_and_validate_epub(
+    epub_source, parallel_workers: Optional[int] = None
+) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+    """
+    Validates and parses an EPUB file from various sources.
+
+    Args:
+        epub_source: Either:
+            - A file path (str) - for already saved files
+            - A FileField - Django model field with save() method
+            - An UploadedFile - from request.FILES
+        parallel_workers: Chapter extraction processes, see parse_epub_file()
+
+    Returns:
+        Tuple of (epub_data dict, error_message str):
+            - On success: ({"table_of_contents": [...], "full_text": "..."}, None)
+            - On failure: (None, "Error description")
+    """
+    temp_path = None
+    should_cleanup = False
+
+    try:
+        # Determine the file path based on source type
+        if isinstance(epub_source, str):
+            # Already a file path
+            file_path = epub_source
+        elif hasattr(epub_source, 'path'):
+            # Django FileField with path attribute
+            file_path = epub_source.path
+        else:
+            # UploadedFile from request.FILES - create temp file
+            temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".epub")
+            temp_path = temp_file.name
+            should_cleanup = True
+
+            for chunk in epub_source.chunks():
+                temp_file.write(chunk)
+            temp_file.close()
+
+            # Reset file pointer for potential reuse
+            epub_source.seek(0)
+
+            file_path = temp_path
+
+        # Validate EPUB structure and safety
+        is_valid, error_message = validate_epub_file_complete(file_path)
+
+        if not is_valid:
+            return None, f"Invalid EPUB file: {error_message}"
+
+        # Parse EPUB file to extract metadata and content
+        epub_data = parse_epub_file(file_path, parallel_workers=parallel_workers)
+
+        return epub_data, None
+
+    except Exception as e:
+        logger.error(f"Error processing EPUB file: {e}")
+        return None, f"Failed to process EPUB file: {str(e)}"
+
+    finally:
+        # Clean up temporary file if created
+        if should_cleanup and temp_path:
+            try:
+                os.remove(temp_path)
+            except OSError as e:
+                logger.warning(f"Failed to remove temp EPUB file {temp_path}: {e}")
+
+
+def probe_uploaded_epub(epub_file) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+    """
+    Quickly check an uploaded EPUB file and read its metadata and TOC.
+
+    Only the central directory, container.xml, the OPF package and the
+    NCX/navigation document are read, straight from the upload, so this
+    takes milliseconds whatever the size of the book. The full archive check
+    and parsing still happen at ingest.
+
+    Args:
+        epub_file: UploadedFile from request.FILES (or a path)
+
+    Returns:
+        Tuple of (probe_epub() result, error_message str)
+    """
+    try:
+        is_valid, error_message = validate_epub_central_directory(epub_file)
+        if not is_valid:
+            return None, f"Invalid EPUB file: {error_message}"
+
+        return probe_epub(epub_file), None
+
+    except Exception as e:
+        logger.warning(f"EPUB probe failed: {e}")
+        return None, str(e) if isinstance(e, ValueError) else f"Failed to read EPUB file: {e}"
+
+    finally:
+        if hasattr(epub_file, 'seek'):
+            epub_file.seek(0)
+
+
+def store_book_chapters(
+    book: Book, chapters: Iterable[Dict], reused: Optional[Dict[int, int]] = None
+) -> int:
+    """
+    Replace the stored chapters of a book with freshly parsed ones.
+
+    Chapters are consumed incrementally and inserted in small batches, so a
+    generator (see stream_epub_file()) is never materialised as a whole.
+    Unchanged-chapter stubs keep their existing row, search vector and
+    stored compressed bodies; only the index, file name, spine position and
+    offset of such a row are updated. Rows no chapter maps to are deleted.
+
+    Args:
+        book: Book the chapters belong to
+        chapters: Chapter dictionaries as returned by EPUBHandler.get_chapters()
+            or yielded by EPUBHandler.iter_chapters()
+        reused: Filled with old index -> new index of the rows that were kept
+
+    Returns:
+        Number of chapters stored
+    """
+    rows = []
+    kept = []
+    new_indexes = []
+    batch_bytes = 0
+    char_offset = 0
+
+    with transaction.atomic():
+        existing = {}
+        for row in BookChapter.objects.filter(book=book).only("id", "index", "content_hash", "char_count"):
+            existing.setdefault(row.content_hash, []).append(row)
+        BookChapter.objects.filter(book=book).update(index=F("index") + REINGEST_INDEX_OFFSET)
+
+        for chapter in chapters:
+            if chapter.get("unchanged"):
+                candidates = existing.get(chapter["content_hash"])
+                if candidates:
+                    row = candidates.pop()
+                    if reused is not None:
+                        reused[row.index] = chapter["id"]
+                    row.index = chapter["id"]
+                    row.file_name = (chapter.get("file_name") or "")[:500]
+                    row.spine_position = chapter.get("spine_position")
+                    row.char_offset = char_offset
+                    char_offset += row.char_count
+                    kept.append(row)
+                    continue
+
+                # More identical documents than stored rows: copy a stored one
+                chapter = {
+                    **chapter,
+                    **BookChapter.objects.filter(book=book, content_hash=chapter["content_hash"])
+                    .values("content", "html_content")
+                    .first(),
+                }
+
+            content = chapter.get("content") or ""
+            html_content = chapter.get("html_content") or ""
+            rows.append(BookChapter(
+                book=book,
+                index=chapter["id"],
+                title=(chapter.get("title") or "")[:500],
+                content=content,
+                html_content=html_content,
+                file_name=(chapter.get("file_name") or "")[:500],
+                content_hash=chapter.get("content_hash") or "",
+                spine_position=chapter.get("spine_position"),
+                char_count=len(content),
+                char_offset=char_offset,
+            ))
+            new_indexes.append(chapter["id"])
+            char_offset += len(content)
+            batch_bytes += len(content) + len(html_content)
+
+            if len(rows) >= CHAPTER_INSERT_BATCH_SIZE or batch_bytes >= CHAPTER_INSERT_BATCH_BYTES:
+                BookChapter.objects.bulk_create(rows)
+                rows = []
+                batch_bytes = 0
+
+        BookChapter.objects.bulk_create(rows)
+        BookChapter.objects.bulk_update(
+            kept, ["index", "file_name", "spine_position", "char_offset"], batch_size=500
+        )
+        BookChapter.objects.filter(book=book, index__gte=REINGEST_INDEX_OFFSET).delete()
+
+        # Total used for progress math; update() keeps updated_at (and ETags) as is
+        Book.objects.filter(pk=book.pk).update(content_length=char_offset)
+        update_chapter_search_vectors(book, new_indexes if kept else None)
+    book.content_length = char_offset
+
+    logger.info(
+        f"Stored {len(new_indexes) + len(kept)} chapters for book '{book.title}' "
+        f"(ID: {book.id}), {len(kept)} unchanged"
+    )
+    return len(new_indexes) + len(kept)
+
+
+def find_ingested_copy(book: Book) -> Optional[Book]:
+    """
+    Find another book already ingested from the same stored EPUB file.
+
+    EPUB files are stored under their content hash (see store_epub_content()),
+    so books sharing a storage name were uploaded with identical content.
+
+    Args:
+        book: Book whose EPUB file is about to be ingested
+
+    Returns:
+        A ready Book with the same epub_file, or None
+    """
+    if not book.epub_file:
+        return None
+    return (
+        Book.objects.filter(epub_file=book.epub_file.name, ingest_status="ready")
+        .exclude(pk=book.pk)
+        .order_by("id")
+        .first()
+    )
+
+
+def copy_ingested_book(source: Book, book: Book) -> int:
+    """
+    Give a book the parsed data of a book with the same EPUB file.
+
+    The table of contents, content preview and chapters are copied, chapter
+    search vectors included, instead of parsing the archive again. Cached
+    compressed chapter responses are not copied; they are keyed by book.
+
+    Args:
+        source: Ready book ingested from the same file (see find_ingested_copy())
+        book: Saved Book instance receiving the data
+
+    Returns:
+        Number of chapters copied
+    """
+    fields = [
+        field.attname
+        for field in BookChapter._meta.concrete_fields
+        if field.attname not in ("id", "book_id")
+    ]
+    count = 0
+
+    with transaction.atomic():
+        BookChapter.objects.filter(book=book).delete()
+        rows = []
+        for values in BookChapter.objects.filter(book=source).values(*fields).iterator(
+            chunk_size=CHAPTER_INSERT_BATCH_SIZE
+        ):
+            rows.append(BookChapter(book=book, **values))
+            if len(rows) >= CHAPTER_INSERT_BATCH_SIZE:
+                BookChapter.objects.bulk_create(rows)
+                count += len(rows)
+                rows = []
+        BookChapter.objects.bulk_create(rows)
+        count += len(rows)
+        update_book_signature(book)
+
+        book.content_length = source.content_length
+        book.table_of_contents = source.table_of_contents
+        if not book.content:
+            book.content = source.content
+        book.save()
+        update_book_search_vector(book)
+
+    logger.info(
+        f"Copied {count} chapters for book '{book.title}' (ID: {book.id}) "
+        f"from book {source.id} with the same EPUB file"
+    )
+    return count
+
+
+def release_epub_file(
+    storage, name: str, book: Optional[Book] = None, job: Optional[EpubIngestJob] = None
+) -> bool:
+    """
+    Delete a stored EPUB file unless something else still references it.
+
+    Content-addressed files can be shared by several books; a file is also
+    kept while an unfinished ingest job may restore it.
+
+    Args:
+        storage: Storage of Book.epub_file
+        name: Storage name of the file
+        book: Book giving up the file, not counted as a reference
+        job: Ingest job giving up the file, not counted as a reference
+
+    Returns:
+        True if the file was deleted
+    """
+    if not name:
+        return False
+
+    with transaction.atomic():
+        # Uploads reusing the file wait until it is deleted (see store_epub_content())
+        lock_epub_content(name)
+
+        books = Book.objects.filter(epub_file=name)
+        jobs = EpubIngestJob.objects.filter(replaced_epub_name=name, status__in=["queued", "running"])
+        if book is not None:
+            books = books.exclude(pk=book.pk)
+            jobs = jobs.exclude(book=book)
+        if job is not None:
+            jobs = jobs.exclude(pk=job.pk)
+
+        if books.exists() or jobs.exists():
+            logger.info(f"Keeping EPUB file {name}: still referenced")
+            return False
+
+        storage.delete(name)
+    return True
+
+
+def reanchor_comments(book: Book, old_epub_name: str, new_epub_path: str, reused: Dict[int, int]) -> int:
+    """
+    Point comment CFIs at the new spine position of chapters that only moved.
+
+    Comments on changed or removed chapters are left as they are: their
+    selected text may no longer exist.
+
+    Args:
+        book: Re-ingested book
+        old_epub_name: Storage name of the replaced EPUB file
+        new_epub_path: Local path of the new EPUB file
+        reused: Old index -> new index of unchanged chapters, as filled by
+            store_book_chapters()
+
+    Returns:
+        Number of comments updated
+    """
+    comments = list(
+        BookComment.objects.filter(book=book, cfi_range__startswith="epubcfi(/6/").only("id", "cfi_range")
+    )
+    if not comments:
+        return 0
+
+    try:
+        with local_epub_path(Book(epub_file=old_epub_name).epub_file) as old_path:
+            if not old_path:
+                return 0
+            old_package = EPUBPackage(old_path)
+            old_positions = old_package.spine_document_positions()
+            old_package.close()
+        new_package = EPUBPackage(new_epub_path)
+        new_positions = new_package.spine_document_positions()
+        new_package.close()
+    except (OSError, ValueError) as e:
+        logger.warning(f"Cannot re-anchor comments of book {book.id}: {e}")
+        return 0
+
+    old_index_by_position = {position: index for index, (position, _) in enumerate(old_positions)}
+
+    updated = []
+    stale = 0
+    for comment in comments:
+        match = CFI_SPINE_STEP.match(comment.cfi_range)
+        if match is None:
+            continue
+        old_index = old_index_by_position.get(int(match.group(1)) // 2 - 1)
+        new_index = reused.get(old_index)
+        if new_index is None:
+            stale += 1
+            continue
+
+        position, idref = new_positions[new_index]
+        prefix = f"epubcfi(/6/{(position + 1) * 2}[{idref}]!"
+        if match.group(0) != prefix:
+            comment.cfi_range = prefix + comment.cfi_range[match.end():]
+            updated.append(comment)
+
+    BookComment.objects.bulk_update(updated, ["cfi_range"], batch_size=500)
+    if stale:
+        logger.info(f"{stale} comments of book {book.id} point into changed chapters")
+    return len(updated)
+
+
+def collect_preview(chapters: Iterable[Dict], preview: List[str]) -> Iterator[Dict]:
+    """
+    Pass chapters through while collecting the start of the book's text.
+
+    Args:
+        chapters: Chapter dictionaries, possibly a generator
+        preview: List the text is appended to, one part per chapter; join
+            it with blank lines once the chapters are consumed
+
+    Yields:
+        The same chapters
+    """
+    length = 0
+    for chapter in chapters:
+        if length < CONTENT_PREVIEW_LENGTH:
+            text = (chapter.get("content") or "")[:CONTENT_PREVIEW_LENGTH - length]
+            preview.append(text)
+            length += len(text) + 2
+        yield chapter
+
+
+def apply_epub_data(book: Book, epub_data: Dict, reused: Optional[Dict[int, int]] = None) -> None:
+    """
+    Update a book with the results of `stream_epub_file` and store its chapters.
+
+    The book's search vector is rebuilt from the new chapter text once the
+    book is saved.
+
+    Args:
+        book: Saved Book instance
+        epub_data: Dictionary returned by stream_epub_file() or
+            parse_epub_file()
+        reused: Passed to store_book_chapters()
+    """
+    preview = []
+    store_book_chapters(book, collect_preview(epub_data.get("chapters", []), preview), reused)
+    update_book_signature(book)
+
+    # Complete only once the chapters are consumed (TOC fallback)
+    book.table_of_contents = epub_data.get("table_of_contents", [])
+
+    # Extract full text to content field for search/preview
+    if not book.content:
+        book.content = "\n\n".join(preview)[:CONTENT_PREVIEW_LENGTH]
+
+    book.save()
+    update_book_search_vector(book)
+
+
+def enqueue_epub_ingest(book: Book, replaced_epub_name: str = "") -> EpubIngestJob:
+    """
+    Queue validation and parsing of a book's EPUB file.
+
+    With EPUB_BACKGROUND_INGESTION disabled the job runs immediately in the
+    calling process, so the returned job is already finished.
+
+    Args:
+        book: Saved Book whose epub_file was just uploaded
+        replaced_epub_name: Storage name of the EPUB file being replaced, if any
+
+    Returns:
+        The created EpubIngestJob
+    """
+    Book.objects.filter(pk=book.pk).update(ingest_status="processing")
+    book.ingest_status = "processing"
+
+    job = EpubIngestJob.objects.create(book=book, replaced_epub_name=replaced_epub_name or "")
+
+    if not getattr(settings, "EPUB_BACKGROUND_INGESTION", False):
+        job.status = "running"
+        job.started_at = timezone.now()
+        job.attempts = 1
+        job.save(update_fields=["status", "started_at", "attempts"])
+        run_ingest_job(job)
+
+    return job
+
+
+def claim_next_ingest_job() -> Optional[EpubIngestJob]:
+    """
+    Take the oldest queued job, skipping rows locked by other workers.
+
+    Returns:
+        The claimed job (marked as running) or None if the queue is empty
+    """
+    with transaction.atomic():
+        job = (
+            EpubIngestJob.objects.select_for_update(skip_locked=True)
+            .filter(status="queued")
+            .order_by("created_at")
+            .first()
+        )
+        if job is None:
+            return None
+
+        job.status = "running"
+        job.started_at = timezone.now()
+        job.attempts += 1
+        job.save(update_fields=["status", "started_at", "attempts"])
+
+    return job
+
+
+def requeue_stale_ingest_jobs(older_than) -> int:
+    """
+    Put back jobs whose worker died while running them.
+
+    Args:
+        older_than: Jobs started before this datetime are requeued
+
+    Returns:
+        Number of requeued jobs
+    """
+    return EpubIngestJob.objects.filter(status="running", started_at__lt=older_than).update(
+        status="queued", stage=""
+    )
+
+
+def _report_progress(job: EpubIngestJob, stage: str, progress: int) -> None:
+    job.stage = stage
+    job.progress = progress
+    EpubIngestJob.objects.filter(pk=job.pk).update(stage=stage, progress=progress)
+
+
+def run_ingest_job(job: EpubIngestJob) -> bool:
+    """
+    Validate, parse and store the EPUB file of a claimed job.
+
+    On failure a replaced EPUB file is restored (a new upload is discarded);
+    on success the replaced file is deleted from storage unless another book
+    shares it.
+
+    Args:
+        job: Job in "running" state
+
+    Returns:
+        True if the book was ingested successfully
+    """
+    book = job.book
+
+    # A new upload identical to an already ingested file reuses its data;
+    # replacements go through incremental re-ingestion to keep comments
+    source = None if job.replaced_epub_name else find_ingested_copy(book)
+    previous_image = book.featured_image.name if book.featured_image else ""
+
+    try:
+        with local_epub_path(book.epub_file) as epub_path:
+            if not epub_path:
+                raise ValueError("EPUB file not found")
+
+            if source is None:
+                _report_progress(job, "validating", 10)
+                is_valid, error_message = validate_epub_file_complete(epub_path)
+                if not is_valid:
+                    raise ValueError(f"Invalid EPUB file: {error_message}")
+
+            _report_progress(job, "storing", 40)
+
+            # Derived data is written in one transaction: a failure leaves the
+            # chapters, TOC and cover of the previous file untouched
+            with transaction.atomic():
+                attach_epub_cover(book, epub_path)
+                book.ingest_status = "ready"
+                if source is not None:
+                    copy_ingested_book(source, book)
+                else:
+                    # Chapters are parsed and stored one at a time; documents whose
+                    # hash matches a stored chapter are not extracted again
+                    known_chapters = dict(
+                        BookChapter.objects.filter(book=book)
+                        .exclude(content_hash="")
+                        .values_list("content_hash", "title")
+                    )
+                    epub_data = stream_epub_file(epub_path, known_chapters)
+                    reused = {}
+                    apply_epub_data(book, epub_data, reused)
+
+                    if job.replaced_epub_name and reused:
+                        reanchor_comments(book, job.replaced_epub_name, epub_path, reused)
+
+    except Exception as e:
+        logger.warning(f"EPUB ingestion failed for book {book.id}: {e}")
+        # The rolled back transaction may have stored an extracted cover
+        if book.featured_image and book.featured_image.name != previous_image:
+            delete_image_variants(book.featured_image_variants, book.featured_image.storage)
+            book.featured_image.delete(save=False)
+        book.refresh_from_db()
+        _fail_ingest_job(job, book, str(e))
+        return False
+
+    if job.replaced_epub_name and job.replaced_epub_name != book.epub_file.name:
+        release_epub_file(book.epub_file.storage, job.replaced_epub_name, job=job)
+
+    job.status = "done"
+    job.stage = ""
+    job.progress = 100
+    job.finished_at = timezone.now()
+    job.save(update_fields=["status", "stage", "progress", "finished_at"])
+
+    logger.info(f"Successfully processed EPUB file for book '{book.title}' (ID: {book.id})")
+    return True
+
+
+def _fail_ingest_job(job: EpubIngestJob, book: Book, error: str) -> None:
+    """Record a failed job and roll the book back to a consistent state."""
+    storage = book.epub_file.storage
+    failed_name = book.epub_file.name
+
+    if job.replaced_epub_name:
+        # Keep serving the previous, already parsed file
+        new_status = "ready"
+        restored_name = job.replaced_epub_name
+    else:
+        new_status = "failed"
+        restored_name = None
+
+    if failed_name and failed_name != restored_name:
+        release_epub_file(storage, failed_name, book=book, job=job)
+
+    Book.objects.filter(pk=book.pk).update(ingest_status=new_status, epub_file=restored_name)
+    book.ingest_status = new_status
+    book.epub_file.name = restored_name
+
+    job.status = "failed"
+    job.error = error
+    job.finished_at = timezone.now()
+    job.save(update_fields=["status", "error", "finished_at"])
@@ -0,0 +1,49 @@
+"""
+Fill the full-text search vectors of existing books and chapters.
+
+Usage:
+    python manage.py backfill_search_index
+    python manage.py backfill_search_index --missing-only
+
+Books are processed one at a time, each in its own transaction, so the
+command can be interrupted and run again.
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from bookapp.models import Book
+from bookapp.search import (
+    is_search_supported,
+    update_book_search_vector,
+    update_chapter_search_vectors,
+)
+
+
+class Command(BaseCommand):
+    help = "Build tsvector search columns for existing books and EPUB chapters"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--missing-only",
+            action="store_true",
+            help="Skip books that already have a search vector",
+        )
+
+    def handle(self, *args, **options):
+        if not is_search_supported():
+            raise CommandError("Full-text search requires PostgreSQL")
+
+        books = Book.objects.only("id", "title", "content_type").order_by("id")
+        if options["missing_only"]:
+            books = books.filter(search_vector__isnull=True)
+
+        total = books.count()
+        for number, book in enumerate(books.iterator(), start=1):
+            with transaction.atomic():
+                if book.content_type == "epub":
+                    update_chapter_search_vectors(book)
+                update_book_search_vector(book)
+            self.stdout.write(f"[{number}/{total}] {book.title}")
+
+        self.stdout.write(self.style.SUCCESS(f"Indexed {total} books"))
@@ -0,0 +1,127 @@
+"""
+Benchmark HTML extraction backends on sample and real EPUB documents.
+
+Usage:
+    python manage.py benchmark_html_extraction
+    python manage.py benchmark_html_extraction path/to/book.epub --repeat 5
+"""
+
+import html
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from bookapp.epub_handler import EPUBPackage
+from bookapp.html_extraction import EXTRACTION_BACKENDS, decode_document, get_extraction_backend
+
+REFERENCE_BACKEND = "html.parser"
+
+
+def build_sample_documents(sample_path, copies=(1, 20)):
+    """
+    Turn a plain text book into XHTML documents of increasing size.
+
+    Lines starting with "Глава" become <h1> headings, other paragraphs <p>.
+    """
+    text = Path(sample_path).read_text(encoding="utf-8")
+    body = []
+    for paragraph in (p.strip() for p in text.split("\n\n")):
+        if not paragraph:
+            continue
+        tag = "h1" if paragraph.startswith("Глава") else "p"
+        body.append(f"<{tag}>{html.escape(paragraph)}</{tag}>")
+
+    documents = []
+    for count in copies:
+        documents.append((
+            f"sample x{count}",
+            [
+                "<?xml version='1.0' encoding='utf-8'?>\n"
+                '<html xmlns="http://www.w3.org/1999/xhtml"><head><title>Sample</title>'
+                "<style>p { text-indent: 1em; }</style></head><body>"
+                + "\n".join(body * count)
+                + "</body></html>"
+            ],
+        ))
+    return documents
+
+
+def load_epub_documents(epub_path):
+    """Read and decode the spine documents of an EPUB file as ingestion does."""
+    package = EPUBPackage(epub_path)
+    try:
+        return [
+            decode_document(package.read_item(entry))
+            for entry in package.spine_documents()
+        ]
+    finally:
+        package.close()
+
+
+class Command(BaseCommand):
+    help = "Compare HTML extraction backends used during EPUB ingestion"
+
+    def add_arguments(self, parser):
+        parser.add_argument("epub_files", nargs="*", help="EPUB files to use as fixtures")
+        parser.add_argument(
+            "--sample",
+            default=str(Path(settings.BASE_DIR).parent / "sample_book.txt"),
+            help="Plain text book used to build synthetic documents",
+        )
+        parser.add_argument("--repeat", type=int, default=3, help="Runs per backend and fixture")
+        parser.add_argument(
+            "--backends",
+            default=",".join(EXTRACTION_BACKENDS),
+            help="Comma-separated backend names",
+        )
+
+    def handle(self, *args, **options):
+        backends = []
+        for name in options["backends"].split(","):
+            name = name.strip()
+            if name not in EXTRACTION_BACKENDS:
+                raise CommandError(f"Unknown backend '{name}'")
+            if not EXTRACTION_BACKENDS[name].is_available():
+                self.stdout.write(self.style.WARNING(f"Skipping unavailable backend '{name}'"))
+                continue
+            backends.append(get_extraction_backend(name))
+
+        fixtures = []
+        if Path(options["sample"]).exists():
+            fixtures.extend(build_sample_documents(options["sample"]))
+        for epub_path in options["epub_files"]:
+            try:
+                fixtures.append((Path(epub_path).name, load_epub_documents(epub_path)))
+            except ValueError as e:
+                raise CommandError(f"{epub_path}: {e}")
+
+        if not fixtures:
+            raise CommandError("No fixtures: pass EPUB files or a --sample text file")
+
+        reference = get_extraction_backend(REFERENCE_BACKEND)
+
+        for fixture_name, documents in fixtures:
+            total_bytes = sum(len(doc.encode("utf-8")) for doc in documents)
+            expected = [reference.extract(doc) for doc in documents]
+            self.stdout.write(
+                f"\n{fixture_name}: {len(documents)} documents, {total_bytes / 1024:.1f} KB"
+            )
+
+            for backend in backends:
+                best = None
+                for _ in range(options["repeat"]):
+                    started = time.perf_counter()
+                    results = [backend.extract(doc) for doc in documents]
+                    elapsed = time.perf_counter() - started
+                    best = elapsed if best is None else min(best, elapsed)
+
+                same_text = all(r.text == e.text for r, e in zip(results, expected))
+                same_title = all(r.title == e.title for r, e in zip(results, expected))
+                self.stdout.write(
+                    f"  {backend.name:<12} {best * 1000:9.2f} ms  "
+                    f"{total_bytes / best / (1024 * 1024):7.2f} MB/s  "
+                    f"text={'same' if same_text else 'DIFF'} "
+                    f"title={'same' if same_title else 'DIFF'}"
+                )
@@ -0,0 +1,337 @@
+"""
+Import a directory of EPUB files as books.
+
+Usage:
+    python manage.py import_epubs /data/library --author admin
+    python manage.py import_epubs /data/library --workers 8 --hashtags classic,gutenberg
+
+Validation and parsing run in a process pool, uploads to storage in a
+thread pool, and rows are written with bulk_create per batch. Imported files
+are recorded in a checkpoint file after every batch, so an interrupted run
+continues where it stopped when started again. A book that fails while being
+indexed is rolled back on its own and listed as failed, with the rest of its
+batch still imported.
+"""
+
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from pathlib import Path
+
+import django
+from django.core.files import File
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.text import slugify
+
+from bookapp.covers import attach_epub_cover, delete_image_variants
+from bookapp.duplicates import update_book_signature
+from bookapp.epub_handler import parse_epub_file
+from bookapp.epub_storage import store_epub_content
+from bookapp.ingestion import release_epub_file, store_book_chapters
+from bookapp.models import Book, CustomUser, Hashtag, transliterate
+from bookapp.search import update_book_search_vector
+from bookapp.validators import validate_epub_file_complete
+
+CHECKPOINT_NAME = ".import_epubs_checkpoint.json"
+
+
+def validate_and_parse(path):
+    """
+    Validate and parse one EPUB file; runs in a worker process.
+
+    Returns:
+        Tuple of (path, epub_data, error_message)
+    """
+    try:
+        is_valid, error_message = validate_epub_file_complete(path)
+        if not is_valid:
+            return path, None, f"Invalid EPUB file: {error_message}"
+        # Files are already spread over processes: extract chapters serially
+        return path, parse_epub_file(path, parallel_workers=0), None
+    except Exception as e:
+        return path, None, f"Failed to process EPUB file: {e}"
+
+
+def load_checkpoint(checkpoint_path):
+    """Read the checkpoint file, returning empty state if it does not exist."""
+    try:
+        with open(checkpoint_path, encoding="utf-8") as f:
+            state = json.load(f)
+    except FileNotFoundError:
+        state = {}
+    return {"done": state.get("done", {}), "failed": state.get("failed", {})}
+
+
+def save_checkpoint(checkpoint_path, state):
+    """Write the checkpoint file atomically."""
+    temp_path = f"{checkpoint_path}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False, indent=1)
+    os.replace(temp_path, checkpoint_path)
+
+
+def allocate_slugs(titles):
+    """
+    Build unique slugs for new books the same way Book.save() does, with
+    a single query for the slugs already taken.
+
+    Args:
+        titles: Titles of the books about to be created
+
+    Returns:
+        List of slugs in the same order
+    """
+    bases = [slugify(transliterate(title)) for title in titles]
+    taken_query = Q()
+    for base in set(bases):
+        taken_query |= Q(slug=base) | Q(slug__startswith=f"{base}-")
+    taken = set(Book.objects.filter(taken_query).values_list("slug", flat=True))
+
+    slugs = []
+    for base in bases:
+        slug = base
+        num = 1
+        while slug in taken:
+            slug = f"{base}-{num}"
+            num += 1
+        taken.add(slug)
+        slugs.append(slug)
+    return slugs
+
+
+class Command(BaseCommand):
+    help = "Bulk import EPUB files from a directory"
+
+    def add_arguments(self, parser):
+        parser.add_argument("directory", help="Directory searched recursively for *.epub files")
+        parser.add_argument("--author", help="Username recorded as the uploader of the books")
+        parser.add_argument(
+            "--visibility",
+            default="public",
+            choices=["public", "personal"],
+            help="Visibility of the imported books",
+        )
+        parser.add_argument("--category", default=None, help="Category of the imported books")
+        parser.add_argument("--hashtags", default="", help="Comma-separated hashtags added to every book")
+        parser.add_argument("--publish", action="store_true", help="Import books as published, not drafts")
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count() or 1,
+            help="Processes validating and parsing EPUB files",
+        )
+        parser.add_argument(
+            "--upload-workers", type=int, default=8, help="Threads uploading files to storage"
+        )
+        parser.add_argument("--batch-size", type=int, default=50, help="Books written per transaction")
+        parser.add_argument(
+            "--checkpoint",
+            default=None,
+            help=f"Checkpoint file (default: <directory>/{CHECKPOINT_NAME})",
+        )
+
+    def handle(self, *args, **options):
+        directory = Path(options["directory"])
+        if not directory.is_dir():
+            raise CommandError(f"{directory} is not a directory")
+
+        self.author = None
+        if options["author"]:
+            try:
+                self.author = CustomUser.objects.get(username=options["author"])
+            except CustomUser.DoesNotExist:
+                raise CommandError(f"User '{options['author']}' does not exist")
+
+        category = options["category"]
+        if category and category not in dict(Book.CATEGORY):
+            raise CommandError(f"Unknown category '{category}'")
+
+        self.hashtags = [
+            Hashtag.objects.get_or_create(name=name)[0]
+            for name in (n.strip().lstrip("#").lower() for n in options["hashtags"].split(","))
+            if name
+        ]
+        self.options = options
+
+        self.directory = directory
+        checkpoint_path = options["checkpoint"] or str(directory / CHECKPOINT_NAME)
+        state = load_checkpoint(checkpoint_path)
+
+        all_paths = sorted(directory.rglob("*.epub"))
+        paths = [str(path) for path in all_paths if self.relative(path) not in state["done"]]
+        self.stdout.write(
+            f"{len(paths)} files to import, {len(all_paths) - len(paths)} already imported"
+        )
+        if not paths:
+            return
+
+        started = time.perf_counter()
+        imported = failed = total_bytes = 0
+        batch = []
+
+        def flush():
+            nonlocal imported, failed, total_bytes
+            created, errors = self.import_batch(batch)
+            for path, book_id in created:
+                state["done"][self.relative(path)] = book_id
+                state["failed"].pop(self.relative(path), None)
+                total_bytes += os.path.getsize(path)
+            for path, error in errors:
+                state["failed"][self.relative(path)] = error
+                self.stdout.write(self.style.ERROR(f"{path}: {error}"))
+            imported += len(created)
+            failed += len(errors)
+            save_checkpoint(checkpoint_path, state)
+            batch.clear()
+
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f"{imported + failed}/{len(paths)} processed, {imported} imported, "
+                f"{failed} failed ({imported / elapsed:.2f} books/s)"
+            )
+
+        # Forked workers must not inherit open database connections
+        connections.close_all()
+
+        # Keep a bounded number of parsed books in flight to cap memory use
+        max_pending = max(1, options["workers"]) * 2
+        pending_paths = iter(paths)
+        with ProcessPoolExecutor(max_workers=max(1, options["workers"]), initializer=django.setup) as pool:
+            futures = set()
+            while True:
+                while len(futures) < max_pending:
+                    path = next(pending_paths, None)
+                    if path is None:
+                        break
+                    futures.add(pool.submit(validate_and_parse, path))
+                if not futures:
+                    break
+
+                done, futures = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    path, epub_data, error = future.result()
+                    if error:
+                        failed += 1
+                        state["failed"][self.relative(path)] = error
+                        self.stdout.write(self.style.ERROR(f"{path}: {error}"))
+                        continue
+                    batch.append((path, epub_data))
+                    if len(batch) >= options["batch_size"]:
+                        flush()
+
+        if batch:
+            flush()
+        else:
+            save_checkpoint(checkpoint_path, state)
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {imported} books, {failed} failed in {elapsed:.1f} s: "
+            f"{imported / elapsed:.2f} books/s, {total_bytes / elapsed / (1024 * 1024):.2f} MB/s"
+        ))
+
+    def relative(self, path):
+        """Checkpoint key of a file: its path relative to the imported directory."""
+        return str(Path(path).relative_to(self.directory))
+
+    def upload(self, path):
+        """Save an EPUB file to storage under its content hash."""
+        storage = Book._meta.get_field("epub_file").storage
+        with open(path, "rb") as f:
+            return store_epub_content(File(f), storage)[0]
+
+    def import_batch(self, batch):
+        """
+        Upload, create and index the books of one batch.
+
+        Every book is indexed in its own savepoint: a book that fails is
+        deleted again, with its extracted cover, and the others are kept.
+
+        Returns:
+            Tuple of (list of (path, book id) pairs of the created books,
+            list of (path, error message) pairs of the failed ones)
+        """
+        with ThreadPoolExecutor(max_workers=max(1, self.options["upload_workers"])) as uploads:
+            file_names = list(uploads.map(self.upload, [path for path, _ in batch]))
+
+        titles = []
+        for path, epub_data in batch:
+            title = (epub_data["metadata"].get("title") or "").strip()
+            titles.append((title if title and title != "Unknown" else Path(path).stem)[:255])
+        slugs = allocate_slugs(titles)
+
+        now = timezone.now()
+        books = []
+        for (path, epub_data), file_name, title, slug in zip(batch, file_names, titles, slugs):
+            metadata = epub_data["metadata"]
+            book_author = metadata.get("author") or ""
+            books.append(Book(
+                title=title,
+                slug=slug,
+                book_author="" if book_author == "Unknown" else book_author[:255],
+                description=metadata.get("description") or "",
+                content=epub_data.get("full_text", "")[:1000],
+                content_type="epub",
+                epub_file=file_name,
+                table_of_contents=epub_data.get("table_of_contents", []),
+                ingest_status="ready",
+                author=self.author,
+                visibility=self.options["visibility"],
+                category=self.options["category"],
+                is_draft=not self.options["publish"],
+                published_date=now if self.options["publish"] else None,
+            ))
+
+        storage = Book._meta.get_field("epub_file").storage
+        created = []
+        errors = []
+        try:
+            with transaction.atomic():
+                Book.objects.bulk_create(books)
+                if self.hashtags:
+                    Through = Book.hashtags.through
+                    Through.objects.bulk_create([
+                        Through(book_id=book.id, hashtag_id=hashtag.id)
+                        for book in books
+                        for hashtag in self.hashtags
+                    ])
+                for book, (path, epub_data) in zip(books, batch):
+                    try:
+                        with transaction.atomic():
+                            store_book_chapters(book, epub_data.get("chapters", []))
+                            update_book_search_vector(book)
+                            update_book_signature(book)
+                            attach_epub_cover(book, path)
+                    except Exception as e:
+                        self.discard(book)
+                        errors.append((path, f"Failed to import EPUB file: {e}"))
+                    else:
+                        created.append((path, book))
+        except Exception:
+            for file_name in set(file_names):
+                release_epub_file(storage, file_name)
+            raise
+
+        # Files of failed books are only unreferenced once their rows are gone
+        created_names = {book.epub_file.name for _, book in created}
+        for file_name in set(file_names) - created_names:
+            release_epub_file(storage, file_name)
+
+        # Uploads run outside this transaction, so a reused file may have been
+        # released by a concurrent delete before the books were committed
+        for path, book in created:
+            if not storage.exists(book.epub_file.name):
+                self.upload(path)
+
+        return [(path, book.id) for path, book in created], errors
+
+    def discard(self, book):
+        """Delete a book whose indexing failed, with any cover extracted for it."""
+        if book.featured_image:
+            delete_image_variants(book.featured_image_variants, book.featured_image.storage)
+            book.featured_image.delete(save=False)
+        Book.objects.filter(pk=book.pk).delete()
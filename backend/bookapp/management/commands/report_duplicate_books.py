@@ -0,0 +1,99 @@
+"""
+Report books whose texts are probably near copies of each other.
+
+Usage:
+    python manage.py report_duplicate_books
+    python manage.py report_duplicate_books --min-similarity 0.9
+    python manage.py report_duplicate_books --backfill
+
+Candidate pairs come from the LSH buckets books share, so the report never
+compares every book with every other one. With --backfill, books without a
+MinHash signature (uploaded before signatures existed) are signed first.
+"""
+
+from itertools import combinations, groupby
+
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+
+from bookapp.duplicates import (
+    DUPLICATE_MIN_SIMILARITY,
+    LSH_MAX_CANDIDATES,
+    estimate_similarity,
+    unpack_signature,
+    update_book_signature,
+)
+from bookapp.models import Book, BookLSHBucket, BookSignature
+
+
+class Command(BaseCommand):
+    help = "List possible duplicate books found through MinHash LSH buckets"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--min-similarity",
+            type=float,
+            default=DUPLICATE_MIN_SIMILARITY,
+            help="Lowest estimated text similarity reported (0-1)",
+        )
+        parser.add_argument(
+            "--backfill",
+            action="store_true",
+            help="Compute missing signatures before reporting",
+        )
+
+    def handle(self, *args, **options):
+        if options["backfill"]:
+            self.backfill()
+
+        shared_keys = (
+            BookLSHBucket.objects.values("key")
+            .annotate(books=Count("book"))
+            .filter(books__gt=1, books__lte=LSH_MAX_CANDIDATES)
+            .values("key")
+        )
+        buckets = (
+            BookLSHBucket.objects.filter(key__in=shared_keys)
+            .order_by("key")
+            .values_list("key", "book_id")
+        )
+
+        pairs = set()
+        for _, rows in groupby(buckets.iterator(), key=lambda row: row[0]):
+            book_ids = sorted(book_id for _, book_id in rows)
+            pairs.update(combinations(book_ids, 2))
+
+        if not pairs:
+            self.stdout.write(self.style.SUCCESS("No possible duplicates found"))
+            return
+
+        book_ids = {book_id for pair in pairs for book_id in pair}
+        signatures = {
+            book_id: unpack_signature(minhash)
+            for book_id, minhash in BookSignature.objects.filter(book_id__in=book_ids).values_list(
+                "book_id", "minhash"
+            )
+        }
+        titles = dict(Book.objects.filter(id__in=book_ids).values_list("id", "title"))
+
+        found = []
+        for first, second in pairs:
+            similarity = estimate_similarity(signatures[first], signatures[second])
+            if similarity >= options["min_similarity"]:
+                found.append((similarity, first, second))
+
+        for similarity, first, second in sorted(found, reverse=True):
+            self.stdout.write(
+                f"{similarity:.2f}  #{first} {titles[first]}  <->  #{second} {titles[second]}"
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(found)} possible duplicate pairs out of {len(pairs)} LSH candidates"
+        ))
+
+    def backfill(self):
+        """Sign every book that has no MinHash signature yet."""
+        books = Book.objects.filter(signature__isnull=True).only("id", "title", "content", "content_type")
+        total = books.count()
+        for number, book in enumerate(books.order_by("id").iterator(), start=1):
+            update_book_signature(book)
+            self.stdout.write(f"[{number}/{total}] {book.title}")
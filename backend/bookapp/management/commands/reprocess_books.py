@@ -0,0 +1,242 @@
+"""
+Re-parse stored EPUB books and rewrite their derived data.
+
+Usage:
+    python manage.py reprocess_books
+    python manage.py reprocess_books --since 2025-01-01 --workers 2 --max-rate 0.5
+    python manage.py reprocess_books --ids 12,40,41
+    python manage.py reprocess_books --toc-only
+
+Regenerates the table of contents, content preview, stored chapters, search
+vectors and near-duplicate signatures of EPUB books. With --toc-only just the table of contents is
+rebuilt from the NCX/navigation document, without extracting chapters. Books are streamed in id order and processed in
+batches; after every batch the last processed id is written to a cursor file,
+so an interrupted run resumes from there (use --reset to start over).
+"""
+
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from bookapp.duplicates import update_book_signature
+from bookapp.epub_handler import probe_epub
+from bookapp.epub_storage import local_epub_path
+from bookapp.ingestion import process_and_validate_epub, store_book_chapters
+from bookapp.models import Book, BookChapter
+from bookapp.search import update_book_search_vector
+
+
+def reparse_book(book_id, epub_name):
+    """
+    Fetch and parse the EPUB file of a book; runs in a worker process.
+
+    Returns:
+        Tuple of (book_id, epub_data, error_message)
+    """
+    epub_file = Book(epub_file=epub_name).epub_file
+    try:
+        with local_epub_path(epub_file) as epub_path:
+            if not epub_path:
+                return book_id, None, "EPUB file not found"
+            # Books are already spread over processes: extract chapters serially
+            epub_data, error = process_and_validate_epub(epub_path, parallel_workers=0)
+    except Exception as e:
+        return book_id, None, f"Failed to read EPUB file: {e}"
+    return book_id, epub_data, error
+
+
+def reprobe_book_toc(book_id, epub_name):
+    """
+    Rebuild the table of contents of a book from its package documents only;
+    runs in a worker process.
+
+    Returns:
+        Tuple of (book_id, {"table_of_contents": [...]}, error_message)
+    """
+    epub_file = Book(epub_file=epub_name).epub_file
+    try:
+        with local_epub_path(epub_file) as epub_path:
+            if not epub_path:
+                return book_id, None, "EPUB file not found"
+            probe = probe_epub(epub_path)
+    except Exception as e:
+        return book_id, None, f"Failed to read EPUB file: {e}"
+    return book_id, {"table_of_contents": probe["table_of_contents"]}, None
+
+
+class Command(BaseCommand):
+    help = "Regenerate TOC, chapters and search data of existing EPUB books"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--since",
+            help="Only books created on or after this date (YYYY-MM-DD)",
+        )
+        parser.add_argument("--ids", help="Comma-separated book ids")
+        parser.add_argument("--workers", type=int, default=2, help="Processes parsing EPUB files")
+        parser.add_argument("--batch-size", type=int, default=20, help="Books written per transaction")
+        parser.add_argument(
+            "--max-rate",
+            type=float,
+            default=0,
+            help="Maximum books per second (0 = unlimited)",
+        )
+        parser.add_argument(
+            "--cursor",
+            default=str(Path(settings.BASE_DIR) / ".reprocess_books_cursor.json"),
+            help="File storing the resume position",
+        )
+        parser.add_argument("--reset", action="store_true", help="Ignore the saved cursor")
+        parser.add_argument(
+            "--toc-only",
+            action="store_true",
+            help="Only rebuild tables of contents, without re-extracting chapters",
+        )
+
+    def handle(self, *args, **options):
+        books = (
+            Book.objects.filter(content_type="epub")
+            .exclude(epub_file="")
+            .exclude(epub_file__isnull=True)
+            .only("id", "epub_file")
+            .order_by("id")
+        )
+
+        if options["since"]:
+            try:
+                since = datetime.strptime(options["since"], "%Y-%m-%d")
+            except ValueError:
+                raise CommandError("--since must be a date in YYYY-MM-DD format")
+            books = books.filter(created_at__gte=timezone.make_aware(since))
+
+        if options["ids"]:
+            try:
+                ids = [int(book_id) for book_id in options["ids"].split(",") if book_id.strip()]
+            except ValueError:
+                raise CommandError("--ids must be a comma-separated list of integers")
+            books = books.filter(id__in=ids)
+
+        cursor_path = options["cursor"]
+        cursor = {"last_id": 0, "processed": 0, "failed": {}}
+        if not options["reset"] and os.path.exists(cursor_path):
+            with open(cursor_path, encoding="utf-8") as f:
+                cursor.update(json.load(f))
+            self.stdout.write(f"Resuming after book {cursor['last_id']}")
+        books = books.filter(id__gt=cursor["last_id"])
+
+        total = books.count()
+        self.stdout.write(f"{total} books to reprocess")
+        if not total:
+            return
+
+        workers = max(1, options["workers"])
+        batch_size = max(1, options["batch_size"])
+        self.toc_only = options["toc_only"]
+        started = time.perf_counter()
+        done = failed = 0
+
+        # Workers are spawned, not forked: the streaming query keeps a
+        # database connection open that children must not inherit
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=django.setup,
+        ) as pool:
+            batch = []
+            for book in books.iterator(chunk_size=batch_size):
+                batch.append((book.id, book.epub_file.name))
+                if len(batch) < batch_size:
+                    continue
+                done, failed = self.process_batch(pool, batch, cursor, cursor_path, done, failed)
+                self.throttle(done + failed, started, options["max_rate"])
+                self.stdout.write(f"{done + failed}/{total} books, {failed} failed")
+                batch = []
+
+            if batch:
+                done, failed = self.process_batch(pool, batch, cursor, cursor_path, done, failed)
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Reprocessed {done} books, {failed} failed in {elapsed:.1f} s "
+            f"({(done + failed) / elapsed:.2f} books/s)"
+        ))
+
+    def process_batch(self, pool, batch, cursor, cursor_path, done, failed):
+        """
+        Parse a batch in the pool, write the results and advance the cursor.
+
+        Returns:
+            Updated (done, failed) counters
+        """
+        worker = reprobe_book_toc if self.toc_only else reparse_book
+        results = list(pool.map(worker, *zip(*batch)))
+
+        with transaction.atomic():
+            for book_id, epub_data, error in results:
+                if error:
+                    failed += 1
+                    cursor["failed"][str(book_id)] = error
+                    self.stdout.write(self.style.ERROR(f"Book {book_id}: {error}"))
+                    continue
+
+                self.write_derived_data(book_id, epub_data)
+                cursor["failed"].pop(str(book_id), None)
+                done += 1
+
+        cursor["last_id"] = batch[-1][0]
+        cursor["processed"] += len(batch)
+        temp_path = f"{cursor_path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(cursor, f, indent=1)
+        os.replace(temp_path, cursor_path)
+
+        return done, failed
+
+    def write_derived_data(self, book_id, epub_data):
+        """Replace the parsed data of one book."""
+        if self.toc_only:
+            toc = epub_data["table_of_contents"]
+            if not toc:
+                # No TOC of its own: list the stored chapters, as ingestion does
+                toc = [
+                    {"id": index, "title": title, "level": 0, "chapter_id": index, "anchor": None}
+                    for index, title in BookChapter.objects.filter(book_id=book_id)
+                    .order_by("index")
+                    .values_list("index", "title")
+                ]
+            Book.objects.filter(pk=book_id).update(
+                table_of_contents=toc,
+                updated_at=timezone.now(),
+            )
+            return
+
+        book = Book.objects.only("id", "title", "content_type").get(pk=book_id)
+
+        # updated_at is bumped so chapter and TOC ETags change
+        Book.objects.filter(pk=book_id).update(
+            table_of_contents=epub_data.get("table_of_contents", []),
+            content=epub_data.get("full_text", "")[:1000],
+            ingest_status="ready",
+            updated_at=timezone.now(),
+        )
+        store_book_chapters(book, epub_data.get("chapters", []))
+        update_book_search_vector(book)
+        update_book_signature(book)
+
+    def throttle(self, processed, started, max_rate):
+        """Sleep as long as needed to stay under max_rate books per second."""
+        if max_rate <= 0:
+            return
+        ahead = processed / max_rate - (time.perf_counter() - started)
+        if ahead > 0:
+            time.sleep(ahead)
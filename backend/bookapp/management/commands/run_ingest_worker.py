@@ -0,0 +1,56 @@
+"""
+Drain the EPUB ingestion queue.
+
+Usage:
+    python manage.py run_ingest_worker
+    python manage.py run_ingest_worker --once
+
+Several workers can run side by side: jobs are claimed with
+SELECT ... FOR UPDATE SKIP LOCKED.
+"""
+
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.utils import timezone
+
+from bookapp.ingestion import claim_next_ingest_job, requeue_stale_ingest_jobs, run_ingest_job
+
+
+class Command(BaseCommand):
+    help = "Validate and parse queued EPUB uploads"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="Exit when the queue is empty")
+        parser.add_argument(
+            "--poll-interval", type=float, default=2.0, help="Seconds to sleep when the queue is empty"
+        )
+        parser.add_argument(
+            "--stale-after",
+            type=int,
+            default=30,
+            help="Requeue running jobs started more than this many minutes ago",
+        )
+
+    def handle(self, *args, **options):
+        requeued = requeue_stale_ingest_jobs(timezone.now() - timedelta(minutes=options["stale_after"]))
+        if requeued:
+            self.stdout.write(self.style.WARNING(f"Requeued {requeued} stale jobs"))
+
+        while True:
+            close_old_connections()
+            job = claim_next_ingest_job()
+
+            if job is None:
+                if options["once"]:
+                    break
+                time.sleep(options["poll_interval"])
+                continue
+
+            self.stdout.write(f"Processing job {job.id} for book {job.book_id}")
+            if run_ingest_job(job):
+                self.stdout.write(self.style.SUCCESS(f"Job {job.id} done"))
+            else:
+                self.stdout.write(self.style.ERROR(f"Job {job.id} failed: {job.error}"))
@@ -0,0 +1,33 @@
+# Generated by Django 5.1.2 on 2026-10-16 23:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookapp', '0002_auto_20260213_1616'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookChapter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('index', models.PositiveIntegerField(help_text='Позиция документа в spine EPUB (совпадает с chapter_id в API)', verbose_name='Номер главы')),
+                ('title', models.CharField(blank=True, max_length=500, verbose_name='Название')),
+                ('content', models.TextField(blank=True, verbose_name='Текст')),
+                ('html_content', models.TextField(blank=True, verbose_name='HTML')),
+                ('file_name', models.CharField(blank=True, max_length=500, verbose_name='Файл в EPUB')),
+                ('book', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='epub_chapters', to='bookapp.book', verbose_name='Книга')),
+            ],
+            options={
+                'verbose_name': 'Глава книги',
+                'verbose_name_plural': 'Главы книг',
+                'ordering': ['book', 'index'],
+                'indexes': [models.Index(fields=['book', 'index'], name='bookapp_boo_book_id_8106cf_idx')],
+                'unique_together': {('book', 'index')},
+            },
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.1.2 on 2026-10-16 23:22
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookapp', '0003_bookchapter'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='ingest_status',
+            field=models.CharField(choices=[('ready', 'Готово'), ('processing', 'Обрабатывается'), ('failed', 'Ошибка обработки')], default='ready', max_length=20, verbose_name='Статус обработки EPUB'),
+        ),
+        migrations.CreateModel(
+            name='EpubIngestJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('queued', 'В очереди'), ('running', 'Выполняется'), ('done', 'Готово'), ('failed', 'Ошибка')], default='queued', max_length=20, verbose_name='Статус')),
+                ('stage', models.CharField(blank=True, max_length=50, verbose_name='Этап')),
+                ('progress', models.PositiveSmallIntegerField(default=0, verbose_name='Прогресс (%)')),
+                ('error', models.TextField(blank=True, verbose_name='Ошибка')),
+                ('replaced_epub_name', models.CharField(blank=True, help_text='Предыдущий EPUB: удаляется после успешной обработки, восстанавливается при ошибке', max_length=500, verbose_name='Заменяемый файл')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='Попытки')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='Начало')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Окончание')),
+                ('book', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ingest_jobs', to='bookapp.book', verbose_name='Книга')),
+            ],
+            options={
+                'verbose_name': 'Обработка EPUB',
+                'verbose_name_plural': 'Обработка EPUB',
+                'ordering': ['created_at'],
+                'indexes': [models.Index(fields=['status', 'created_at'], name='bookapp_epu_status_aa3525_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.1.2 on 2026-10-16 23:28
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookapp', '0004_epub_ingest_jobs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookChapterBody',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('variant', models.CharField(help_text='Формат и номер сегмента, например html:0', max_length=50, verbose_name='Вариант')),
+                ('encoding', models.CharField(max_length=10, verbose_name='Кодирование')),
+                ('etag', models.CharField(max_length=100, verbose_name='ETag')),
+                ('body', models.BinaryField(verbose_name='Тело ответа')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('chapter', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='bodies', to='bookapp.bookchapter', verbose_name='Глава')),
+            ],
+            options={
+                'verbose_name': 'Сжатый ответ главы',
+                'verbose_name_plural': 'Сжатые ответы глав',
+                'unique_together': {('chapter', 'variant', 'encoding')},
+            },
+        ),
+    ]
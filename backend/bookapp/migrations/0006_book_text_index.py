@@ -0,0 +1,29 @@
+# Generated by Django 5.1.2 on 2026-10-16 23:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookapp', '0005_chapter_bodies'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookTextIndex',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content_length', models.PositiveIntegerField(default=0, verbose_name='Длина текста')),
+                ('paragraph_boundaries', models.BinaryField(help_text='Смещения символов, массив uint32', verbose_name='Начала абзацев')),
+                ('sentence_boundaries', models.BinaryField(help_text='Смещения символов, массив uint32', verbose_name='Начала предложений')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('book', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='text_index', to='bookapp.book', verbose_name='Книга')),
+            ],
+            options={
+                'verbose_name': 'Индекс страниц книги',
+                'verbose_name_plural': 'Индексы страниц книг',
+            },
+        ),
+    ]
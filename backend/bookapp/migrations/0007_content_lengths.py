@@ -0,0 +1,48 @@
+# Generated by Django 5.1.2 on 2026-10-16 23:31
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce, Length
+
+
+def backfill_content_lengths(apps, schema_editor):
+    Book = apps.get_model('bookapp', 'Book')
+    BookChapter = apps.get_model('bookapp', 'BookChapter')
+
+    Book.objects.filter(content_type='plaintext').update(content_length=Coalesce(Length('content'), 0))
+    BookChapter.objects.update(char_count=Coalesce(Length('content'), 0))
+
+    book_ids = BookChapter.objects.values_list('book_id', flat=True).distinct()
+    for book_id in book_ids:
+        offset = 0
+        for chapter_id, char_count in (
+            BookChapter.objects.filter(book_id=book_id).order_by('index').values_list('id', 'char_count')
+        ):
+            BookChapter.objects.filter(id=chapter_id).update(char_offset=offset)
+            offset += char_count
+        Book.objects.filter(id=book_id).update(content_length=offset)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookapp', '0006_book_text_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='content_length',
+            field=models.PositiveIntegerField(default=0, help_text='Количество символов: текст книги (TXT) или всех глав (EPUB)', verbose_name='Длина текста'),
+        ),
+        migrations.AddField(
+            model_name='bookchapter',
+            name='char_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Количество символов'),
+        ),
+        migrations.AddField(
+            model_name='bookchapter',
+            name='char_offset',
+            field=models.PositiveIntegerField(default=0, help_text='Количество символов во всех предыдущих главах', verbose_name='Смещение главы'),
+        ),
+        migrations.RunPython(backfill_content_lengths, migrations.RunPython.noop),
+    ]
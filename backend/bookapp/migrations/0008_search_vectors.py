@@ -0,0 +1,33 @@
+# Generated by Django 5.1.2 on 2026-10-16 23:33
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookapp', '0007_content_lengths'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, help_text='tsvector названия, автора, описания и текста (russian + english)', null=True, verbose_name='Поисковый индекс'),
+        ),
+        migrations.AddField(
+            model_name='bookchapter',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True, verbose_name='Поисковый индекс'),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='book_search_vector_gin'),
+        ),
+        migrations.AddIndex(
+            model_name='bookchapter',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='chapter_search_vector_gin'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.2 on 2026-10-16 23:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookapp', '0008_search_vectors'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='featured_image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False, help_text='Уменьшенные копии обложки (WebP/JPEG) для карточек и страницы книги', verbose_name='Варианты обложки'),
+        ),
+    ]
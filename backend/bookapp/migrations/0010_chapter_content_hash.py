@@ -0,0 +1,18 @@
+# Generated by Django 5.1.2 on 2026-10-17 00:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookapp', '0009_cover_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bookchapter',
+            name='content_hash',
+            field=models.CharField(blank=True, help_text='SHA-256 исходного документа из EPUB; неизменённые главы не извлекаются повторно', max_length=64, verbose_name='Хеш документа'),
+        ),
+    ]
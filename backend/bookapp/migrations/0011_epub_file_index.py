@@ -0,0 +1,20 @@
+# Generated by Django 5.1.2 on 2026-10-17 00:07
+
+import bookapp.models
+import bookapp.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookapp', '0010_chapter_content_hash'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='book',
+            name='epub_file',
+            field=models.FileField(blank=True, db_index=True, null=True, upload_to=bookapp.models.UniqueFileNameGenerator('epub_files/'), validators=[bookapp.validators.validate_epub_file_extension, bookapp.validators.validate_epub_file_size, bookapp.validators.validate_file_is_not_empty]),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.1.2 on 2026-10-17 00:09
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookapp', '0011_epub_file_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookLSHBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.BigIntegerField(db_index=True, help_text='Хеш номера полосы и её значений в сигнатуре', verbose_name='Ключ корзины')),
+                ('book', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lsh_buckets', to='bookapp.book', verbose_name='Книга')),
+            ],
+            options={
+                'verbose_name': 'LSH-корзина книги',
+                'verbose_name_plural': 'LSH-корзины книг',
+            },
+        ),
+        migrations.CreateModel(
+            name='BookSignature',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('minhash', models.BinaryField(help_text='Минимальные хеши шинглов текста, массив uint32', verbose_name='MinHash')),
+                ('shingle_count', models.PositiveIntegerField(default=0, verbose_name='Количество шинглов')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('book', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='signature', to='bookapp.book', verbose_name='Книга')),
+            ],
+            options={
+                'verbose_name': 'Сигнатура текста книги',
+                'verbose_name_plural': 'Сигнатуры текстов книг',
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.2 on 2026-10-17 00:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookapp', '0012_book_signature'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bookchapter',
+            name='spine_position',
+            field=models.PositiveIntegerField(blank=True, help_text='Номер itemref среди всех элементов spine, включая не-XHTML; на него ссылаются CFI', null=True, verbose_name='Позиция в spine'),
+        ),
+    ]
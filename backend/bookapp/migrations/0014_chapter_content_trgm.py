@@ -0,0 +1,20 @@
+# Generated by Django 5.1.2 on 2026-10-17 00:36
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookapp', '0013_bookchapter_spine_position'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddIndex(
+            model_name='bookchapter',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['content'], name='chapter_content_trgm', opclasses=['gin_trgm_ops']),
+        ),
+    ]
@@ -1,5 +1,7 @@
 from django.conf import settings
 from django.contrib.auth.models import AbstractUser
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.core.exceptions import ValidationError
 from django.db import models
 from django.utils import timezone
@@ -168,11 +170,22 @@ class Book(models.Model):
         ("epub", "EPUB"),
     )
 
+    INGEST_STATUS = (
+        ("ready", "Готово"),
+        ("processing", "Обрабатывается"),
+        ("failed", "Ошибка обработки"),
+    )
+
     title = models.CharField(max_length=255)
     book_author = models.CharField(max_length=255, blank=True, default="", verbose_name="Автор книги")
     slug = models.SlugField(max_length=255, unique=True, blank=True)
     description = models.TextField(blank=True, null=True)
     content = models.TextField(blank=True, null=True)
+    content_length = models.PositiveIntegerField(
+        default=0,
+        verbose_name="Длина текста",
+        help_text="Количество символов: текст книги (TXT) или всех глав (EPUB)",
+    )
     content_type = models.CharField(
         max_length=20, choices=CONTENT_TYPE, default="plaintext"
     )
@@ -180,6 +193,9 @@ class Book(models.Model):
         upload_to=UniqueFileNameGenerator("epub_files/"),
         blank=True,
         null=True,
+        # Uploads are stored under their SHA-256 (see store_epub_content());
+        # indexed to count the books sharing a file
+        db_index=True,
         validators=[
             validate_epub_file_extension,
             validate_epub_file_size,
@@ -187,6 +203,12 @@ class Book(models.Model):
         ],
     )
     table_of_contents = models.JSONField(blank=True, null=True)
+    ingest_status = models.CharField(
+        max_length=20,
+        choices=INGEST_STATUS,
+        default="ready",
+        verbose_name="Статус обработки EPUB",
+    )
     author = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.SET_NULL,
@@ -199,6 +221,13 @@ class Book(models.Model):
     is_draft = models.BooleanField(default=True)
     category = models.CharField(max_length=255, choices=CATEGORY, blank=True, null=True)
     featured_image = models.ImageField(upload_to=UniqueFileNameGenerator("book_img/"), blank=True, null=True)
+    featured_image_variants = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        verbose_name="Варианты обложки",
+        help_text="Уменьшенные копии обложки (WebP/JPEG) для карточек и страницы книги",
+    )
     visibility = models.CharField(
         max_length=20,
         choices=VISIBILITY_CHOICES,
@@ -216,9 +245,18 @@ class Book(models.Model):
         blank=True,
         related_name="books",
     )
+    search_vector = SearchVectorField(
+        null=True,
+        editable=False,
+        verbose_name="Поисковый индекс",
+        help_text="tsvector названия, автора, описания и текста (russian + english)",
+    )
 
     class Meta:
         ordering = ["-published_date"]
+        indexes = [
+            GinIndex(fields=["search_vector"], name="book_search_vector_gin"),
+        ]
 
     def __str__(self):
         return self.title
@@ -237,10 +275,222 @@ class Book(models.Model):
         if not self.is_draft and self.published_date is None:
             self.published_date = timezone.now()
 
+        if self.content_type == "plaintext":
+            self.content_length = len(self.content or "")
+
         
         super().save(*args, **kwargs)
 
 
+class BookChapter(models.Model):
+    """Chapter of an EPUB book, extracted once at ingest time."""
+
+    book = models.ForeignKey(
+        Book,
+        on_delete=models.CASCADE,
+        related_name="epub_chapters",
+        verbose_name="Книга",
+    )
+    index = models.PositiveIntegerField(
+        verbose_name="Номер главы",
+        help_text="Позиция документа в spine EPUB (совпадает с chapter_id в API)",
+    )
+    title = models.CharField(max_length=500, blank=True, verbose_name="Название")
+    content = models.TextField(blank=True, verbose_name="Текст")
+    html_content = models.TextField(blank=True, verbose_name="HTML")
+    file_name = models.CharField(max_length=500, blank=True, verbose_name="Файл в EPUB")
+    content_hash = models.CharField(
+        max_length=64,
+        blank=True,
+        verbose_name="Хеш документа",
+        help_text="SHA-256 исходного документа из EPUB; неизменённые главы не извлекаются повторно",
+    )
+    char_count = models.PositiveIntegerField(default=0, verbose_name="Количество символов")
+    char_offset = models.PositiveIntegerField(
+        default=0,
+        verbose_name="Смещение главы",
+        help_text="Количество символов во всех предыдущих главах",
+    )
+    spine_position = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        verbose_name="Позиция в spine",
+        help_text="Номер itemref среди всех элементов spine, включая не-XHTML; на него ссылаются CFI",
+    )
+    search_vector = SearchVectorField(null=True, editable=False, verbose_name="Поисковый индекс")
+
+    class Meta:
+        verbose_name = "Глава книги"
+        verbose_name_plural = "Главы книг"
+        ordering = ["book", "index"]
+        unique_together = ["book", "index"]
+        indexes = [
+            models.Index(fields=["book", "index"]),
+            GinIndex(fields=["search_vector"], name="chapter_search_vector_gin"),
+            # Lets in-book phrase search (regex over content) use trigrams
+            GinIndex(fields=["content"], name="chapter_content_trgm", opclasses=["gin_trgm_ops"]),
+        ]
+
+    def __str__(self):
+        return f"{self.book.title} - {self.index}: {self.title}"
+
+    def to_dict(self):
+        """Return the chapter in the same shape as EPUBHandler.get_chapters()."""
+        return {
+            "id": self.index,
+            "title": self.title,
+            "content": self.content,
+            "html_content": self.html_content,
+            "file_name": self.file_name,
+        }
+
+
+class BookTextIndex(models.Model):
+    """Paragraph and sentence boundaries of a plain text book, for paging."""
+
+    book = models.OneToOneField(
+        Book,
+        on_delete=models.CASCADE,
+        related_name="text_index",
+        verbose_name="Книга",
+    )
+    content_length = models.PositiveIntegerField(default=0, verbose_name="Длина текста")
+    paragraph_boundaries = models.BinaryField(
+        verbose_name="Начала абзацев",
+        help_text="Смещения символов, массив uint32",
+    )
+    sentence_boundaries = models.BinaryField(
+        verbose_name="Начала предложений",
+        help_text="Смещения символов, массив uint32",
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Индекс страниц книги"
+        verbose_name_plural = "Индексы страниц книг"
+
+    def __str__(self):
+        return f"{self.book.title} ({self.content_length})"
+
+
+class BookSignature(models.Model):
+    """MinHash signature of a book's text, for near-duplicate detection."""
+
+    book = models.OneToOneField(
+        Book,
+        on_delete=models.CASCADE,
+        related_name="signature",
+        verbose_name="Книга",
+    )
+    minhash = models.BinaryField(
+        verbose_name="MinHash",
+        help_text="Минимальные хеши шинглов текста, массив uint32",
+    )
+    shingle_count = models.PositiveIntegerField(default=0, verbose_name="Количество шинглов")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Сигнатура текста книги"
+        verbose_name_plural = "Сигнатуры текстов книг"
+
+    def __str__(self):
+        return f"{self.book.title} ({self.shingle_count})"
+
+
+class BookLSHBucket(models.Model):
+    """LSH band of a book's signature; books sharing a key are duplicate candidates."""
+
+    book = models.ForeignKey(
+        Book,
+        on_delete=models.CASCADE,
+        related_name="lsh_buckets",
+        verbose_name="Книга",
+    )
+    key = models.BigIntegerField(
+        db_index=True,
+        verbose_name="Ключ корзины",
+        help_text="Хеш номера полосы и её значений в сигнатуре",
+    )
+
+    class Meta:
+        verbose_name = "LSH-корзина книги"
+        verbose_name_plural = "LSH-корзины книг"
+
+    def __str__(self):
+        return f"{self.book.title}: {self.key}"
+
+
+class BookChapterBody(models.Model):
+    """Compressed JSON response of a chapter, stored per variant and encoding."""
+
+    chapter = models.ForeignKey(
+        BookChapter,
+        on_delete=models.CASCADE,
+        related_name="bodies",
+        verbose_name="Глава",
+    )
+    variant = models.CharField(
+        max_length=50,
+        verbose_name="Вариант",
+        help_text="Формат и номер сегмента, например html:0",
+    )
+    encoding = models.CharField(max_length=10, verbose_name="Кодирование")
+    etag = models.CharField(max_length=100, verbose_name="ETag")
+    body = models.BinaryField(verbose_name="Тело ответа")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Сжатый ответ главы"
+        verbose_name_plural = "Сжатые ответы глав"
+        unique_together = ["chapter", "variant", "encoding"]
+
+    def __str__(self):
+        return f"{self.chapter} [{self.variant}, {self.encoding}]"
+
+
+class EpubIngestJob(models.Model):
+    """Queued validation and parsing of an uploaded EPUB file."""
+
+    STATUS = (
+        ("queued", "В очереди"),
+        ("running", "Выполняется"),
+        ("done", "Готово"),
+        ("failed", "Ошибка"),
+    )
+
+    book = models.ForeignKey(
+        Book,
+        on_delete=models.CASCADE,
+        related_name="ingest_jobs",
+        verbose_name="Книга",
+    )
+    status = models.CharField(max_length=20, choices=STATUS, default="queued", verbose_name="Статус")
+    stage = models.CharField(max_length=50, blank=True, verbose_name="Этап")
+    progress = models.PositiveSmallIntegerField(default=0, verbose_name="Прогресс (%)")
+    error = models.TextField(blank=True, verbose_name="Ошибка")
+    replaced_epub_name = models.CharField(
+        max_length=500,
+        blank=True,
+        verbose_name="Заменяемый файл",
+        help_text="Предыдущий EPUB: удаляется после успешной обработки, восстанавливается при ошибке",
+    )
+    attempts = models.PositiveIntegerField(default=0, verbose_name="Попытки")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания")
+    started_at = models.DateTimeField(blank=True, null=True, verbose_name="Начало")
+    finished_at = models.DateTimeField(blank=True, null=True, verbose_name="Окончание")
+
+    class Meta:
+        verbose_name = "Обработка EPUB"
+        verbose_name_plural = "Обработка EPUB"
+        ordering = ["created_at"]
+        indexes = [
+            models.Index(fields=["status", "created_at"]),
+        ]
+
+    def __str__(self):
+        return f"{self.book.title} - {self.status} ({self.progress}%)"
+
+
 class ReadingGroup(models.Model):
     name = models.CharField(max_length=255)
     slug = models.SlugField(max_length=255, unique=True, blank=True)
@@ -0,0 +1,98 @@
+"""
+Server-side reading progress math.
+
+Character counts are stored at ingest time (Book.content_length and
+BookChapter.char_count / char_offset), so a progress update never loads the
+text columns.
+"""
+
+import re
+from typing import Optional
+
+from django.db.models import Q
+
+from .models import Book, BookChapter
+
+# First step of an EPUB CFI: /6 is the <spine> element of the package
+# document, the next even step selects an <itemref>, e.g.
+# epubcfi(/6/14[chap05]!/4/2/10/2:305) -> itemref 14 / 2 - 1 = 6
+CFI_SPINE_STEP_RE = re.compile(r"^epubcfi\(/6/(\d+)")
+
+
+def cfi_spine_index(cfi: str) -> Optional[int]:
+    """
+    Get the spine position referenced by an EPUB CFI.
+
+    Args:
+        cfi: EPUB CFI string
+
+    Returns:
+        Zero-based spine index, or None if the CFI cannot be parsed
+    """
+    match = CFI_SPINE_STEP_RE.match(cfi or "")
+    if not match:
+        return None
+
+    step = int(match.group(1))
+    if step < 2 or step % 2:
+        return None
+    return step // 2 - 1
+
+
+def _as_fraction(value) -> float:
+    try:
+        return min(max(float(value), 0.0), 1.0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def compute_progress_percent(
+    book: Book,
+    character_offset: int = 0,
+    cfi: str = "",
+    chapter_progress=None,
+) -> Optional[float]:
+    """
+    Compute the reading progress of a book from stored character counts.
+
+    Plain text books use character_offset / content_length. EPUB books use
+    the characters before the chapter addressed by the CFI, plus
+    chapter_progress (0..1, position inside that chapter) of its length.
+
+    Args:
+        book: Book (its content columns are not accessed)
+        character_offset: First character of the current page (plain text)
+        cfi: Current EPUB CFI
+        chapter_progress: Fraction of the current chapter already read
+
+    Returns:
+        Percentage (0-100), or None if it cannot be computed
+    """
+    if not book.content_length:
+        return None
+
+    if book.content_type == "plaintext":
+        if character_offset is None or character_offset < 0:
+            return None
+        return min(character_offset / book.content_length, 1.0) * 100
+
+    if book.content_type == "epub":
+        spine_index = cfi_spine_index(cfi)
+        if spine_index is None:
+            return None
+
+        # CFIs count every itemref; chapters ingested before spine positions
+        # were stored fall back to their index
+        chapter = (
+            BookChapter.objects.filter(book=book)
+            .filter(Q(spine_position=spine_index) | Q(spine_position__isnull=True, index=spine_index))
+            .values("char_offset", "char_count")
+            .first()
+        )
+        if chapter is None:
+            return None
+
+        position = chapter["char_offset"] + _as_fraction(chapter_progress) * chapter["char_count"]
+        return min(position / book.content_length, 1.0) * 100
+
+    return None
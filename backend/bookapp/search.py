@@ -0,0 +1,293 @@
+"""
+Full-text search over books and chapters, and phrase search inside a book.
+
+Books and chapters carry a precomputed `search_vector` (tsvector) built with
+the Russian and English text search configurations and covered by GIN
+indexes, so a search is an index lookup. Vectors are refreshed when a book is
+saved and when its EPUB chapters are stored; `python manage.py
+backfill_search_index` fills them for existing rows.
+
+In-book search (`find_in_book`) matches the literal phrase instead, like a
+reader's Ctrl+F, and reports character offsets into the chapter texts
+stored at ingest.
+"""
+
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db import connection
+from django.db.models import Exists, F, OuterRef, Q, QuerySet, Subquery
+from django.db.models.functions import Substr
+
+from .models import Book, BookChapter
+
+# Text search configurations every document is indexed with
+SEARCH_CONFIGS = ("russian", "english")
+
+# Longest accepted query, in characters
+MAX_QUERY_LENGTH = 200
+
+# Characters of context returned on each side of an in-book hit
+FIND_CONTEXT_CHARS = 80
+
+# Maximum number of hits collected by one in-book search
+FIND_MAX_HITS = 500
+
+# Characters of body text indexed per book or chapter. PostgreSQL rejects
+# tsvectors over 1 MB, and every text is indexed with each configuration;
+# a long EPUB book stays searchable through its chapter vectors
+SEARCH_TEXT_MAX_CHARS = 150_000
+
+
+def is_search_supported() -> bool:
+    """Return True if the database has PostgreSQL full-text search."""
+    return connection.vendor == "postgresql"
+
+
+def _multi_config_vector(*weighted_fields) -> SearchVector:
+    """
+    Build a tsvector expression indexing fields with every configuration.
+
+    Args:
+        weighted_fields: (field name or expression, weight) pairs
+
+    Returns:
+        Combined SearchVector expression
+    """
+    vector = None
+    for expression, weight in weighted_fields:
+        for config in SEARCH_CONFIGS:
+            part = SearchVector(expression, config=config, weight=weight)
+            vector = part if vector is None else vector + part
+    return vector
+
+
+def _capped(expression):
+    """Cut a text expression to SEARCH_TEXT_MAX_CHARS characters."""
+    return Substr(expression, 1, SEARCH_TEXT_MAX_CHARS)
+
+
+def _chapters_text():
+    """Subquery concatenating the stored chapter text of the outer book."""
+    return Subquery(
+        BookChapter.objects.filter(book=OuterRef("pk"))
+        .values("book")
+        .annotate(text=StringAgg("content", delimiter="\n", ordering="index"))
+        .values("text")[:1]
+    )
+
+
+def update_chapter_search_vectors(book: Book, indexes: Optional[Iterable[int]] = None) -> None:
+    """
+    Recompute the search vectors of the stored chapters of a book.
+
+    Args:
+        book: Book whose chapters were just stored
+        indexes: Only these chapters (all if None)
+    """
+    if not is_search_supported():
+        return
+
+    chapters = BookChapter.objects.filter(book=book)
+    if indexes is not None:
+        chapters = chapters.filter(index__in=list(indexes))
+    chapters.update(
+        search_vector=_multi_config_vector((F("title"), "A"), (_capped(F("content")), "B"))
+    )
+
+
+def update_book_search_vector(book: Book) -> None:
+    """
+    Recompute the search vector of a book.
+
+    Title and author weigh most, then the description, then the text: the
+    `content` field of plain text books or the stored chapters of EPUB books
+    (whose `content` only keeps a short preview), up to
+    SEARCH_TEXT_MAX_CHARS characters.
+
+    Args:
+        book: Saved Book instance
+    """
+    if not is_search_supported():
+        return
+
+    body = F("content") if book.content_type == "plaintext" else _chapters_text()
+    Book.objects.filter(pk=book.pk).update(
+        search_vector=_multi_config_vector(
+            (F("title"), "A"),
+            (F("book_author"), "A"),
+            (F("description"), "B"),
+            (_capped(body), "C"),
+        )
+    )
+
+
+def build_search_query(text: str) -> Optional[SearchQuery]:
+    """
+    Parse user input into a query matching any configuration.
+
+    Uses websearch syntax: quoted phrases, `or` and `-excluded` words.
+
+    Args:
+        text: Raw query string
+
+    Returns:
+        SearchQuery, or None for blank input
+    """
+    text = (text or "").strip()[:MAX_QUERY_LENGTH]
+    if not text:
+        return None
+
+    query = None
+    for config in SEARCH_CONFIGS:
+        part = SearchQuery(text, config=config, search_type="websearch")
+        query = part if query is None else query | part
+    return query
+
+
+def rank_books(books: QuerySet, query: SearchQuery) -> QuerySet:
+    """
+    Filter and rank books matching a query.
+
+    Books also match through their chapter vectors, which cover EPUB text
+    past the part indexed in the book vector.
+
+    Args:
+        books: Book queryset already restricted to visible books
+        query: Query from build_search_query()
+
+    Returns:
+        Matching books annotated with `rank`, best first
+    """
+    return (
+        books.filter(
+            Q(search_vector=query)
+            | Exists(BookChapter.objects.filter(book=OuterRef("pk"), search_vector=query))
+        )
+        .annotate(rank=SearchRank(F("search_vector"), query))
+        .order_by("-rank", "-created_at")
+    )
+
+
+def search_chapters(book_ids, query: SearchQuery, per_book: int = 3) -> dict:
+    """
+    Find the best matching chapters of the given books.
+
+    Args:
+        book_ids: IDs of books to look in
+        query: Query from build_search_query()
+        per_book: Maximum chapters returned per book
+
+    Returns:
+        Dictionary mapping book id to a list of {"id", "title", "rank"} dicts
+    """
+    chapters = (
+        BookChapter.objects.filter(book_id__in=book_ids, search_vector=query)
+        .annotate(rank=SearchRank(F("search_vector"), query))
+        .order_by("book_id", "-rank", "index")
+        .values("book_id", "index", "title", "rank")
+    )
+
+    matches = {}
+    for chapter in chapters:
+        book_matches = matches.setdefault(chapter["book_id"], [])
+        if len(book_matches) < per_book:
+            book_matches.append({
+                "id": chapter["index"],
+                "title": chapter["title"],
+                "rank": round(chapter["rank"], 4),
+            })
+    return matches
+
+
+def phrase_pattern(text: str) -> Optional[re.Pattern]:
+    """
+    Compile a case-insensitive pattern for a phrase typed by a reader.
+
+    Words may be separated by any whitespace in the text, including the
+    line breaks between extracted phrases.
+
+    Args:
+        text: Raw query string
+
+    Returns:
+        Compiled pattern, or None for blank input
+    """
+    words = (text or "")[:MAX_QUERY_LENGTH].split()
+    if not words:
+        return None
+    return re.compile(r"\s+".join(re.escape(word) for word in words), re.IGNORECASE)
+
+
+def _find_hits(text: str, pattern: re.Pattern, limit: int) -> List[Tuple[int, int, str, str, str]]:
+    """Return up to `limit` (start, end, before, match, after) tuples."""
+    hits = []
+    for match in pattern.finditer(text):
+        start, end = match.span()
+        hits.append((
+            start,
+            end,
+            text[max(0, start - FIND_CONTEXT_CHARS):start],
+            match.group(),
+            text[end:end + FIND_CONTEXT_CHARS],
+        ))
+        if len(hits) >= limit:
+            break
+    return hits
+
+
+def find_in_book(book: Book, pattern: re.Pattern, max_hits: int = FIND_MAX_HITS) -> Tuple[List[Dict], bool]:
+    """
+    Find every occurrence of a phrase in a book, in reading order.
+
+    For EPUB books the database narrows the search to the stored chapters
+    containing the phrase, through the trigram index on chapter content,
+    and only their text is loaded; plain text books are searched in their
+    content.
+
+    Args:
+        book: Book to search
+        pattern: Pattern from phrase_pattern()
+        max_hits: Stop after this many hits
+
+    Returns:
+        Tuple of (hits, truncated). Each hit has chapter_id, chapter_title,
+        chapter_hit (occurrence number inside the chapter), start and end
+        (offsets into the chapter text), book_offset and the before / match /
+        after snippet parts
+    """
+    if book.content_type == "plaintext":
+        documents = [(None, "", book.content or "", 0)]
+    else:
+        documents = (
+            BookChapter.objects.filter(book=book, content__iregex=pattern.pattern)
+            .order_by("index")
+            .values_list("index", "title", "content", "char_offset")
+            .iterator(chunk_size=10)
+        )
+
+    hits = []
+    truncated = False
+    for chapter_id, chapter_title, text, char_offset in documents:
+        chapter_hits = _find_hits(text, pattern, max_hits - len(hits) + 1)
+        for chapter_hit, (start, end, before, matched, after) in enumerate(chapter_hits):
+            if len(hits) >= max_hits:
+                truncated = True
+                break
+            hits.append({
+                "chapter_id": chapter_id,
+                "chapter_title": chapter_title,
+                "chapter_hit": chapter_hit,
+                "start": start,
+                "end": end,
+                "book_offset": char_offset + start,
+                "before": before,
+                "match": matched,
+                "after": after,
+            })
+        if truncated:
+            break
+
+    return hits, truncated
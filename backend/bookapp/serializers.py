@@ -1,4 +1,5 @@
 from django.contrib.auth import get_user_model
+from django.db import transaction
 from django.db.models import Avg, Count
 from rest_framework import serializers
 
@@ -22,6 +23,9 @@ from .models import (
     UserStats,
     UserToReadingGroupState,
 )
+from .covers import cover_variant_urls
+from .epub_storage import store_epub_content
+from .ingestion import probe_uploaded_epub
 from .validators import validate_no_profanity
 
 
@@ -114,6 +118,9 @@ class BookSerializer(serializers.ModelSerializer):
     )
     hashtags = HashtagSerializer(many=True, read_only=True)
     category_display = serializers.SerializerMethodField()
+    ingest_status = serializers.CharField(read_only=True)
+    content_length = serializers.IntegerField(read_only=True)
+    featured_image_variants = serializers.SerializerMethodField()
 
     class Meta:
         model = Book
@@ -129,9 +136,12 @@ class BookSerializer(serializers.ModelSerializer):
             "description",
             "content",
             "content_type",
+            "content_length",
             "epub_file",
             "table_of_contents",
+            "ingest_status",
             "featured_image",
+            "featured_image_variants",
             "published_date",
             "created_at",
             "updated_at",
@@ -144,6 +154,9 @@ class BookSerializer(serializers.ModelSerializer):
     def get_category_display(self, obj):
         return dict(Book.CATEGORY).get(obj.category, "Unknown")
 
+    def get_featured_image_variants(self, obj):
+        return cover_variant_urls(obj)
+
     def to_representation(self, instance):
         representation = super().to_representation(instance)
 
@@ -170,6 +183,16 @@ class BookSerializer(serializers.ModelSerializer):
                 raise serializers.ValidationError(
                     "EPUB file is required when content_type is 'epub'"
                 )
+
+            # Reject non-EPUB uploads before the book is saved and queued
+            if data.get("epub_file"):
+                probe, error = probe_uploaded_epub(data["epub_file"])
+                if error:
+                    raise serializers.ValidationError({"epub_file": error})
+
+                author = probe["metadata"].get("author", "")
+                if not data.get("book_author") and author != "Unknown":
+                    data["book_author"] = author[:255]
         elif content_type == "plaintext":
             if not data.get("content") and not self.instance:
                 raise serializers.ValidationError(
@@ -178,6 +201,28 @@ class BookSerializer(serializers.ModelSerializer):
 
         return data
 
+    def create(self, validated_data):
+        with transaction.atomic():
+            self._store_epub_file(validated_data)
+            return super().create(validated_data)
+
+    def update(self, instance, validated_data):
+        with transaction.atomic():
+            self._store_epub_file(validated_data)
+            return super().update(instance, validated_data)
+
+    def _store_epub_file(self, validated_data):
+        """
+        Save an uploaded EPUB under its content hash, reusing identical files.
+
+        Runs in the transaction saving the book, so a reused file cannot be
+        deleted before the book referencing it is committed.
+        """
+        epub_file = validated_data.get("epub_file")
+        if epub_file:
+            storage = Book._meta.get_field("epub_file").storage
+            validated_data["epub_file"], _ = store_epub_content(epub_file, storage)
+
 
 
 
@@ -189,6 +234,7 @@ class BookSerializerInfo(serializers.ModelSerializer):
     average_rating = serializers.SerializerMethodField()
     hashtags = HashtagSerializer(many=True, read_only=True)
     category_display = serializers.SerializerMethodField()
+    featured_image_variants = serializers.SerializerMethodField()
     
     class Meta:
         model = Book
@@ -203,6 +249,7 @@ class BookSerializerInfo(serializers.ModelSerializer):
             "description",
             "content_type",
             "featured_image",
+            "featured_image_variants",
             "published_date",
             "created_at",
             "updated_at",
@@ -218,6 +265,9 @@ class BookSerializerInfo(serializers.ModelSerializer):
 
     
 
+    def get_featured_image_variants(self, obj):
+        return cover_variant_urls(obj)
+
     def get_average_rating(self, instance):
         # Use annotation if available (optimized path from queryset)
         if hasattr(instance, "average_rating"):
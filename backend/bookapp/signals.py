@@ -8,7 +8,7 @@ actions like creating comments, completing books, or placing rewards.
 import logging
 from django.db import transaction
 from django.db.models import F, Sum, Q
-from django.db.models.signals import post_delete, post_save, pre_save
+from django.db.models.signals import post_delete, post_init, post_save, pre_save
 from django.dispatch import receiver
 from django.utils import timezone
 
@@ -24,8 +24,13 @@ from .models import (
     UserRewardSummary,
     UserStats,
     Book,
+    BookTextIndex,
     UserToReadingGroupState
 )
+from .covers import refresh_cover_variants
+from .duplicates import update_book_signature
+from .search import update_book_search_vector
+from .text_paging import build_text_index
 
 logger = logging.getLogger(__name__)
 
@@ -298,3 +303,103 @@ def update_reward_summary_on_create(sender, instance, created, **kwargs):
 def update_reward_summary_on_delete(sender, instance, **kwargs):
     """Update reward summary when a reward is deleted."""
     update_reward_summary(instance.user, instance.reward_template)
+
+
+# Book fields whose changes invalidate derived data (text index, signature,
+# search vector)
+TRACKED_BOOK_FIELDS = ("title", "book_author", "description", "content", "content_type")
+
+
+def _remember_book_values(book, fields=TRACKED_BOOK_FIELDS):
+    # Deferred fields are left out: they cannot have changed unless assigned
+    saved = getattr(book, "_saved_values", {})
+    saved.update({field: book.__dict__[field] for field in fields if field in book.__dict__})
+    book._saved_values = saved
+
+
+@receiver(post_init, sender=Book)
+def snapshot_book_values(sender, instance, **kwargs):
+    """
+    Remember the loaded values of the tracked fields, so that saves which do
+    not change them skip rebuilding derived data.
+    """
+    instance._saved_values = {}
+    _remember_book_values(instance)
+
+
+@receiver(pre_save, sender=Book)
+def track_book_changes(sender, instance, update_fields=None, **kwargs):
+    """Record which tracked fields a save writes with a new value."""
+    fields = TRACKED_BOOK_FIELDS
+    if update_fields is not None:
+        fields = [field for field in fields if field in update_fields]
+
+    previous = getattr(instance, "_saved_values", {})
+    instance._changed_fields = {
+        field
+        for field in fields
+        if field in instance.__dict__
+        and (field not in previous or instance.__dict__[field] != previous[field])
+    }
+    _remember_book_values(instance, fields)
+
+
+def _book_changed(instance, created, fields) -> bool:
+    return created or bool(set(fields) & getattr(instance, "_changed_fields", set(fields)))
+
+
+@receiver(post_save, sender=Book)
+def build_book_text_index(sender, instance, created=False, **kwargs):
+    """
+    Rebuild the paging boundary index when a plain text book's content changed.
+    """
+    if instance.content_type != "plaintext":
+        return
+
+    if _book_changed(instance, created, ("content", "content_type")):
+        build_text_index(instance)
+    else:
+        # Still current: keep get_text_index() from treating it as stale
+        BookTextIndex.objects.filter(book=instance).update(updated_at=timezone.now())
+
+
+@receiver(post_save, sender=Book)
+def refresh_book_signature(sender, instance, created=False, **kwargs):
+    """
+    Recompute the near-duplicate signature when a plain text book's content changed.
+
+    EPUB books are signed at ingest, once their chapters are stored.
+    """
+    if instance.content_type != "plaintext":
+        return
+
+    if _book_changed(instance, created, ("content", "content_type")):
+        update_book_signature(instance)
+
+
+@receiver(post_save, sender=Book)
+def refresh_book_search_vector(sender, instance, created=False, **kwargs):
+    """
+    Recompute the full-text search vector of a book after its title, author,
+    description or plain text content changed.
+
+    The text of EPUB books comes from their stored chapters, whose vector
+    ingestion rebuilds; their `content` is only a preview.
+    """
+    fields = ["title", "book_author", "description", "content_type"]
+    if instance.content_type == "plaintext":
+        fields.append("content")
+
+    if _book_changed(instance, created, fields):
+        update_book_search_vector(instance)
+
+
+@receiver(post_save, sender=Book)
+def refresh_book_cover_variants(sender, instance, update_fields=None, **kwargs):
+    """
+    Regenerate resized cover variants when a book's featured image changes.
+    """
+    if update_fields is not None and "featured_image" not in update_fields:
+        return
+
+    refresh_cover_variants(instance)
@@ -1,3 +1,1405 @@
-from django.test import TestCase
+import gzip
+import hashlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import time
+import zipfile
+from datetime import timedelta
+from unittest import mock, skipUnless
 
-# Create your tests here.
+import numpy as np
+from django.core.files.storage import FileSystemStorage
+from django.conf import settings
+from django.core.management import CommandError, call_command
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db.models.fields.files import FieldFile
+from django.db import connection
+from django.utils import timezone
+from django.test import SimpleTestCase, TestCase, override_settings
+from PIL import Image
+from rest_framework.test import APIClient
+
+from .chapter_bodies import choose_encoding
+from .duplicates import (
+    MINHASH_PERMUTATIONS,
+    SHINGLE_WORDS,
+    estimate_similarity,
+    lsh_keys,
+    minhash,
+    text_shingles,
+    update_book_signature,
+)
+from .epub_cache import EPUBHandlerCache, epub_handler_cache, get_epub_handler
+from .epub_handler import EPUBHandler
+from .epub_storage import EPUBDiskCache, RangeReadFile, epub_content_name
+from .html_extraction import EXTRACTION_BACKENDS
+from .epub_handler import probe_epub, stream_epub_file
+from .ingestion import (
+    claim_next_ingest_job,
+    release_epub_file,
+    requeue_stale_ingest_jobs,
+    run_ingest_job,
+    store_book_chapters,
+)
+from .progress import compute_progress_percent
+from .search import (
+    SEARCH_TEXT_MAX_CHARS,
+    build_search_query,
+    find_in_book,
+    phrase_pattern,
+    rank_books,
+    update_book_search_vector,
+)
+from .models import Book, BookChapter, BookChapterBody, BookComment, BookSignature, BookTextIndex, CustomUser, EpubIngestJob
+from .text_paging import _pack, find_boundaries, plan_window
+from .validators import validate_epub_archive, validate_epub_central_directory
+from .views.utils import parse_byte_range
+
+
+def build_epub(documents, spine=None, title="Test book", resources=None, nav=None):
+    """
+    Build a minimal EPUB 3 archive in memory.
+
+    Args:
+        documents: {file name: XHTML text} of the spine documents
+        spine: Manifest ids in spine order; defaults to the documents, an id
+            starting with "img" adds a non-XHTML image item
+        title: dc:title of the package
+        resources: {file name: (media type, bytes)} of other manifest items
+        nav: (href, title) entries of an EPUB 3 navigation document
+
+    Returns:
+        Archive bytes
+    """
+    ids = {f"doc{number}": name for number, name in enumerate(documents)}
+    spine = spine or list(ids)
+    manifest = "".join(
+        f'<item id="{item_id}" href="{name}" media-type="application/xhtml+xml"/>'
+        for item_id, name in ids.items()
+    ) + "".join(
+        f'<item id="{item_id}" href="{item_id}.png" media-type="image/png"/>'
+        for item_id in spine
+        if item_id.startswith("img")
+    ) + "".join(
+        f'<item id="res{number}" href="{name}" media-type="{media_type}"/>'
+        for number, (name, (media_type, _)) in enumerate((resources or {}).items())
+    ) + (
+        '<item id="nav" href="nav.xhtml" media-type="application/xhtml+xml" properties="nav"/>'
+        if nav else ""
+    )
+    opf = (
+        '<?xml version="1.0" encoding="utf-8"?>'
+        '<package xmlns="http://www.idpf.org/2007/opf" version="3.0" unique-identifier="id">'
+        '<metadata xmlns:dc="http://purl.org/dc/elements/1.1/">'
+        f'<dc:identifier id="id">test</dc:identifier><dc:title>{title}</dc:title>'
+        '<dc:language>ru</dc:language></metadata>'
+        f'<manifest>{manifest}</manifest>'
+        f'<spine>{"".join(f"<itemref idref=\"{item_id}\"/>" for item_id in spine)}</spine>'
+        '</package>'
+    )
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w") as zf:
+        zf.writestr("mimetype", "application/epub+zip", compress_type=zipfile.ZIP_STORED)
+        zf.writestr(
+            "META-INF/container.xml",
+            '<?xml version="1.0"?><container version="1.0" '
+            'xmlns="urn:oasis:names:tc:opendocument:xmlns:container"><rootfiles>'
+            '<rootfile full-path="OEBPS/content.opf" media-type="application/oebps-package+xml"/>'
+            "</rootfiles></container>",
+        )
+        zf.writestr("OEBPS/content.opf", opf)
+        for name, text in documents.items():
+            zf.writestr(f"OEBPS/{name}", text)
+        for item_id in spine:
+            if item_id.startswith("img"):
+                zf.writestr(f"OEBPS/{item_id}.png", b"\x89PNG\r\n\x1a\n")
+        for name, (_, data) in (resources or {}).items():
+            zf.writestr(f"OEBPS/{name}", data)
+        if nav:
+            links = "".join(f'<li><a href="{href}">{text}</a></li>' for href, text in nav)
+            zf.writestr(
+                "OEBPS/nav.xhtml",
+                '<html xmlns="http://www.w3.org/1999/xhtml" xmlns:epub="http://www.idpf.org/2007/ops">'
+                f'<body><nav epub:type="toc"><ol>{links}</ol></nav></body></html>',
+            )
+    return archive.getvalue()
+
+
+def chapter_document(title, text):
+    return (
+        '<?xml version="1.0" encoding="utf-8"?><html xmlns="http://www.w3.org/1999/xhtml">'
+        f"<head><title>{title}</title></head><body><h1>{title}</h1><p>{text}</p></body></html>"
+    )
+
+
+def corrupt_epub(epub):
+    """Flip a byte inside a stored chapter so its CRC check fails at ingest."""
+    position = epub.index(b"<p>") + 3
+    return epub[:position] + bytes([epub[position] ^ 1]) + epub[position + 1:]
+
+
+def jpeg_image(size=(600, 900)):
+    buffer = io.BytesIO()
+    Image.new("RGB", size, "navy").save(buffer, "JPEG")
+    return buffer.getvalue()
+
+
+class MediaTestCase(TestCase):
+    """Test case storing uploaded files in a temporary MEDIA_ROOT."""
+
+    def setUp(self):
+        super().setUp()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=self.media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+
+        self.user = CustomUser.objects.create(username="reader")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def media_files(self, directory=""):
+        root = os.path.join(self.media_root, directory)
+        return sorted(
+            os.path.relpath(os.path.join(path, name), root)
+            for path, _, names in os.walk(root)
+            for name in names
+        )
+
+    def create_book(self, epub, title="Book", **data):
+        return self.client.post(
+            "/create_book/",
+            {
+                "title": title,
+                "content_type": "epub",
+                "visibility": "public",
+                "epub_file": SimpleUploadedFile("book.epub", epub, content_type="application/epub+zip"),
+                **data,
+            },
+            format="multipart",
+        )
+
+
+class ParseByteRangeTests(SimpleTestCase):
+    def test_missing_or_unsupported_header_sends_full_content(self):
+        for header in ("", None, "items=0-1", "bytes=0-1,5-6", "bytes=a-b", "bytes=5-2"):
+            with self.subTest(header=header):
+                self.assertIsNone(parse_byte_range(header, 100))
+
+    def test_closed_and_open_ranges(self):
+        self.assertEqual(parse_byte_range("bytes=0-0", 100), (0, 0))
+        self.assertEqual(parse_byte_range("bytes=10-19", 100), (10, 19))
+        self.assertEqual(parse_byte_range("bytes=90-", 100), (90, 99))
+
+    def test_end_is_clamped_to_size(self):
+        self.assertEqual(parse_byte_range("bytes=50-500", 100), (50, 99))
+
+    def test_suffix_range(self):
+        self.assertEqual(parse_byte_range("bytes=-10", 100), (90, 99))
+        self.assertEqual(parse_byte_range("bytes=-500", 100), (0, 99))
+
+    def test_unsatisfiable_ranges(self):
+        self.assertIs(parse_byte_range("bytes=100-", 100), False)
+        self.assertIs(parse_byte_range("bytes=-0", 100), False)
+        self.assertIs(parse_byte_range("bytes=0-", 0), False)
+
+
+@mock.patch("bookapp.chapter_bodies.available_encodings", return_value=["br", "gzip"])
+class ChooseEncodingTests(SimpleTestCase):
+    def test_preferred_supported_encoding(self, _):
+        self.assertEqual(choose_encoding("gzip, deflate, br"), "br")
+        self.assertEqual(choose_encoding("gzip, deflate"), "gzip")
+        self.assertEqual(choose_encoding("GZIP"), "gzip")
+
+    def test_no_supported_encoding(self, _):
+        for header in ("", None, "deflate", "identity"):
+            with self.subTest(header=header):
+                self.assertIsNone(choose_encoding(header))
+
+    def test_zero_quality_refuses_encoding(self, _):
+        self.assertEqual(choose_encoding("br;q=0, gzip"), "gzip")
+        self.assertEqual(choose_encoding("br; q=0.0, gzip;q=0.5"), "gzip")
+        self.assertIsNone(choose_encoding("br;q=0, gzip;q=0.000"))
+
+    def test_wildcard(self, _):
+        self.assertEqual(choose_encoding("*"), "br")
+
+    def test_without_brotli(self, available):
+        available.return_value = ["gzip"]
+        self.assertEqual(choose_encoding("br, gzip"), "gzip")
+        self.assertIsNone(choose_encoding("br"))
+
+
+class PlanWindowTests(SimpleTestCase):
+    TEXT = "Aaaa bbbb. Cccc dddd.\nEeee ffff. Gggg.\nHhhh iiii jjjj."
+
+    def setUp(self):
+        boundaries = find_boundaries(self.TEXT)
+        self.index = BookTextIndex(
+            content_length=len(self.TEXT),
+            paragraph_boundaries=_pack(boundaries["paragraphs"]),
+            sentence_boundaries=_pack(boundaries["sentences"]),
+        )
+
+    def test_boundaries(self):
+        self.assertEqual(
+            find_boundaries(self.TEXT), {"paragraphs": [22, 39], "sentences": [11, 22, 33, 39]}
+        )
+
+    def test_end_snaps_to_paragraph_in_second_half(self):
+        self.assertEqual(
+            plan_window(self.index, 0, 25),
+            {"start": 0, "end": 22, "next_offset": 22, "prev_offset": None},
+        )
+
+    def test_end_snaps_to_sentence_without_late_paragraph(self):
+        self.assertEqual(plan_window(self.index, 0, 15)["end"], 11)
+
+    def test_end_cut_without_boundary(self):
+        self.assertEqual(plan_window(self.index, 0, 5)["end"], 5)
+
+    def test_start_snaps_back_to_sentence(self):
+        window = plan_window(self.index, 13, 20)
+        self.assertEqual((window["start"], window["end"], window["prev_offset"]), (11, 22, 0))
+
+    def test_previous_page_fits_length(self):
+        self.assertEqual(plan_window(self.index, 22, 20)["prev_offset"], 11)
+
+    def test_last_page(self):
+        self.assertEqual(
+            plan_window(self.index, 0, 1000),
+            {"start": 0, "end": len(self.TEXT), "next_offset": None, "prev_offset": None},
+        )
+
+    def test_offset_past_end_is_clamped(self):
+        self.assertEqual(plan_window(self.index, 1000, 10), plan_window(self.index, 45, 10))
+        self.assertEqual(plan_window(self.index, 45, 10)["start"], 39)
+
+
+class ResolveTocTargetsTests(SimpleTestCase):
+    SPINE = ["text/chap_1.xhtml", "text/chap%202.xhtml", "notes/a.xhtml", "extra/a.xhtml", "b.xhtml"]
+
+    def resolve(self, *hrefs):
+        toc = [{"href": href} for href in hrefs]
+        handler = EPUBHandler.__new__(EPUBHandler)
+        with mock.patch.object(EPUBHandler, "_spine_file_names", return_value=self.SPINE):
+            handler._resolve_toc_targets(toc)
+        return [(entry["chapter_id"], entry["anchor"]) for entry in toc]
+
+    def test_exact_path(self):
+        self.assertEqual(self.resolve("text/chap_1.xhtml"), [(0, None)])
+
+    def test_anchor(self):
+        self.assertEqual(self.resolve("text/chap_1.xhtml#part%201"), [(0, "part 1")])
+
+    def test_paths_are_unquoted_and_normalised(self):
+        self.assertEqual(
+            self.resolve("text/chap 2.xhtml", "text/../text/chap%202.xhtml#x"),
+            [(1, None), (1, "x")],
+        )
+
+    def test_unique_file_name_fallback(self):
+        self.assertEqual(self.resolve("../b.xhtml", "other/chap_1.xhtml"), [(4, None), (0, None)])
+
+    def test_ambiguous_or_unknown_file_name(self):
+        self.assertEqual(self.resolve("a.xhtml", "missing.xhtml"), [(None, None), (None, None)])
+
+    def test_fragment_only_or_empty_href(self):
+        self.assertEqual(self.resolve("#top", ""), [(None, "top"), (None, None)])
+
+
+class StoreBookChaptersTests(TestCase):
+    def chapter(self, index, content, content_hash, **extra):
+        return {
+            "id": index,
+            "title": f"Chapter {index}",
+            "content": content,
+            "html_content": f"<p>{content}</p>",
+            "file_name": f"chap_{index}.xhtml",
+            "content_hash": content_hash,
+            **extra,
+        }
+
+    def setUp(self):
+        self.book = Book.objects.create(title="Book", content_type="epub")
+        store_book_chapters(self.book, [
+            self.chapter(0, "first", "a"),
+            self.chapter(1, "second", "b"),
+            self.chapter(2, "third", "c"),
+        ])
+        self.ids = dict(BookChapter.objects.filter(book=self.book).values_list("content_hash", "id"))
+
+    def test_unchanged_chapters_keep_their_rows(self):
+        reused = {}
+        count = store_book_chapters(self.book, [
+            self.chapter(0, "new", "x"),
+            {"id": 1, "unchanged": True, "content_hash": "b", "file_name": "moved_b.xhtml"},
+            {"id": 2, "unchanged": True, "content_hash": "a", "file_name": "moved_a.xhtml"},
+            {"id": 3, "unchanged": True, "content_hash": "a", "file_name": "copy_a.xhtml"},
+        ], reused)
+
+        self.assertEqual(count, 4)
+        self.assertEqual(reused, {1: 1, 0: 2})
+
+        rows = {row.index: row for row in BookChapter.objects.filter(book=self.book)}
+        self.assertEqual(sorted(rows), [0, 1, 2, 3])
+        self.assertEqual(rows[1].id, self.ids["b"])
+        self.assertEqual(rows[2].id, self.ids["a"])
+        self.assertEqual(rows[1].file_name, "moved_b.xhtml")
+        self.assertFalse(BookChapter.objects.filter(id=self.ids["c"]).exists())
+
+        # A document repeated more often than before is copied from a stored row
+        self.assertNotIn(rows[3].id, self.ids.values())
+        self.assertEqual((rows[3].content, rows[3].html_content), ("first", "<p>first</p>"))
+
+        self.assertEqual(
+            [rows[index].char_offset for index in range(4)],
+            [0, len("new"), len("new") + len("second"), len("new") + len("second") + len("first")],
+        )
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.content_length, len("newsecondfirstfirst"))
+
+
+class MinHashTests(SimpleTestCase):
+    TEXT = " ".join(f"word{number}" for number in range(400))
+
+    def test_shingles_are_distinct_sorted_32_bit_hashes(self):
+        shingles = text_shingles(self.TEXT)
+        self.assertEqual(len(shingles), 400 - SHINGLE_WORDS + 1)
+        self.assertTrue(np.all(np.diff(shingles) > 0))
+        self.assertTrue(np.all(shingles < 2 ** 32))
+
+    def test_shingles_ignore_case_and_punctuation(self):
+        np.testing.assert_array_equal(
+            text_shingles("One, two; THREE four five six!"),
+            text_shingles("one two three four five six"),
+        )
+
+    def test_short_and_empty_texts(self):
+        self.assertEqual(len(text_shingles("too short")), 1)
+        self.assertEqual(len(text_shingles("")), 0)
+        self.assertEqual(len(text_shingles("... !!!")), 0)
+
+    def test_long_tokens_are_truncated(self):
+        np.testing.assert_array_equal(
+            text_shingles("a" * 100 + "x"), text_shingles("a" * 100 + "y")
+        )
+
+    def test_signature_shape(self):
+        signature = minhash(text_shingles(self.TEXT))
+        self.assertEqual(signature.shape, (MINHASH_PERMUTATIONS,))
+        self.assertTrue(np.all(signature < 2 ** 32))
+
+    def test_similarity_follows_overlap(self):
+        signature = minhash(text_shingles(self.TEXT))
+        edited = minhash(text_shingles(self.TEXT.replace("word200 ", "changed ")))
+        other = minhash(text_shingles(" ".join(f"other{number}" for number in range(400))))
+
+        self.assertEqual(estimate_similarity(signature, signature), 1.0)
+        self.assertGreater(estimate_similarity(signature, edited), 0.9)
+        self.assertLess(estimate_similarity(signature, other), 0.1)
+        self.assertEqual(lsh_keys(signature), lsh_keys(minhash(text_shingles(self.TEXT))))
+
+    def test_merged_signature_is_signature_of_union(self):
+        first, second = self.TEXT[:1000], self.TEXT[1000:]
+        merged = minhash(text_shingles(second), minhash(text_shingles(first)))
+        union = np.union1d(text_shingles(first), text_shingles(second))
+        np.testing.assert_array_equal(merged, minhash(union))
+
+    def test_chunking_does_not_change_signature(self):
+        shingles = text_shingles(self.TEXT)
+        with mock.patch("bookapp.duplicates.MINHASH_CHUNK_SIZE", 7):
+            chunked = minhash(shingles)
+        np.testing.assert_array_equal(chunked, minhash(shingles))
+
+
+class RangeReadFileTests(SimpleTestCase):
+    def range_file(self, data, **kwargs):
+        return RangeReadFile(lambda start, end: data[start:end + 1], len(data), **kwargs)
+
+    def test_reads_and_seeks(self):
+        data = bytes(range(256)) * 40
+        remote = self.range_file(data, block_size=100, max_blocks=3)
+        remote.seek(950)
+        self.assertEqual(remote.read(120), data[950:1070])
+        remote.seek(-10, io.SEEK_END)
+        self.assertEqual(remote.read(), data[-10:])
+        self.assertEqual(remote.read(5), b"")
+
+    def test_cached_blocks_are_not_fetched_again(self):
+        data = bytes(1000)
+        remote = self.range_file(data, block_size=100, max_blocks=4)
+        remote.read(250)
+        remote.seek(0)
+        remote.read(250)
+        self.assertEqual(remote.requests, 1)
+
+    def test_entry_larger_than_block_cache(self):
+        big = bytes(range(256)) * 256
+        archive = io.BytesIO()
+        with zipfile.ZipFile(archive, "w") as zf:
+            zf.writestr("small.txt", "small")
+            zf.writestr("big.bin", big, compress_type=zipfile.ZIP_STORED)
+
+        remote = self.range_file(archive.getvalue(), block_size=1024, max_blocks=4)
+        with zipfile.ZipFile(remote) as zf:
+            self.assertEqual(zf.read("small.txt"), b"small")
+            self.assertEqual(zf.read("big.bin"), big)
+        self.assertLessEqual(len(remote._blocks), 4)
+
+
+class ExtractionBackendParityTests(SimpleTestCase):
+    MALFORMED = [
+        "<html><body><h1>T</h1><form><p>a</form><p>Rest of book</p><h2>x</h2></body></html>",
+        "<html><body><h1>T</h1><div><form><div><span>b</div></form><p>Rest</p>"
+        "<script>var a = '</p>';</script><p>End</p></div></body></html>",
+        "<html><body><p>a</p><object><object>x</object><p>y</object><p>z</p></body></html>",
+    ]
+
+    def test_backends_agree_on_malformed_unsafe_regions(self):
+        backends = {
+            name: backend() for name, backend in EXTRACTION_BACKENDS.items() if backend.is_available()
+        }
+        for document in self.MALFORMED:
+            results = {name: backend.extract(document) for name, backend in backends.items()}
+            expected = results.pop("html.parser")
+            for name, result in results.items():
+                with self.subTest(backend=name, document=document):
+                    self.assertEqual(result.html, expected.html)
+                    self.assertEqual(result.title, expected.title)
+                    self.assertEqual(result.text, expected.text)
+
+    def test_stream_backend_keeps_text_after_unclosed_tag_in_unsafe_region(self):
+        result = EXTRACTION_BACKENDS["stream"]().extract(self.MALFORMED[0])
+        self.assertEqual(
+            result.html, "<html><body><h1>T</h1><p>Rest of book</p><h2>x</h2></body></html>"
+        )
+
+
+class ComputeProgressTests(TestCase):
+    def setUp(self):
+        # Chapters of equal length; a full-page image between them shifts
+        # the CFI steps after it
+        epub = build_epub(
+            {"one.xhtml": chapter_document("One", "a" * 97), "two.xhtml": chapter_document("Two", "b" * 97)},
+            spine=["doc0", "img0", "doc1"],
+        )
+        self.book = Book.objects.create(title="Book", content_type="epub")
+        store_book_chapters(self.book, stream_epub_file(io.BytesIO(epub))["chapters"])
+
+    def test_cfi_itemref_maps_to_chapter_by_spine_position(self):
+        self.assertEqual(compute_progress_percent(self.book, cfi="epubcfi(/6/2!/4/2:0)"), 0)
+        self.assertEqual(
+            compute_progress_percent(self.book, cfi="epubcfi(/6/6!/4/2:0)", chapter_progress=0.5), 75
+        )
+        self.assertIsNone(compute_progress_percent(self.book, cfi="epubcfi(/6/4!/4/2:0)"))
+
+    def test_chapters_without_spine_position_use_their_index(self):
+        BookChapter.objects.filter(book=self.book).update(spine_position=None)
+        self.assertEqual(compute_progress_percent(self.book, cfi="epubcfi(/6/4!/4/2:0)"), 50)
+
+    def test_plain_text(self):
+        book = Book.objects.create(title="Text", content_type="plaintext", content="x" * 400)
+        self.assertEqual(compute_progress_percent(book, character_offset=100), 25)
+        self.assertIsNone(compute_progress_percent(book, character_offset=-1))
+
+
+class BookSearchVectorSignalTests(TestCase):
+    def setUp(self):
+        self.book = Book.objects.create(title="Book", content_type="plaintext", content="text")
+
+    def saves_rebuilding(self, change):
+        book = Book.objects.get(pk=self.book.pk)
+        change(book)
+        with mock.patch("bookapp.signals.update_book_search_vector") as update:
+            book.save()
+        return update.call_count
+
+    def test_unchanged_fields_do_not_rebuild(self):
+        self.assertEqual(self.saves_rebuilding(lambda book: setattr(book, "visibility", "personal")), 0)
+
+    def test_indexed_field_change_rebuilds(self):
+        self.assertEqual(self.saves_rebuilding(lambda book: setattr(book, "title", "Other")), 1)
+        self.assertEqual(self.saves_rebuilding(lambda book: setattr(book, "content", "more")), 1)
+
+    def test_epub_content_preview_is_not_indexed_on_save(self):
+        Book.objects.filter(pk=self.book.pk).update(content_type="epub")
+        self.assertEqual(self.saves_rebuilding(lambda book: setattr(book, "content", "preview")), 0)
+
+
+@skipUnless(connection.vendor == "postgresql", "Full-text search needs PostgreSQL")
+class BookSearchVectorTests(TestCase):
+    def test_long_text_is_capped_and_found_through_chapters(self):
+        book = Book.objects.create(title="Long", content_type="epub")
+        filler = "слово " * (SEARCH_TEXT_MAX_CHARS // 6)
+        store_book_chapters(book, [
+            {"id": 0, "title": "One", "content": filler, "content_hash": "a"},
+            {"id": 1, "title": "Two", "content": "редкостьпоследняя", "content_hash": "b"},
+        ])
+        update_book_search_vector(book)
+
+        found = rank_books(Book.objects.all(), build_search_query("редкостьпоследняя"))
+        self.assertEqual(list(found), [book])
+
+
+class BookTextIndexSignalTests(TestCase):
+    def setUp(self):
+        self.book = Book.objects.create(title="Book", content_type="plaintext", content="One. Two.")
+
+    def test_index_built_on_create(self):
+        self.assertEqual(BookTextIndex.objects.get(book=self.book).content_length, len("One. Two."))
+
+    def test_title_edit_keeps_index(self):
+        book = Book.objects.get(pk=self.book.pk)
+        book.title = "Other"
+        with mock.patch("bookapp.signals.build_text_index") as build:
+            book.save()
+        build.assert_not_called()
+        self.assertGreaterEqual(BookTextIndex.objects.get(book=book).updated_at, book.updated_at)
+
+    def test_content_edit_rebuilds_index(self):
+        book = Book.objects.get(pk=self.book.pk)
+        book.content = "One. Two. Three."
+        book.save()
+        self.assertEqual(BookTextIndex.objects.get(book=book).content_length, len("One. Two. Three."))
+
+
+class BookSignatureSignalTests(TestCase):
+    def setUp(self):
+        self.book = Book.objects.create(title="Book", content_type="plaintext", content="one two three four five six")
+
+    def test_signed_on_create(self):
+        self.assertTrue(BookSignature.objects.filter(book=self.book).exists())
+
+    def test_only_content_change_resigns(self):
+        book = Book.objects.get(pk=self.book.pk)
+        book.title = "Other"
+        with mock.patch("bookapp.signals.update_book_signature") as update:
+            book.save()
+            update.assert_not_called()
+            book.content = "seven eight nine ten eleven"
+            book.save()
+            update.assert_called_once_with(book)
+
+
+class FindInBookTests(TestCase):
+    def setUp(self):
+        self.book = Book.objects.create(title="Book", content_type="epub")
+        store_book_chapters(self.book, [
+            {"id": 0, "title": "One", "content": "Старый дом стоял.", "content_hash": "a"},
+            {"id": 1, "title": "Two", "content": "Ничего.", "content_hash": "b"},
+            {"id": 2, "title": "Three", "content": "Он вернулся домой. Старый\nдом ждал.", "content_hash": "c"},
+        ])
+
+    def test_hits_in_reading_order_with_offsets(self):
+        hits, truncated = find_in_book(self.book, phrase_pattern("старый ДОМ"))
+        self.assertFalse(truncated)
+        self.assertEqual(
+            [(hit["chapter_id"], hit["start"], hit["book_offset"], hit["match"]) for hit in hits],
+            [(0, 0, 0, "Старый дом"), (2, 19, 19 + 24, "Старый\nдом")],
+        )
+
+    def test_matches_inside_words_like_ctrl_f(self):
+        hits, _ = find_in_book(self.book, phrase_pattern("дом"))
+        self.assertEqual([(hit["chapter_id"], hit["chapter_hit"]) for hit in hits], [(0, 0), (2, 0), (2, 1)])
+
+    def test_hit_limit(self):
+        hits, truncated = find_in_book(self.book, phrase_pattern("дом"), max_hits=2)
+        self.assertEqual((len(hits), truncated), (2, True))
+
+
+class CreateBookCoverTests(MediaTestCase):
+    def test_rejected_upload_deletes_cover_and_variants(self):
+        epub = build_epub({"one.xhtml": chapter_document("One", "text " * 50)})
+        response = self.create_book(
+            corrupt_epub(epub),
+            featured_image=SimpleUploadedFile("cover.jpg", jpeg_image(), content_type="image/jpeg"),
+        )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Book.objects.exists())
+        self.assertEqual(self.media_files("book_img"), [])
+
+    def test_cover_variants_generated(self):
+        epub = build_epub({"one.xhtml": chapter_document("One", "text " * 50)})
+        response = self.create_book(
+            epub, featured_image=SimpleUploadedFile("cover.jpg", jpeg_image(), content_type="image/jpeg")
+        )
+
+        self.assertEqual(response.status_code, 200)
+        book = Book.objects.get()
+        variants = book.featured_image_variants
+        self.assertEqual(variants["source"], book.featured_image.name)
+        for name, variant in variants.items():
+            if name == "source":
+                continue
+            for key in ("webp", "jpeg"):
+                self.assertTrue(os.path.exists(os.path.join(self.media_root, variant[key])), variant[key])
+
+
+class EPUBHandlerCacheTests(SimpleTestCase):
+    def test_least_recently_used_handlers_are_evicted(self):
+        cache = EPUBHandlerCache(max_bytes=100)
+        first, second, third = object(), object(), object()
+        cache.put("a", first, 40)
+        cache.put("b", second, 40)
+        self.assertIs(cache.get("a"), first)
+        cache.put("c", third, 40)
+
+        self.assertIsNone(cache.get("b"))
+        self.assertIs(cache.get("a"), first)
+        self.assertIs(cache.get("c"), third)
+        self.assertEqual(cache.stats()["evictions"], 1)
+        self.assertEqual(cache.current_bytes, 80)
+
+    def test_replacing_an_entry_updates_the_size(self):
+        cache = EPUBHandlerCache(max_bytes=100)
+        cache.put("a", object(), 60)
+        cache.put("a", object(), 30)
+        self.assertEqual(cache.stats()["entries"], 1)
+        self.assertEqual(cache.current_bytes, 30)
+
+    def test_handler_larger_than_budget_is_not_cached(self):
+        cache = EPUBHandlerCache(max_bytes=100)
+        cache.put("a", object(), 101)
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.current_bytes, 0)
+
+
+class GetEPUBHandlerTests(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        epub_handler_cache.clear()
+        self.addCleanup(epub_handler_cache.clear)
+        self.create_book(build_epub({"one.xhtml": chapter_document("One", "first")}))
+        self.book = Book.objects.get()
+
+    def test_lazy_handler_is_reused_per_file_version(self):
+        handler = get_epub_handler(self.book.epub_file, lazy=True)
+        self.assertTrue(handler.lazy)
+        self.assertIs(get_epub_handler(self.book.epub_file, lazy=True), handler)
+        self.assertIsNot(get_epub_handler(self.book.epub_file), handler)
+        self.assertEqual(handler.get_chapter_by_id(0)["title"], "One")
+
+    def test_evicted_handler_is_parsed_again(self):
+        handler = get_epub_handler(self.book.epub_file, lazy=True)
+        # Fills the whole budget, evicting the book's handler
+        epub_handler_cache.put("filler", object(), epub_handler_cache.max_bytes)
+
+        reparsed = get_epub_handler(self.book.epub_file, lazy=True)
+        self.assertIsNot(reparsed, handler)
+        self.assertEqual(reparsed.get_chapter_by_id(0)["content"], handler.get_chapter_by_id(0)["content"])
+
+
+@override_settings(EPUB_BACKGROUND_INGESTION=True)
+class IngestJobTests(MediaTestCase):
+    EPUB = build_epub({"one.xhtml": chapter_document("One", "first"), "two.xhtml": chapter_document("Two", "second")})
+
+    def run_next_job(self):
+        job = claim_next_ingest_job()
+        self.assertIsNotNone(job)
+        return job, run_ingest_job(job)
+
+    def test_queued_upload_is_ingested_by_a_worker(self):
+        self.assertEqual(self.create_book(self.EPUB).status_code, 200)
+        book = Book.objects.get()
+        self.assertEqual(book.ingest_status, "processing")
+
+        response = self.client.get(f"/books/{book.slug}/chapters/0/")
+        self.assertEqual(response.status_code, 409)
+        response = self.client.get(f"/books/{book.slug}/ingest_status/")
+        self.assertEqual(response.data["job"]["status"], "queued")
+
+        job, ingested = self.run_next_job()
+        self.assertTrue(ingested)
+        self.assertEqual(job.attempts, 1)
+        self.assertIsNone(claim_next_ingest_job())
+
+        job.refresh_from_db()
+        book.refresh_from_db()
+        self.assertEqual((job.status, job.progress), ("done", 100))
+        self.assertEqual(book.ingest_status, "ready")
+        self.assertEqual(list(BookChapter.objects.filter(book=book).values_list("title", flat=True)), ["One", "Two"])
+        self.assertEqual(self.client.get(f"/books/{book.slug}/chapters/1/").status_code, 200)
+
+    def test_failed_upload_is_discarded(self):
+        self.create_book(corrupt_epub(self.EPUB))
+        book = Book.objects.get()
+
+        job, ingested = self.run_next_job()
+        self.assertFalse(ingested)
+
+        job.refresh_from_db()
+        book.refresh_from_db()
+        self.assertEqual(job.status, "failed")
+        self.assertIn("Corrupted file", job.error)
+        self.assertEqual(book.ingest_status, "failed")
+        self.assertFalse(book.epub_file)
+        self.assertEqual(self.media_files("epub_files"), [])
+
+    def test_failed_replacement_keeps_the_previous_file(self):
+        self.create_book(self.EPUB)
+        self.run_next_job()
+        book = Book.objects.get()
+        previous_name = book.epub_file.name
+
+        replacement = build_epub({"one.xhtml": chapter_document("New", "changed")})
+        response = self.client.put(
+            f"/update_book/{book.id}/",
+            {
+                "title": book.title,
+                "content_type": "epub",
+                "epub_file": SimpleUploadedFile("new.epub", corrupt_epub(replacement)),
+            },
+            format="multipart",
+        )
+        self.assertEqual(response.status_code, 200)
+
+        # Readers keep getting the stored chapters while the job is pending
+        self.assertEqual(self.client.get(f"/books/{book.slug}/chapters/0/").status_code, 200)
+
+        _, ingested = self.run_next_job()
+        self.assertFalse(ingested)
+        book.refresh_from_db()
+        self.assertEqual((book.ingest_status, book.epub_file.name), ("ready", previous_name))
+        self.assertEqual(list(BookChapter.objects.filter(book=book).values_list("title", flat=True)), ["One", "Two"])
+        self.assertEqual(self.media_files("epub_files"), [os.path.relpath(previous_name, "epub_files")])
+
+    def test_stale_running_jobs_are_requeued(self):
+        self.create_book(self.EPUB)
+        job = claim_next_ingest_job()
+        EpubIngestJob.objects.filter(pk=job.pk).update(started_at=timezone.now() - timedelta(hours=2))
+
+        self.assertEqual(requeue_stale_ingest_jobs(timezone.now() - timedelta(hours=1)), 1)
+        self.assertEqual(claim_next_ingest_job().attempts, 2)
+
+
+class ValidateEpubArchiveTests(SimpleTestCase):
+    EPUB = build_epub({"one.xhtml": chapter_document("One", "text " * 50)})
+
+    def with_entry(self, name, data, compress_type=zipfile.ZIP_STORED):
+        archive = io.BytesIO(self.EPUB)
+        with zipfile.ZipFile(archive, "a") as zf:
+            zf.writestr(name, data, compress_type=compress_type)
+        return io.BytesIO(archive.getvalue())
+
+    def test_valid_archive(self):
+        self.assertEqual(validate_epub_archive(io.BytesIO(self.EPUB)), (True, None))
+
+    def test_corrupted_entry_is_found_by_the_full_check_only(self):
+        corrupted = corrupt_epub(self.EPUB)
+        self.assertEqual(validate_epub_central_directory(io.BytesIO(corrupted)), (True, None))
+        self.assertEqual(
+            validate_epub_archive(io.BytesIO(corrupted)),
+            (False, "Corrupted file in EPUB archive: OEBPS/one.xhtml"),
+        )
+
+    def test_zip_bomb_ratio(self):
+        bomb = self.with_entry("OEBPS/zeros.xhtml", bytes(10 * 1024 * 1024), zipfile.ZIP_DEFLATED)
+        is_valid, error = validate_epub_archive(bomb)
+        self.assertFalse(is_valid)
+        self.assertIn("compression ratio", error)
+
+    @override_settings(MAX_EPUB_UNCOMPRESSED_SIZE=4096)
+    def test_uncompressed_size_budget(self):
+        is_valid, error = validate_epub_archive(self.with_entry("OEBPS/big.xhtml", b"x" * 8192))
+        self.assertFalse(is_valid)
+        self.assertTrue(error.startswith("Security check failed: Uncompressed size"))
+
+    def test_unsafe_paths(self):
+        for name in ("../evil.xhtml", "OEBPS/run.exe"):
+            with self.subTest(name=name):
+                is_valid, error = validate_epub_archive(self.with_entry(name, b"x"))
+                self.assertFalse(is_valid)
+                self.assertTrue(error.startswith("Security check failed: Suspicious"))
+
+    def test_structure(self):
+        archive = io.BytesIO()
+        with zipfile.ZipFile(archive, "w") as zf:
+            zf.writestr("mimetype", "application/zip")
+        self.assertEqual(
+            validate_epub_archive(archive),
+            (False, "Invalid mimetype: expected 'application/epub+zip', got 'application/zip'"),
+        )
+        self.assertEqual(
+            validate_epub_archive(io.BytesIO(b"not a zip")),
+            (False, "File is not a valid EPUB archive (not a ZIP file)"),
+        )
+
+
+class EPUBDiskCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.storage_dir = tempfile.mkdtemp()
+        self.cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.storage_dir, ignore_errors=True)
+        self.addCleanup(shutil.rmtree, self.cache_dir, ignore_errors=True)
+        self.storage = FileSystemStorage(location=self.storage_dir)
+
+    def field_file(self, name, data):
+        self.storage.save(name, io.BytesIO(data))
+        field_file = FieldFile(None, Book._meta.get_field("epub_file"), name)
+        field_file.storage = self.storage
+        return field_file
+
+    def test_download_once_then_hit(self):
+        cache = EPUBDiskCache(self.cache_dir, 1000)
+        field_file = self.field_file("a.epub", b"a" * 100)
+
+        path = cache.fetch(field_file)
+        with open(path, "rb") as f:
+            self.assertEqual(f.read(), b"a" * 100)
+        with mock.patch.object(cache, "_download") as download:
+            self.assertEqual(cache.fetch(field_file), path)
+        download.assert_not_called()
+
+    def test_file_larger_than_budget_is_not_cached(self):
+        cache = EPUBDiskCache(self.cache_dir, 50)
+        self.assertIsNone(cache.fetch(self.field_file("a.epub", b"a" * 100)))
+
+    def test_truncated_download_is_rejected(self):
+        cache = EPUBDiskCache(self.cache_dir, 1000)
+        field_file = self.field_file("a.epub", b"a" * 100)
+        with mock.patch.object(field_file, "open", return_value=io.BytesIO(b"a" * 10)):
+            with self.assertRaisesMessage(ValueError, "size mismatch"):
+                cache.fetch(field_file)
+        self.assertFalse([name for name in os.listdir(self.cache_dir) if not name.endswith(".lock")])
+
+    def test_evict_least_recently_used_and_keep_locks(self):
+        cache = EPUBDiskCache(self.cache_dir, 250)
+        old = cache.fetch(self.field_file("old.epub", b"o" * 100))
+        recent = cache.fetch(self.field_file("recent.epub", b"r" * 100))
+        past = time.time() - 100
+        os.utime(old, (past, past))
+        cache.fetch(self.field_file("new.epub", b"n" * 100))
+
+        self.assertFalse(os.path.exists(old))
+        self.assertTrue(os.path.exists(recent))
+        self.assertTrue(os.path.exists(old + ".lock"))
+
+    def test_evict_removes_stale_partial_downloads(self):
+        cache = EPUBDiskCache(self.cache_dir, 1000)
+        stale = os.path.join(self.cache_dir, "stale.part")
+        fresh = os.path.join(self.cache_dir, "fresh.part")
+        for path in (stale, fresh):
+            open(path, "wb").close()
+        past = time.time() - cache.STALE_PART_SECONDS - 1
+        os.utime(stale, (past, past))
+
+        cache.evict()
+        self.assertFalse(os.path.exists(stale))
+        self.assertTrue(os.path.exists(fresh))
+
+
+class ConditionalGetTests(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        self.create_book(build_epub({"one.xhtml": chapter_document("One", "first")}))
+        self.book = Book.objects.get()
+
+    def test_chapter_and_toc_revalidate_with_etag(self):
+        for url in (f"/books/{self.book.slug}/chapters/0/", f"/books/{self.book.slug}/chapters/"):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertTrue(response.has_header("Last-Modified"))
+
+                not_modified = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+                self.assertEqual(not_modified.status_code, 304)
+                self.assertEqual(not_modified["ETag"], response["ETag"])
+                self.assertEqual(not_modified.content, b"")
+
+                modified = self.client.get(url, HTTP_IF_NONE_MATCH='"stale"')
+                self.assertEqual(modified.status_code, 200)
+
+    def test_if_modified_since(self):
+        url = f"/books/{self.book.slug}/chapters/"
+        response = self.client.get(url)
+        self.assertEqual(
+            self.client.get(url, HTTP_IF_MODIFIED_SINCE=response["Last-Modified"]).status_code, 304
+        )
+
+    def test_representations_have_their_own_etags(self):
+        url = f"/books/{self.book.slug}/chapters/0/"
+        etags = {self.client.get(url + query)["ETag"] for query in ("", "?repr=html", "?repr=text")}
+        self.assertEqual(len(etags), 3)
+
+    def test_book_edit_changes_toc_etag(self):
+        url = f"/books/{self.book.slug}/chapters/"
+        etag = self.client.get(url)["ETag"]
+        Book.objects.filter(pk=self.book.pk).update(updated_at=timezone.now() + timedelta(seconds=5))
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class BookResourceTests(MediaTestCase):
+    DATA = bytes(range(256)) * 4
+
+    def setUp(self):
+        super().setUp()
+        self.create_book(
+            build_epub(
+                {"one.xhtml": chapter_document("One", "first")},
+                resources={"fonts/font.woff2": ("font/woff2", self.DATA)},
+            )
+        )
+        self.url = f"/books/{Book.objects.get().slug}/resources/fonts/font.woff2"
+
+    def test_full_response(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b"".join(response), self.DATA)
+        self.assertEqual(response["Accept-Ranges"], "bytes")
+        self.assertEqual(response["Content-Length"], str(len(self.DATA)))
+
+    def test_range_response(self):
+        response = self.client.get(self.url, HTTP_RANGE="bytes=10-19")
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b"".join(response), self.DATA[10:20])
+        self.assertEqual(response["Content-Range"], f"bytes 10-19/{len(self.DATA)}")
+
+        suffix = self.client.get(self.url, HTTP_RANGE="bytes=-4")
+        self.assertEqual(b"".join(suffix), self.DATA[-4:])
+
+    def test_unsatisfiable_range(self):
+        response = self.client.get(self.url, HTTP_RANGE=f"bytes={len(self.DATA)}-")
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response["Content-Range"], f"bytes */{len(self.DATA)}")
+
+    def test_not_modified(self):
+        etag = self.client.get(self.url)["ETag"]
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_missing_resource(self):
+        response = self.client.get(self.url.replace("font.woff2", "missing.woff2"))
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(CHAPTER_SEGMENT_SIZE=20)
+class CompressedChapterBodyTests(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        text = "First sentence here. Second sentence here. Third sentence here."
+        self.create_book(build_epub({"one.xhtml": chapter_document("One", text)}))
+        self.url = f"/books/{Book.objects.get().slug}/chapters/0/?repr=text&segment=0"
+
+    def get(self, **headers):
+        return self.client.get(self.url, **headers)
+
+    def test_compressed_body_matches_plain_response(self):
+        plain = self.get()
+        compressed = self.get(HTTP_ACCEPT_ENCODING="gzip")
+
+        self.assertEqual(compressed.status_code, 200)
+        self.assertEqual(compressed["Content-Encoding"], "gzip")
+        self.assertIn("Accept-Encoding", compressed["Vary"])
+        self.assertNotEqual(compressed["ETag"], plain["ETag"])
+        self.assertEqual(json.loads(gzip.decompress(compressed.content)), plain.json())
+        self.assertEqual(plain.json()["chapter"]["segment"], 0)
+
+    def test_stored_body_is_reused(self):
+        first = self.get(HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(BookChapterBody.objects.get().variant, "text:0")
+
+        with mock.patch("bookapp.views.books.compress_body") as compress:
+            second = self.get(HTTP_ACCEPT_ENCODING="gzip")
+        compress.assert_not_called()
+        self.assertEqual(second.content, first.content)
+
+    def test_body_for_old_etag_is_replaced(self):
+        self.get(HTTP_ACCEPT_ENCODING="gzip")
+        BookChapterBody.objects.update(etag='"stale"')
+
+        self.get(HTTP_ACCEPT_ENCODING="gzip")
+        self.assertNotEqual(BookChapterBody.objects.get().etag, '"stale"')
+
+    def test_identity_response_is_not_stored(self):
+        response = self.get(HTTP_ACCEPT_ENCODING="identity")
+        self.assertFalse(response.has_header("Content-Encoding"))
+        self.assertFalse(BookChapterBody.objects.exists())
+
+
+class ImportEpubsCommandTests(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        for title in ("Alpha", "Beta", "Gamma"):
+            epub = build_epub({"one.xhtml": chapter_document(title, f"{title} text")}, title=title)
+            with open(os.path.join(self.directory, f"{title.lower()}.epub"), "wb") as f:
+                f.write(epub)
+        with open(os.path.join(self.directory, "broken.epub"), "wb") as f:
+            f.write(b"not a zip file")
+
+    def run_import(self):
+        call_command("import_epubs", self.directory, "--workers", "1", stdout=io.StringIO())
+        with open(os.path.join(self.directory, ".import_epubs_checkpoint.json"), encoding="utf-8") as f:
+            return json.load(f)
+
+    def test_failed_book_is_rolled_back_and_retried(self):
+        def fail_for_beta(book):
+            if book.title == "Beta":
+                raise RuntimeError("boom")
+            return update_book_signature(book)
+
+        with mock.patch(
+            "bookapp.management.commands.import_epubs.update_book_signature", fail_for_beta
+        ):
+            state = self.run_import()
+
+        self.assertEqual(set(Book.objects.values_list("title", flat=True)), {"Alpha", "Gamma"})
+        self.assertEqual(BookChapter.objects.count(), 2)
+        self.assertEqual(set(state["done"]), {"alpha.epub", "gamma.epub"})
+        self.assertEqual(set(state["failed"]), {"beta.epub", "broken.epub"})
+        self.assertIn("boom", state["failed"]["beta.epub"])
+
+        state = self.run_import()
+        self.assertEqual(Book.objects.count(), 3)
+        self.assertEqual(set(state["done"]), {"alpha.epub", "beta.epub", "gamma.epub"})
+        self.assertEqual(set(state["failed"]), {"broken.epub"})
+
+    def test_imported_books_are_indexed(self):
+        self.run_import()
+        book = Book.objects.get(title="Alpha")
+        self.assertEqual(book.ingest_status, "ready")
+        self.assertTrue(BookSignature.objects.filter(book=book).exists())
+        self.assertEqual(BookChapter.objects.get(book=book).title, "Alpha")
+
+
+class InlineExecutor:
+    """Stands in for ProcessPoolExecutor so workers see the test database and media."""
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def map(self, fn, *iterables):
+        return map(fn, *iterables)
+
+
+@mock.patch("bookapp.management.commands.reprocess_books.ProcessPoolExecutor", InlineExecutor)
+class ReprocessBooksCommandTests(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        self.create_book(build_epub(
+            {
+                "one.xhtml": chapter_document("One", "first"),
+                "two.xhtml": chapter_document("Two", "second"),
+            },
+            nav=[("one.xhtml", "Start"), ("two.xhtml", "Part two")],
+        ))
+        self.book = Book.objects.get()
+        self.cursor_path = os.path.join(settings.MEDIA_ROOT, "cursor.json")
+
+    def reprocess(self, *args):
+        call_command("reprocess_books", "--cursor", self.cursor_path, *args, stdout=io.StringIO())
+        with open(self.cursor_path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def test_rebuilds_chapters_and_toc(self):
+        toc = Book.objects.get().table_of_contents
+        BookChapter.objects.all().delete()
+        Book.objects.update(table_of_contents=[])
+
+        cursor = self.reprocess()
+
+        self.assertEqual(Book.objects.get().table_of_contents, toc)
+        self.assertEqual(
+            list(BookChapter.objects.order_by("index").values_list("title", flat=True)), ["One", "Two"]
+        )
+        self.assertEqual(cursor["last_id"], self.book.id)
+        self.assertEqual(cursor["failed"], {})
+
+    def test_toc_only_keeps_chapters(self):
+        toc = Book.objects.get().table_of_contents
+        BookChapter.objects.filter(index=1).delete()
+        Book.objects.update(table_of_contents=[])
+
+        self.reprocess("--toc-only")
+
+        self.assertEqual(Book.objects.get().table_of_contents, toc)
+        self.assertEqual(BookChapter.objects.count(), 1)
+
+    def test_resumes_after_cursor_and_records_failures(self):
+        self.reprocess()
+        self.create_book(build_epub({"one.xhtml": chapter_document("Other", "text")}), title="Other")
+        other = Book.objects.get(title="Other")
+        Book.objects.filter(pk=other.pk).update(epub_file="epubs/missing.epub")
+
+        cursor = self.reprocess()
+
+        self.assertEqual(cursor["processed"], 2)
+        self.assertEqual(cursor["last_id"], other.id)
+        self.assertEqual(list(cursor["failed"]), [str(other.id)])
+
+    def test_toc_only_lists_stored_chapters_of_books_without_toc(self):
+        self.create_book(build_epub({
+            "one.xhtml": chapter_document("One", "first"),
+            "two.xhtml": chapter_document("Two", "second"),
+        }), title="Plain")
+        plain = Book.objects.get(title="Plain")
+        Book.objects.filter(pk=plain.pk).update(table_of_contents=[])
+
+        self.reprocess("--toc-only", "--ids", str(plain.pk))
+
+        toc = Book.objects.get(pk=plain.pk).table_of_contents
+        self.assertEqual([(entry["title"], entry["chapter_id"]) for entry in toc], [("One", 0), ("Two", 1)])
+
+    def test_rejects_bad_since_date(self):
+        with self.assertRaises(CommandError):
+            call_command("reprocess_books", "--cursor", self.cursor_path, "--since", "yesterday")
+
+
+@mock.patch.object(EPUBHandler, "_extract_chapter", side_effect=AssertionError("chapter extracted"))
+class ProbeEpubTests(SimpleTestCase):
+    DOCUMENTS = {
+        "one.xhtml": chapter_document("One", "first"),
+        "two.xhtml": chapter_document("Two", "second"),
+    }
+
+    def test_reads_metadata_spine_and_toc(self, extract):
+        epub = build_epub(
+            self.DOCUMENTS, title="Probe", nav=[("one.xhtml", "Start"), ("two.xhtml#part", "Part")]
+        )
+
+        probe = probe_epub(io.BytesIO(epub))
+
+        self.assertEqual(probe["metadata"]["title"], "Probe")
+        self.assertEqual(probe["spine"], ["one.xhtml", "two.xhtml"])
+        self.assertEqual(
+            [(entry["title"], entry["chapter_id"], entry["anchor"]) for entry in probe["table_of_contents"]],
+            [("Start", 0, None), ("Part", 1, "part")],
+        )
+        extract.assert_not_called()
+
+    def test_book_without_toc_is_not_extracted(self, extract):
+        probe = probe_epub(io.BytesIO(build_epub(self.DOCUMENTS)))
+
+        self.assertEqual(probe["table_of_contents"], [])
+        self.assertEqual(probe["spine"], ["one.xhtml", "two.xhtml"])
+        extract.assert_not_called()
+
+    def test_rejects_non_epub(self, extract):
+        with self.assertRaises(ValueError):
+            probe_epub(io.BytesIO(b"not a zip file"))
+
+
+class StreamEpubFileTests(SimpleTestCase):
+    DOCUMENTS = {
+        "one.xhtml": chapter_document("One", "first"),
+        "two.xhtml": chapter_document("Two", "second"),
+    }
+
+    def test_yields_chapters_and_builds_toc_while_consumed(self):
+        data = stream_epub_file(io.BytesIO(build_epub(self.DOCUMENTS)))
+        self.assertEqual(data["chapter_count"], 2)
+        self.assertEqual(data["table_of_contents"], [])
+
+        chapters = data["chapters"]
+        first = next(chapters)
+        self.assertEqual((first["id"], first["title"]), (0, "One"))
+        self.assertEqual(len(data["table_of_contents"]), 1)
+
+        self.assertEqual([chapter["title"] for chapter in chapters], ["Two"])
+        self.assertEqual([entry["title"] for entry in data["table_of_contents"]], ["One", "Two"])
+
+    def test_unreadable_chapter_raises(self):
+        chapters = stream_epub_file(io.BytesIO(corrupt_epub(build_epub(self.DOCUMENTS))))["chapters"]
+        with self.assertRaises(zipfile.BadZipFile):
+            list(chapters)
+
+    def test_legacy_encoding_is_decoded(self):
+        document = (
+            '<?xml version="1.0" encoding="windows-1251"?><html xmlns="http://www.w3.org/1999/xhtml">'
+            "<head><title>Глава</title></head><body><p>Привет, мир</p></body></html>"
+        ).encode("cp1251")
+        epub = build_epub({"one.xhtml": document})
+
+        chapter = next(stream_epub_file(io.BytesIO(epub))["chapters"])
+
+        self.assertEqual(chapter["title"], "Глава")
+        self.assertIn("Привет, мир", chapter["content"])
+
+    def test_known_chapters_are_not_extracted(self):
+        epub = build_epub(self.DOCUMENTS)
+        first = next(stream_epub_file(io.BytesIO(epub))["chapters"])
+
+        with mock.patch.object(
+            EPUBHandler, "_extract_chapter", autospec=True, side_effect=EPUBHandler._extract_chapter
+        ) as extract:
+            chapters = list(
+                stream_epub_file(io.BytesIO(epub), {first["content_hash"]: "One"})["chapters"]
+            )
+
+        self.assertEqual(chapters[0], {
+            "id": 0,
+            "title": "One",
+            "file_name": "one.xhtml",
+            "content_hash": first["content_hash"],
+            "spine_position": 0,
+            "unchanged": True,
+        })
+        self.assertEqual(chapters[1]["title"], "Two")
+        self.assertEqual(extract.call_count, 1)
+
+
+class ParallelExtractionTests(SimpleTestCase):
+    DOCUMENTS = {
+        f"{number}.xhtml": chapter_document(f"Chapter {number}", f"Text of chapter {number}. " * 50)
+        for number in range(6)
+    }
+
+    def chapters(self, epub, known_chapters=None, **kwargs):
+        handler = EPUBHandler(io.BytesIO(epub), lazy=True, **kwargs)
+        return list(handler.iter_chapters(known_chapters))
+
+    @override_settings(EPUB_PARALLEL_EXTRACTION_MIN_BYTES=0)
+    def test_parallel_matches_serial(self):
+        epub = build_epub(self.DOCUMENTS, spine=["doc0", "img0", "doc1", "doc2", "doc3", "doc4", "doc5"])
+        serial = self.chapters(epub, parallel_workers=0)
+
+        parallel = self.chapters(epub, parallel_workers=2)
+        self.assertEqual(parallel, serial)
+
+        known = {serial[2]["content_hash"]: serial[2]["title"]}
+        parallel = self.chapters(epub, known, parallel_workers=2)
+        self.assertTrue(parallel[2]["unchanged"])
+        self.assertEqual(parallel[:2] + parallel[3:], serial[:2] + serial[3:])
+
+    @override_settings(EPUB_PARALLEL_EXTRACTION_MIN_BYTES=10 * 1024 * 1024)
+    def test_small_books_stay_serial(self):
+        with mock.patch("bookapp.epub_handler.ProcessPoolExecutor") as pool:
+            chapters = self.chapters(build_epub(self.DOCUMENTS), parallel_workers=4)
+        pool.assert_not_called()
+        self.assertEqual(len(chapters), 6)
+
+
+class ReanchorCommentsTests(MediaTestCase):
+    def comment(self, cfi_range, **data):
+        return BookComment.objects.create(
+            book=self.book, user=self.user, cfi_range=cfi_range, comment_text="note", **data
+        )
+
+    def replace_epub(self, epub):
+        return self.client.put(
+            f"/update_book/{self.book.id}/",
+            {
+                "title": self.book.title,
+                "content_type": "epub",
+                "epub_file": SimpleUploadedFile("new.epub", epub),
+            },
+            format="multipart",
+        )
+
+    def test_comments_follow_moved_chapters(self):
+        self.create_book(build_epub({
+            "one.xhtml": chapter_document("One", "first"),
+            "two.xhtml": chapter_document("Two", "second"),
+            "three.xhtml": chapter_document("Three", "third"),
+        }))
+        self.book = Book.objects.get()
+        moved = self.comment("epubcfi(/6/4[doc1]!/4/2/1:0,/1:5)")
+        changed = self.comment("epubcfi(/6/6[doc2]!/4/2/1:0,/1:5)")
+        reply = self.comment(None, parent_comment=moved)
+
+        replacement = build_epub({
+            "intro.xhtml": chapter_document("Intro", "new"),
+            "one.xhtml": chapter_document("One", "first"),
+            "two.xhtml": chapter_document("Two", "second"),
+            "three.xhtml": chapter_document("Three", "rewritten"),
+        })
+        self.assertEqual(self.replace_epub(replacement).status_code, 200)
+
+        moved.refresh_from_db()
+        changed.refresh_from_db()
+        reply.refresh_from_db()
+        self.assertEqual(moved.cfi_range, "epubcfi(/6/6[doc2]!/4/2/1:0,/1:5)")
+        self.assertEqual(changed.cfi_range, "epubcfi(/6/6[doc2]!/4/2/1:0,/1:5)")
+        self.assertIsNone(reply.cfi_range)
+
+    def test_non_document_spine_items_are_counted(self):
+        documents = {
+            "one.xhtml": chapter_document("One", "first"),
+            "two.xhtml": chapter_document("Two", "second"),
+        }
+        self.create_book(build_epub(documents, spine=["doc0", "img0", "doc1"]))
+        self.book = Book.objects.get()
+        comment = self.comment("epubcfi(/6/6[doc1]!/4/2/1:0)")
+
+        self.assertEqual(self.replace_epub(build_epub(documents)).status_code, 200)
+
+        comment.refresh_from_db()
+        self.assertEqual(comment.cfi_range, "epubcfi(/6/4[doc1]!/4/2/1:0)")
+
+
+class ContentAddressedStorageTests(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        self.epub = build_epub({"one.xhtml": chapter_document("One", "first")})
+        self.name = epub_content_name(hashlib.sha256(self.epub).hexdigest())
+
+    def stored_files(self):
+        return self.media_files("epub_files")
+
+    def test_identical_uploads_share_one_file(self):
+        self.create_book(self.epub, title="First")
+        self.create_book(self.epub, title="Second")
+
+        self.assertEqual(
+            set(Book.objects.values_list("epub_file", flat=True)), {self.name}
+        )
+        self.assertEqual(len(self.stored_files()), 1)
+        self.assertEqual(BookChapter.objects.filter(book__title="Second").count(), 1)
+
+    def test_file_is_deleted_with_its_last_book(self):
+        self.create_book(self.epub, title="First")
+        self.create_book(self.epub, title="Second")
+        first, second = Book.objects.order_by("id")
+
+        self.assertEqual(self.client.delete(f"/delete_book/{first.id}/").status_code, 204)
+        self.assertEqual(len(self.stored_files()), 1)
+
+        self.assertEqual(self.client.delete(f"/delete_book/{second.id}/").status_code, 204)
+        self.assertEqual(self.stored_files(), [])
+
+    def test_replaced_file_is_kept_while_shared(self):
+        self.create_book(self.epub, title="First")
+        self.create_book(self.epub, title="Second")
+        first = Book.objects.get(title="First")
+
+        replacement = build_epub({"one.xhtml": chapter_document("New", "changed")})
+        response = self.client.put(
+            f"/update_book/{first.id}/",
+            {
+                "title": first.title,
+                "content_type": "epub",
+                "epub_file": SimpleUploadedFile("new.epub", replacement),
+            },
+            format="multipart",
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(self.stored_files()), 2)
+        self.assertEqual(Book.objects.get(title="Second").epub_file.name, self.name)
+
+    def test_release_keeps_file_of_unfinished_job(self):
+        self.create_book(self.epub, title="First")
+        self.create_book(build_epub({"one.xhtml": chapter_document("Other", "text")}), title="Other")
+        first = Book.objects.get(title="First")
+        storage = first.epub_file.storage
+        # The other book's replacement is still running and may restore the file
+        job = EpubIngestJob.objects.filter(book__title="Other").get()
+        EpubIngestJob.objects.filter(pk=job.pk).update(status="running", replaced_epub_name=self.name)
+
+        self.assertFalse(release_epub_file(storage, self.name, book=first))
+        self.assertTrue(storage.exists(self.name))
+
+        self.assertTrue(release_epub_file(storage, self.name, book=first, job=job))
+        self.assertFalse(storage.exists(self.name))
@@ -0,0 +1,174 @@
+"""
+Windowed paging of plain text books.
+
+A boundary index (paragraph and sentence start offsets) is built when a
+plain text book is saved and stored in BookTextIndex, so a page can be cut
+from `Book.content` in the database without loading the whole text.
+"""
+
+import re
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Dict, List, Optional
+
+from django.db.models.functions import Substr
+
+from .models import Book, BookTextIndex
+
+DEFAULT_WINDOW_LENGTH = 5000
+MAX_WINDOW_LENGTH = 50000
+
+# A sentence starts after terminal punctuation (and closing quotes/brackets)
+# followed by whitespace
+SENTENCE_BOUNDARY_RE = re.compile(r'[.!?…]+[»"”’)\]]*\s+(?=\S)')
+
+# A paragraph starts after a line break
+PARAGRAPH_BOUNDARY_RE = re.compile(r'\n\s*(?=\S)')
+
+
+def find_boundaries(text: str) -> Dict[str, List[int]]:
+    """
+    Find paragraph and sentence start offsets in a text.
+
+    Args:
+        text: Book content
+
+    Returns:
+        Dictionary with sorted 'paragraphs' and 'sentences' offsets; every
+        paragraph start is also a sentence start
+    """
+    paragraphs = [match.end() for match in PARAGRAPH_BOUNDARY_RE.finditer(text)]
+    sentences = sorted(
+        set(paragraphs) | {match.end() for match in SENTENCE_BOUNDARY_RE.finditer(text)}
+    )
+    return {"paragraphs": paragraphs, "sentences": sentences}
+
+
+def _pack(offsets: List[int]) -> bytes:
+    return array("I", offsets).tobytes()
+
+
+def _unpack(data) -> array:
+    offsets = array("I")
+    offsets.frombytes(bytes(data))
+    return offsets
+
+
+def build_text_index(book: Book) -> BookTextIndex:
+    """
+    Build and store the boundary index of a plain text book.
+
+    Args:
+        book: Book with its content loaded
+
+    Returns:
+        Saved BookTextIndex
+    """
+    content = book.content or ""
+    boundaries = find_boundaries(content)
+    index, _ = BookTextIndex.objects.update_or_create(
+        book=book,
+        defaults={
+            "content_length": len(content),
+            "paragraph_boundaries": _pack(boundaries["paragraphs"]),
+            "sentence_boundaries": _pack(boundaries["sentences"]),
+        },
+    )
+    return index
+
+
+def get_text_index(book: Book) -> BookTextIndex:
+    """
+    Get the stored boundary index of a book, building it if missing or stale.
+
+    Args:
+        book: Plain text book
+
+    Returns:
+        BookTextIndex
+    """
+    index = BookTextIndex.objects.filter(book=book).first()
+    if index is None or index.updated_at < book.updated_at:
+        # Books saved before the index existed, or edited via update()
+        index = build_text_index(Book.objects.get(pk=book.pk))
+    return index
+
+
+def plan_window(index: BookTextIndex, offset: int, length: int) -> Dict[str, Optional[int]]:
+    """
+    Choose the bounds of a page of about `length` characters.
+
+    The start snaps back to the closest sentence start. The end snaps back
+    to a paragraph start in the second half of the window, else to a
+    sentence start, else the window is cut at `length` characters.
+
+    Args:
+        index: Boundary index of the book
+        offset: Requested character offset
+        length: Requested window length
+
+    Returns:
+        Dictionary with start, end, next_offset and prev_offset
+        (None at the start / end of the book)
+    """
+    total = index.content_length
+    sentences = _unpack(index.sentence_boundaries)
+    paragraphs = _unpack(index.paragraph_boundaries)
+
+    offset = max(0, min(offset, total))
+    position = bisect_right(sentences, offset)
+    start = sentences[position - 1] if position else 0
+
+    limit = start + length
+    if limit >= total:
+        end = total
+    else:
+        end = limit
+        position = bisect_right(paragraphs, limit)
+        if position and paragraphs[position - 1] > start + length // 2:
+            end = paragraphs[position - 1]
+        else:
+            position = bisect_right(sentences, limit)
+            if position and sentences[position - 1] > start:
+                end = sentences[position - 1]
+
+    prev_offset = None
+    if start > 0:
+        if start <= length:
+            prev_offset = 0
+        else:
+            # Earliest sentence start that keeps the previous page within `length`
+            position = bisect_left(sentences, start - length)
+            if position < len(sentences) and sentences[position] < start:
+                prev_offset = sentences[position]
+            else:
+                prev_offset = start - length
+
+    return {
+        "start": start,
+        "end": end,
+        "next_offset": end if end < total else None,
+        "prev_offset": prev_offset,
+    }
+
+
+def read_text_window(book: Book, start: int, end: int) -> str:
+    """
+    Read characters [start, end) of a book's content in the database.
+
+    Args:
+        book: Book
+        start: First character offset
+        end: End offset (exclusive)
+
+    Returns:
+        Text of the window
+    """
+    if end <= start:
+        return ""
+    return (
+        Book.objects.filter(pk=book.pk)
+        .annotate(window=Substr("content", start + 1, end - start))
+        .values_list("window", flat=True)
+        .first()
+    ) or ""
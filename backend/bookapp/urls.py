@@ -6,8 +6,10 @@ from .auth_views import register_user
 urlpatterns = [
     path("register_user/", register_user, name="register_user"),
     path("create_book/", views.create_book, name="create_book"),
+    path("probe_epub/", views.probe_epub_upload, name="probe_epub_upload"),
     path("create_notification/", views.create_notification, name="create_notification"),
     path("books/by_hashtag/", views.search_books_by_hashtag, name="search_books_by_hashtag"),
+    path("books/search/", views.search_books, name="search_books"),
     path("book_list/<int:amount>/", views.book_list, name="book_list"),
     path("public_books/<int:amount>/", views.public_book_list, name="public_book_list"),
     # path("group_list", views.reading_group_list, name="group_list"),
@@ -31,6 +33,26 @@ urlpatterns = [
         views.get_book_chapters_list,
         name="get_book_chapters_list",
     ),
+    path(
+        "books/<slug:slug>/text/",
+        views.get_book_text_window,
+        name="get_book_text_window",
+    ),
+    path(
+        "books/<slug:slug>/find/",
+        views.find_in_book_text,
+        name="find_in_book_text",
+    ),
+    path(
+        "books/<slug:slug>/resources/<path:resource_path>",
+        views.get_book_resource,
+        name="get_book_resource",
+    ),
+    path(
+        "books/<slug:slug>/ingest_status/",
+        views.get_book_ingest_status,
+        name="get_book_ingest_status",
+    ),
     path("books/<slug:slug>", views.get_book, name="get_book"),
     path("update_book/<int:pk>/", views.update_book, name="update_book"),
     path("delete_book/<int:pk>/", views.delete_book, name="delete_book"),
@@ -4,6 +4,7 @@ Validators for book content, including EPUB file validation.
 
 import os
 import zipfile
+import zlib
 from django.core.exceptions import ValidationError
 from django.conf import settings
 
@@ -35,111 +36,209 @@ def validate_epub_file_size(value):
         )
 
 
-def validate_epub_structure(file_path):
+EPUB_MIMETYPE = 'application/epub+zip'
+EPUB_CONTAINER_PATH = 'META-INF/container.xml'
+
+# Files that should never appear inside an EPUB
+SUSPICIOUS_EXTENSIONS = ['.exe', '.bat', '.sh', '.cmd', '.ps1', '.dll']
+
+# Chunk size used when streaming entries to verify their CRC
+CRC_CHUNK_SIZE = 64 * 1024
+
+
+class EPUBArchiveError(Exception):
+    """Raised by the archive checks; `security` marks zip bomb / traversal issues."""
+
+    def __init__(self, message, security=False):
+        super().__init__(message)
+        self.security = security
+
+
+def _check_central_directory(zip_file, max_entries, max_ratio, max_uncompressed):
     """
-    Validate that the EPUB file has the correct structure.
+    Check an EPUB archive using only its central directory.
 
-    An EPUB file is essentially a ZIP archive with specific required files:
-    - mimetype file (must be first in the archive)
-    - META-INF/container.xml
+    Nothing is decompressed except the tiny mimetype entry.
 
     Args:
-        file_path: Path to the EPUB file
+        zip_file: Open ZipFile
+        max_entries: Maximum number of entries
+        max_ratio: Maximum total uncompressed/compressed size ratio
+        max_uncompressed: Maximum declared total uncompressed size in bytes
 
     Returns:
-        Tuple of (is_valid, error_message)
+        List of ZipInfo entries
+
+    Raises:
+        EPUBArchiveError: On the first violation
     """
-    try:
-        # Check if file is a valid ZIP archive
-        if not zipfile.is_zipfile(file_path):
-            return False, "File is not a valid EPUB archive (not a ZIP file)"
+    infos = zip_file.infolist()
 
-        with zipfile.ZipFile(file_path, 'r') as zip_file:
-            # Get list of files in the archive
-            file_list = zip_file.namelist()
+    if len(infos) > max_entries:
+        raise EPUBArchiveError(
+            f"EPUB contains unusually large number of files ({len(infos)})", security=True
+        )
+
+    names = set()
+    total_compressed = 0
+    total_uncompressed = 0
+
+    for info in infos:
+        filename = info.filename
+
+        # Check for path traversal patterns
+        if '..' in filename or filename.startswith('/'):
+            raise EPUBArchiveError(f"Suspicious file path detected: {filename}", security=True)
+
+        ext = os.path.splitext(filename)[1].lower()
+        if ext in SUSPICIOUS_EXTENSIONS:
+            raise EPUBArchiveError(f"Suspicious executable file detected: {filename}", security=True)
+
+        names.add(filename)
+        total_compressed += info.compress_size
+        total_uncompressed += info.file_size
 
-            # Check for required mimetype file
-            if 'mimetype' not in file_list:
-                return False, "EPUB file is missing required 'mimetype' file"
+    if total_uncompressed > max_uncompressed:
+        raise EPUBArchiveError(
+            f"Uncompressed size ({total_uncompressed / (1024 * 1024):.1f}MB) exceeds the "
+            f"limit of {max_uncompressed / (1024 * 1024):.1f}MB",
+            security=True,
+        )
+
+    if total_compressed > 0:
+        ratio = total_uncompressed / total_compressed
+        # If uncompressed is much larger than compressed, it might be a zip bomb
+        if ratio > max_ratio:
+            raise EPUBArchiveError(
+                f"Suspicious compression ratio ({ratio:.1f}:1). File may be a zip bomb.",
+                security=True,
+            )
+
+    if 'mimetype' not in names:
+        raise EPUBArchiveError("EPUB file is missing required 'mimetype' file")
+
+    mimetype_info = zip_file.getinfo('mimetype')
+    if mimetype_info.file_size > 1024:
+        raise EPUBArchiveError("Invalid mimetype: 'mimetype' file is too large")
+
+    mimetype_content = zip_file.read(mimetype_info).decode('utf-8').strip()
+    if mimetype_content != EPUB_MIMETYPE:
+        raise EPUBArchiveError(
+            f"Invalid mimetype: expected '{EPUB_MIMETYPE}', got '{mimetype_content}'"
+        )
 
-            # Read and validate mimetype
-            mimetype_content = zip_file.read('mimetype').decode('utf-8').strip()
-            if mimetype_content != 'application/epub+zip':
-                return False, f"Invalid mimetype: expected 'application/epub+zip', got '{mimetype_content}'"
+    if EPUB_CONTAINER_PATH not in names:
+        raise EPUBArchiveError(f"EPUB file is missing required '{EPUB_CONTAINER_PATH}' file")
 
-            # Check for META-INF/container.xml
-            if 'META-INF/container.xml' not in file_list:
-                return False, "EPUB file is missing required 'META-INF/container.xml' file"
+    return infos
+
+
+def _verify_entries(zip_file, infos, max_uncompressed):
+    """
+    Decompress every entry once to verify its CRC within a byte budget.
 
-            # Verify ZIP file integrity
-            bad_file = zip_file.testzip()
-            if bad_file:
-                return False, f"Corrupted file in EPUB archive: {bad_file}"
+    zipfile raises BadZipFile on a CRC mismatch when an entry is read to
+    the end, and never returns more than the size declared in the central
+    directory, so the budget also covers entries that lie about their size.
+
+    Args:
+        zip_file: Open ZipFile
+        infos: Entries returned by _check_central_directory()
+        max_uncompressed: Total decompressed-bytes budget
+
+    Raises:
+        EPUBArchiveError: On the first corrupted entry or when over budget
+    """
+    remaining = max_uncompressed
+
+    for info in infos:
+        if info.is_dir():
+            continue
+        try:
+            with zip_file.open(info) as entry:
+                while True:
+                    chunk = entry.read(CRC_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    remaining -= len(chunk)
+                    if remaining < 0:
+                        raise EPUBArchiveError(
+                            "Decompressed size exceeds the allowed limit. File may be a zip bomb.",
+                            security=True,
+                        )
+        except (zipfile.BadZipFile, zlib.error, EOFError):
+            raise EPUBArchiveError(f"Corrupted file in EPUB archive: {info.filename}")
+
+
+def validate_epub_archive(file_path):
+    """
+    Validate the structure and safety of an EPUB archive in a single pass.
+
+    The archive is opened once. Structure, paths, entry count, declared sizes
+    and compression ratio are checked from the central directory first, so
+    zip bombs are rejected without decompressing anything; then every entry
+    is streamed once to verify its CRC under a total decompressed-bytes
+    budget (MAX_EPUB_UNCOMPRESSED_SIZE). Checking stops at the first
+    violation.
+
+    Args:
+        file_path: Path to the EPUB file (or a seekable binary file object)
+
+    Returns:
+        Tuple of (is_valid, error_message)
+    """
+    max_entries = getattr(settings, 'MAX_EPUB_ENTRIES', 10000)
+    max_ratio = getattr(settings, 'MAX_EPUB_COMPRESSION_RATIO', 100)
+    max_uncompressed = getattr(settings, 'MAX_EPUB_UNCOMPRESSED_SIZE', 256 * 1024 * 1024)
+
+    try:
+        with zipfile.ZipFile(file_path, 'r') as zip_file:
+            infos = _check_central_directory(zip_file, max_entries, max_ratio, max_uncompressed)
+            _verify_entries(zip_file, infos, max_uncompressed)
 
         return True, None
 
+    except EPUBArchiveError as e:
+        if e.security:
+            return False, f"Security check failed: {e}"
+        return False, str(e)
     except zipfile.BadZipFile:
-        return False, "File is corrupted or not a valid ZIP archive"
+        return False, "File is not a valid EPUB archive (not a ZIP file)"
     except Exception as e:
         return False, f"Error validating EPUB structure: {str(e)}"
 
 
-def validate_epub_content_safety(file_path):
+def validate_epub_central_directory(file_path):
     """
-    Perform basic safety checks on EPUB content.
+    Run only the checks of validate_epub_archive() that read the central
+    directory, without verifying entry CRCs.
+
+    Cheap enough to run on every upload before the package is probed.
 
     Args:
-        file_path: Path to the EPUB file
+        file_path: Path to the EPUB file (or a seekable binary file object)
 
     Returns:
-        Tuple of (is_safe, warning_message)
+        Tuple of (is_valid, error_message)
     """
-    warnings = []
+    max_entries = getattr(settings, 'MAX_EPUB_ENTRIES', 10000)
+    max_ratio = getattr(settings, 'MAX_EPUB_COMPRESSION_RATIO', 100)
+    max_uncompressed = getattr(settings, 'MAX_EPUB_UNCOMPRESSED_SIZE', 256 * 1024 * 1024)
 
     try:
         with zipfile.ZipFile(file_path, 'r') as zip_file:
-            file_list = zip_file.namelist()
-
-            # Check for suspicious file paths (path traversal attempts)
-            for filename in file_list:
-                # Check for path traversal patterns
-                if '..' in filename or filename.startswith('/'):
-                    warnings.append(f"Suspicious file path detected: {filename}")
-
-                # Check for executable files (shouldn't be in EPUB)
-                suspicious_extensions = ['.exe', '.bat', '.sh', '.cmd', '.ps1', '.dll']
-                ext = os.path.splitext(filename)[1].lower()
-                if ext in suspicious_extensions:
-                    warnings.append(f"Suspicious executable file detected: {filename}")
-
-            # Check for excessively large number of files (possible zip bomb)
-            if len(file_list) > 10000:
-                warnings.append(f"EPUB contains unusually large number of files ({len(file_list)})")
-
-            # Check uncompressed size vs compressed size ratio
-            total_compressed = 0
-            total_uncompressed = 0
-
-            for info in zip_file.infolist():
-                total_compressed += info.compress_size
-                total_uncompressed += info.file_size
-
-            if total_compressed > 0:
-                ratio = total_uncompressed / total_compressed
-                # If uncompressed is more than 100x compressed, it might be a zip bomb
-                if ratio > 100:
-                    warnings.append(
-                        f"Suspicious compression ratio ({ratio:.1f}:1). "
-                        "File may be a zip bomb."
-                    )
-
-        if warnings:
-            return False, "; ".join(warnings)
+            _check_central_directory(zip_file, max_entries, max_ratio, max_uncompressed)
 
         return True, None
 
+    except EPUBArchiveError as e:
+        if e.security:
+            return False, f"Security check failed: {e}"
+        return False, str(e)
+    except zipfile.BadZipFile:
+        return False, "File is not a valid EPUB archive (not a ZIP file)"
     except Exception as e:
-        return False, f"Error checking EPUB safety: {str(e)}"
+        return False, f"Error validating EPUB structure: {str(e)}"
 
 
 def validate_epub_file_complete(file_path):
@@ -154,17 +253,7 @@ def validate_epub_file_complete(file_path):
     Returns:
         Tuple of (is_valid, error_message)
     """
-    # First check structure
-    is_valid_structure, structure_error = validate_epub_structure(file_path)
-    if not is_valid_structure:
-        return False, structure_error
-
-    # Then check safety
-    is_safe, safety_warning = validate_epub_content_safety(file_path)
-    if not is_safe:
-        return False, f"Security check failed: {safety_warning}"
-
-    return True, None
+    return validate_epub_archive(file_path)
 
 
 def validate_file_is_not_empty(value):
@@ -22,10 +22,16 @@ from .books import (
     book_list,
     create_book,
     delete_book,
+    find_in_book_text,
     get_book,
     get_book_chapter,
     get_book_chapters_list,
+    get_book_ingest_status,
+    get_book_resource,
+    get_book_text_window,
+    probe_epub_upload,
     public_book_list,
+    search_books,
     search_books_by_hashtag,
     update_book,
 )
@@ -141,9 +147,15 @@ __all__ = [
     "get_book",
     "get_book_chapter",
     "get_book_chapters_list",
+    "get_book_ingest_status",
+    "probe_epub_upload",
+    "get_book_resource",
+    "get_book_text_window",
+    "find_in_book_text",
     "create_book",
     "update_book",
     "delete_book",
+    "search_books",
     "search_books_by_hashtag",
     # Groups
     "get_reading_group",
@@ -5,92 +5,68 @@ Handles book CRUD operations, EPUB file processing, and chapter retrieval.
 """
 
 import logging
-import os
-import tempfile
-from typing import Tuple, Optional, Dict, Any
+from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils.cache import patch_vary_headers
 from django.utils import timezone
-from django.db import models
-from django.db.models import Avg
+from django.db import models, transaction
+from django.db.models import Avg, Count, Max, Q
 from rest_framework import status
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, permission_classes, renderer_classes
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 
-from ..models import Book, Hashtag, UserToReadingGroupState
+from ..models import Book, BookChapter, EpubIngestJob, Hashtag, UserToReadingGroupState
 from ..serializers import BookSerializer, BookSerializerInfo
-from ..validators import validate_epub_file_complete
-from ..epub_handler import EPUBHandler, parse_epub_file
-from .utils import local_epub_path, AnyListPagination
+from ..chapter_bodies import (
+    CHAPTER_FORMATS,
+    build_chapter_payload,
+    chapter_variant,
+    choose_encoding,
+    compress_body,
+    get_stored_body,
+    store_body,
+)
+from ..covers import delete_image_variants
+from ..duplicates import find_possible_duplicates
+from ..epub_cache import get_epub_handler
+from ..ingestion import enqueue_epub_ingest, probe_uploaded_epub, release_epub_file
+from ..search import (
+    build_search_query,
+    find_in_book,
+    is_search_supported,
+    phrase_pattern,
+    rank_books,
+    search_chapters,
+)
+from ..text_paging import (
+    DEFAULT_WINDOW_LENGTH,
+    MAX_WINDOW_LENGTH,
+    get_text_index,
+    plan_window,
+    read_text_window,
+)
+from .utils import (
+    AnyListPagination,
+    AnyMediaTypeRenderer,
+    add_book_cache_headers,
+    book_content_etag,
+    chapter_content_etag,
+    conditional_book_response,
+    parse_byte_range,
+)
+
+# Chunk size used to stream EPUB resources out of the archive
+RESOURCE_CHUNK_SIZE = 64 * 1024
+
+# EPUB resources may be SVG or other active content: never let them run script
+RESOURCE_CONTENT_SECURITY_POLICY = "default-src 'none'; img-src 'self'; style-src 'unsafe-inline'; sandbox"
 
 logger = logging.getLogger(__name__)
 
 
-def process_and_validate_epub(epub_source) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
-    """
-    Validates and parses an EPUB file from various sources.
-    
-    Args:
-        epub_source: Either:
-            - A file path (str) - for already saved files
-            - A FileField - Django model field with save() method
-            - An UploadedFile - from request.FILES
-            
-    Returns:
-        Tuple of (epub_data dict, error_message str):
-            - On success: ({"table_of_contents": [...], "full_text": "..."}, None)
-            - On failure: (None, "Error description")
-    """
-    temp_path = None
-    should_cleanup = False
-    
-    try:
-        # Determine the file path based on source type
-        if isinstance(epub_source, str):
-            # Already a file path
-            file_path = epub_source
-        elif hasattr(epub_source, 'path'):
-            # Django FileField with path attribute
-            file_path = epub_source.path
-        else:
-            # UploadedFile from request.FILES - create temp file
-            temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".epub")
-            temp_path = temp_file.name
-            should_cleanup = True
-            
-            for chunk in epub_source.chunks():
-                temp_file.write(chunk)
-            temp_file.close()
-            
-            # Reset file pointer for potential reuse
-            epub_source.seek(0)
-            
-            file_path = temp_path
-        
-        # Validate EPUB structure and safety
-        is_valid, error_message = validate_epub_file_complete(file_path)
-        
-        if not is_valid:
-            return None, f"Invalid EPUB file: {error_message}"
-        
-        # Parse EPUB file to extract metadata and content
-        epub_data = parse_epub_file(file_path)
-        
-        return epub_data, None
-        
-    except Exception as e:
-        logger.error(f"Error processing EPUB file: {e}")
-        return None, f"Failed to process EPUB file: {str(e)}"
-        
-    finally:
-        # Clean up temporary file if created
-        if should_cleanup and temp_path:
-            try:
-                os.remove(temp_path)
-            except OSError as e:
-                logger.warning(f"Failed to remove temp EPUB file {temp_path}: {e}")
-
-
 @api_view(["GET"])
 def book_list(request, amount=None):
     user = request.user if request.user.is_authenticated else None
@@ -105,18 +81,7 @@ def book_list(request, amount=None):
             status=status.HTTP_400_BAD_REQUEST,
         )
 
-    if user:
-        user_group_ids = UserToReadingGroupState.objects.filter(
-            user=user, in_reading_group=True
-        ).values_list("reading_group_id", flat=True)
-
-        books = Book.objects.filter(
-            models.Q(visibility="public")
-            | models.Q(visibility="personal", author=user)
-            | models.Q(visibility="group", reading_group_id__in=user_group_ids)
-        ).select_related('author', 'reading_group').annotate(average_rating=Avg("bookreview__stars_amount"))
-    else:
-        books = Book.objects.filter(visibility="public").select_related('author', 'reading_group').annotate(average_rating=Avg("bookreview__stars_amount"))
+    books = filter_visible_books(Book.objects.all(), user).select_related('author', 'reading_group').annotate(average_rating=Avg("bookreview__stars_amount"))
     paginator = AnyListPagination(amount=amount)
     paginated_books = paginator.paginate_queryset(books, request)
     serializer = BookSerializerInfo(paginated_books, many=True)
@@ -134,33 +99,138 @@ def public_book_list(request, amount):
     return paginator.get_paginated_response(serializer.data)
 
 
-@api_view(["GET"])
-def get_book(request, slug):
-    book = get_object_or_404(Book, slug=slug)
+def filter_visible_books(books, user):
+    """
+    Restrict a Book queryset to the books a user may see in listings.
 
-    if book.visibility == "personal":
-        if not request.user.is_authenticated or book.author != request.user:
-            return Response(
-                {"error": "You do not have access to this book"},
-                status=status.HTTP_403_FORBIDDEN,
-            )
+    Args:
+        books: Book queryset
+        user: Authenticated user, or None for anonymous requests
+
+    Returns:
+        Queryset of public books, the user's personal books and books of
+        the reading groups the user belongs to
+    """
+    if not user:
+        return books.filter(visibility="public")
+
+    user_group_ids = UserToReadingGroupState.objects.filter(
+        user=user, in_reading_group=True
+    ).values_list("reading_group_id", flat=True)
+
+    return books.filter(
+        models.Q(visibility="public")
+        | models.Q(visibility="personal", author=user)
+        | models.Q(visibility="group", reading_group_id__in=user_group_ids)
+    )
+
+
+def possible_duplicates_data(book, user):
+    """
+    List the books visible to a user whose text is probably a near copy of
+    a book's text, for the upload-time duplicate warning.
+
+    Args:
+        book: Book that was just created or re-uploaded
+        user: Uploading user
+
+    Returns:
+        List of {"id", "slug", "title", "book_author", "similarity"} dicts,
+        empty while the book is still being processed
+    """
+    if book.ingest_status != "ready":
+        return []
+
+    visible = filter_visible_books(Book.objects.all(), user)
+    return [
+        {
+            "id": other.id,
+            "slug": other.slug,
+            "title": other.title,
+            "book_author": other.book_author,
+            "similarity": round(similarity, 2),
+        }
+        for other, similarity in find_possible_duplicates(book, visible)
+    ]
+
+
+def can_view_book(user, book):
+    """
+    Check whether a user may read a book, according to its visibility.
+
+    Args:
+        user: Request user (may be anonymous)
+        book: Book instance
+
+    Returns:
+        True if the book is public, or the user is its author or a member
+        of its reading group
+    """
+    if book.visibility == "public":
+        return True
+
+    if not user.is_authenticated:
+        return False
+
+    if book.author_id == user.id:
+        return True
 
     if book.visibility == "group":
-        if not request.user.is_authenticated:
-            return Response(
-                {"error": "You do not have access to this book"},
-                status=status.HTTP_403_FORBIDDEN,
-            )
-        is_member = UserToReadingGroupState.objects.filter(
-            user=request.user,
-            reading_group=book.reading_group,
+        return UserToReadingGroupState.objects.filter(
+            user=user,
+            reading_group=book.reading_group_id,
             in_reading_group=True,
         ).exists()
-        if not is_member and book.author != request.user:
-            return Response(
-                {"error": "You do not have access to this book"},
-                status=status.HTTP_403_FORBIDDEN,
-            )
+
+    return False
+
+
+def ingest_pending_response(book):
+    """409 response for EPUB data requested before the book's file is ingested."""
+    return Response(
+        {"error": "EPUB file is still being processed", "ingest_status": book.ingest_status},
+        status=status.HTTP_409_CONFLICT,
+    )
+
+
+def ingested_epub_file(book):
+    """
+    Get the stored EPUB file of a book that has passed ingestion.
+
+    While a replacement upload is processed the previous file keeps being
+    served; a file that has not been validated yet is never opened.
+
+    Args:
+        book: EPUB Book instance
+
+    Returns:
+        FieldFile of the validated EPUB file, or None
+    """
+    if book.ingest_status == "ready":
+        return book.epub_file
+
+    replaced_name = (
+        EpubIngestJob.objects.filter(book=book, status__in=["queued", "running"])
+        .exclude(replaced_epub_name="")
+        .order_by("-created_at")
+        .values_list("replaced_epub_name", flat=True)
+        .first()
+    )
+    if not replaced_name:
+        return None
+    return Book(epub_file=replaced_name).epub_file
+
+
+@api_view(["GET"])
+def get_book(request, slug):
+    book = get_object_or_404(Book, slug=slug)
+
+    if not can_view_book(request.user, book):
+        return Response(
+            {"error": "You do not have access to this book"},
+            status=status.HTTP_403_FORBIDDEN,
+        )
+
     if request.query_params.get("info_only", "false").lower() == "true":
             serializer = BookSerializerInfo(book)
     else:
@@ -169,13 +239,163 @@ def get_book(request, slug):
     return Response(serializer.data)
 
 
+@api_view(["GET"])
+def get_book_text_window(request, slug):
+    """
+    Get a page of a plain text book.
+
+    Query params:
+        offset: Character offset of the page (snapped back to a sentence start)
+        length: Approximate page length in characters (default 5000, max 50000)
+
+    The page ends on a paragraph or sentence boundary; next_offset and
+    prev_offset give the offsets of the neighbouring pages (null at the ends).
+    """
+    book = get_object_or_404(Book.objects.defer("content", "table_of_contents"), slug=slug)
+
+    if not can_view_book(request.user, book):
+        return Response(
+            {"error": "You do not have access to this book"},
+            status=status.HTTP_403_FORBIDDEN,
+        )
+
+    if book.content_type != "plaintext":
+        return Response(
+            {"error": "This book is not in plain text format"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    try:
+        offset = int(request.query_params.get("offset", 0))
+        length = int(request.query_params.get("length", DEFAULT_WINDOW_LENGTH))
+    except (TypeError, ValueError):
+        return Response(
+            {"error": "offset and length must be integers"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    if offset < 0 or length <= 0:
+        return Response(
+            {"error": "offset must be >= 0 and length > 0"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    length = min(length, MAX_WINDOW_LENGTH)
+
+    etag = book_content_etag(book, "text", offset, length)
+    not_modified = conditional_book_response(request, book, etag)
+    if not_modified is not None:
+        return not_modified
+
+    index = get_text_index(book)
+    window = plan_window(index, offset, length)
+
+    response = Response(
+        {
+            "book_slug": book.slug,
+            "offset": window["start"],
+            "end_offset": window["end"],
+            "next_offset": window["next_offset"],
+            "prev_offset": window["prev_offset"],
+            "content_length": index.content_length,
+            "text": read_text_window(book, window["start"], window["end"]),
+        }
+    )
+    return add_book_cache_headers(response, book, etag)
+
+
+@api_view(["GET"])
+def find_in_book_text(request, slug):
+    """
+    Find a phrase inside a book.
+
+    Query params:
+        q: Phrase to look for (case-insensitive, any whitespace between words)
+        page: Page of hits (default 1)
+        amount: Hits per page (default 20, max 100)
+
+    Each hit gives the chapter id (null for plain text books), start/end
+    offsets into the chapter text, the offset in the whole book and
+    before/match/after snippet parts. At most FIND_MAX_HITS hits are
+    collected; `truncated` tells whether more exist.
+    """
+    pattern = phrase_pattern(request.query_params.get("q", ""))
+    if pattern is None:
+        return Response(
+            {"error": "Parameter 'q' is required"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    try:
+        amount = int(request.query_params.get("amount", 20))
+    except (TypeError, ValueError):
+        return Response(
+            {"error": "Invalid amount"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    # Plain text content is loaded on access; EPUB hits come from stored chapters
+    book = get_object_or_404(
+        Book.objects.defer("content", "table_of_contents", "search_vector"), slug=slug
+    )
+
+    if not can_view_book(request.user, book):
+        return Response(
+            {"error": "You do not have access to this book"},
+            status=status.HTTP_403_FORBIDDEN,
+        )
+
+    paginator = AnyListPagination(amount=amount)
+    # Each page of hits is a different response
+    etag = book_content_etag(
+        book,
+        "find",
+        pattern.pattern,
+        request.query_params.get(paginator.page_query_param, "1"),
+        paginator.page_size,
+    )
+    not_modified = conditional_book_response(request, book, etag)
+    if not_modified is not None:
+        return not_modified
+
+    hits, truncated = find_in_book(book, pattern)
+
+    paginated_hits = paginator.paginate_queryset(hits, request)
+    response = paginator.get_paginated_response(paginated_hits)
+    response.data["truncated"] = truncated
+    return add_book_cache_headers(response, book, etag)
+
+
+def _compressed_chapter_response(body, encoding, book, etag):
+    """Wrap a pre-compressed JSON chapter body in a response."""
+    response = HttpResponse(body, content_type="application/json")
+    response["Content-Encoding"] = encoding
+    response["Content-Length"] = str(len(body))
+    patch_vary_headers(response, ["Accept-Encoding"])
+    return add_book_cache_headers(response, book, etag)
+
+
 @api_view(["GET"])
 def get_book_chapter(request, slug, chapter_id):
     """
     Get a specific chapter from an EPUB book.
+
+    Query params:
+        repr: "both" (default), "html" or "text" - which representation to return
+        segment: with repr=html|text, return only this part of the chapter
+            (about CHAPTER_SEGMENT_SIZE characters each)
+
+    Compressed responses are stored per chapter variant and reused. Stored
+    chapters get an ETag derived from their content hash, so unchanged
+    chapters stay cached when the book's EPUB file is replaced.
     """
     try:
-        book = Book.objects.get(slug=slug)
+        book = Book.objects.defer("content", "table_of_contents").get(slug=slug)
+
+        if not can_view_book(request.user, book):
+            return Response(
+                {"error": "You do not have access to this book"},
+                status=status.HTTP_403_FORBIDDEN,
+            )
 
         # Check if book is EPUB format
         if book.content_type != "epub":
@@ -189,30 +409,111 @@ def get_book_chapter(request, slug, chapter_id):
                 {"error": "EPUB file not found"}, status=status.HTTP_404_NOT_FOUND
             )
 
-        # Parse EPUB and get chapter
-        with local_epub_path(book.epub_file) as epub_path:
-            if not epub_path:
+        chapter_format = request.query_params.get("repr", "both")
+        if chapter_format not in CHAPTER_FORMATS:
+            return Response(
+                {"error": f"repr must be one of: {', '.join(CHAPTER_FORMATS)}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        segment = request.query_params.get("segment")
+        if segment is not None:
+            if not segment.isdigit():
+                return Response(
+                    {"error": "segment must be a non-negative integer"},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            if chapter_format == "both":
+                return Response(
+                    {"error": "segment requires repr=html or repr=text"},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            segment = int(segment)
+
+        chapter_id = int(chapter_id)
+        encoding = choose_encoding(request.headers.get("Accept-Encoding"))
+        variant = chapter_variant(chapter_format, segment)
+
+        # Chapter count and the requested chapter's hash in one query
+        stored_chapters = BookChapter.objects.filter(book=book)
+        stored = stored_chapters.aggregate(
+            total=Count("id"),
+            content_hash=Max("content_hash", filter=Q(index=chapter_id)),
+            file_name=Max("file_name", filter=Q(index=chapter_id)),
+        )
+        total_chapters = stored["total"]
+
+        if stored["content_hash"]:
+            # Stays valid across re-uploads that leave this chapter unchanged
+            etag = chapter_content_etag(
+                book,
+                stored["content_hash"],
+                chapter_id,
+                stored["file_name"],
+                total_chapters,
+                variant,
+                encoding or "identity",
+            )
+        else:
+            etag = book_content_etag(book, "chapter", chapter_id, variant, encoding or "identity")
+
+        not_modified = conditional_book_response(request, book, etag)
+        if not_modified is not None:
+            patch_vary_headers(not_modified, ["Accept-Encoding"])
+            return not_modified
+
+        if encoding:
+            body = get_stored_body(book, chapter_id, variant, encoding, etag)
+            if body is not None:
+                return _compressed_chapter_response(body, encoding, book, etag)
+
+        chapter_row = None
+
+        if total_chapters:
+            # Chapters were extracted at ingest: single indexed row fetch
+            chapter_row = stored_chapters.filter(index=chapter_id).first()
+            chapter = chapter_row.to_dict() if chapter_row else None
+        else:
+            # Fallback for books ingested before chapters were stored; an
+            # upload still being processed is not opened before validation
+            if book.ingest_status != "ready":
+                return ingest_pending_response(book)
+            handler = get_epub_handler(book.epub_file, lazy=True)
+            if handler is None:
                 return Response(
                     {"error": "EPUB file not found"},
                     status=status.HTTP_404_NOT_FOUND,
                 )
-            handler = EPUBHandler(epub_path)
-            chapter = handler.get_chapter_by_id(int(chapter_id))
-            total_chapters = len(handler.get_chapters())
+            chapter = handler.get_chapter_by_id(chapter_id)
+            total_chapters = handler.get_chapter_count()
 
         if not chapter:
             return Response(
                 {"error": "Chapter not found"}, status=status.HTTP_404_NOT_FOUND
             )
 
-        return Response(
-            {
-                "book_title": book.title,
-                "book_slug": book.slug,
-                "chapter": chapter,
-                "total_chapters": total_chapters,
-            }
-        )
+        try:
+            chapter = build_chapter_payload(chapter, chapter_format, segment)
+        except IndexError:
+            return Response(
+                {"error": "Segment not found"}, status=status.HTTP_404_NOT_FOUND
+            )
+
+        payload = {
+            "book_title": book.title,
+            "book_slug": book.slug,
+            "chapter": chapter,
+            "total_chapters": total_chapters,
+        }
+
+        if encoding and chapter_row is not None:
+            body = compress_body(JSONRenderer().render(payload), encoding)
+            store_body(chapter_row, variant, encoding, etag, body)
+            return _compressed_chapter_response(body, encoding, book, etag)
+
+        response = Response(payload)
+        patch_vary_headers(response, ["Accept-Encoding"])
+        return add_book_cache_headers(response, book, etag)
 
     except Book.DoesNotExist:
         return Response({"error": "Book not found"}, status=status.HTTP_404_NOT_FOUND)
@@ -225,9 +526,19 @@ def get_book_chapter(request, slug, chapter_id):
 def get_book_chapters_list(request, slug):
     """
     Get list of all chapters with metadata (without full content).
+
+    Entries come from the stored table of contents; each one has the
+    `chapter_id` (spine index accepted by get_book_chapter) and `anchor`
+    its href resolves to.
     """
     try:
-        book = Book.objects.get(slug=slug)
+        book = Book.objects.defer("content").get(slug=slug)
+
+        if not can_view_book(request.user, book):
+            return Response(
+                {"error": "You do not have access to this book"},
+                status=status.HTTP_403_FORBIDDEN,
+            )
 
         if book.content_type != "epub":
             return Response(
@@ -240,39 +551,67 @@ def get_book_chapters_list(request, slug):
                 {"error": "EPUB file not found"}, status=status.HTTP_404_NOT_FOUND
             )
 
+        etag = book_content_etag(book, "chapters")
+        not_modified = conditional_book_response(request, book, etag)
+        if not_modified is not None:
+            return not_modified
+
         # Get chapters list from table of contents
         if book.table_of_contents:
-            return Response(
+            response = Response(
                 {
                     "book_title": book.title,
                     "book_slug": book.slug,
                     "chapters": book.table_of_contents,
                 }
             )
+            return add_book_cache_headers(response, book, etag)
 
-        # Fallback: parse EPUB to get chapters
-        with local_epub_path(book.epub_file) as epub_path:
-            if not epub_path:
+        # Fallback: use stored chapters, or parse EPUB for older books
+        chapters_metadata = [
+            {
+                "id": ch["index"],
+                "title": ch["title"],
+                "file_name": ch["file_name"],
+                "chapter_id": ch["index"],
+                "anchor": None,
+            }
+            for ch in BookChapter.objects.filter(book=book).values(
+                "index", "title", "file_name"
+            )
+        ]
+
+        if not chapters_metadata:
+            if book.ingest_status != "ready":
+                return ingest_pending_response(book)
+            handler = get_epub_handler(book.epub_file)
+            if handler is None:
                 return Response(
                     {"error": "EPUB file not found"},
                     status=status.HTTP_404_NOT_FOUND,
                 )
-            handler = EPUBHandler(epub_path)
             chapters = handler.get_chapters()
 
-        # Return only metadata, not full content
-        chapters_metadata = [
-            {"id": ch["id"], "title": ch["title"], "file_name": ch.get("file_name", "")}
-            for ch in chapters
-        ]
+            # Return only metadata, not full content
+            chapters_metadata = [
+                {
+                    "id": ch["id"],
+                    "title": ch["title"],
+                    "file_name": ch.get("file_name", ""),
+                    "chapter_id": ch["id"],
+                    "anchor": None,
+                }
+                for ch in chapters
+            ]
 
-        return Response(
+        response = Response(
             {
                 "book_title": book.title,
                 "book_slug": book.slug,
                 "chapters": chapters_metadata,
             }
         )
+        return add_book_cache_headers(response, book, etag)
 
     except Book.DoesNotExist:
         return Response({"error": "Book not found"}, status=status.HTTP_404_NOT_FOUND)
@@ -281,6 +620,98 @@ def get_book_chapters_list(request, slug):
         return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+def _stream_resource(resource_file, start, length):
+    """Yield `length` bytes of an archive entry starting at `start`, then close it."""
+    try:
+        if start:
+            resource_file.seek(start)
+        remaining = length
+        while remaining > 0:
+            chunk = resource_file.read(min(RESOURCE_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+    finally:
+        resource_file.close()
+
+
+@api_view(["GET"])
+@renderer_classes([JSONRenderer, AnyMediaTypeRenderer])
+def get_book_resource(request, slug, resource_path):
+    """
+    Stream a single EPUB item (image, stylesheet, font) out of the archive.
+
+    `resource_path` is the item path relative to the OPF document, so links in
+    chapter HTML resolve against the chapter's `file_name`. Supports
+    conditional requests and single byte ranges.
+    """
+    try:
+        book = Book.objects.defer("content", "table_of_contents").get(slug=slug)
+
+        if not can_view_book(request.user, book):
+            return Response(
+                {"error": "You do not have access to this book"},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+
+        if book.content_type != "epub" or not book.epub_file:
+            return Response(
+                {"error": "EPUB file not found"}, status=status.HTTP_404_NOT_FOUND
+            )
+
+        etag = book_content_etag(book, "resource", resource_path)
+        resource_max_age = getattr(settings, "BOOK_RESOURCE_CACHE_MAX_AGE", 86400)
+        not_modified = conditional_book_response(
+            request, book, etag, max_age=resource_max_age, s_maxage=resource_max_age
+        )
+        if not_modified is not None:
+            return not_modified
+
+        epub_file = ingested_epub_file(book)
+        if epub_file is None:
+            return ingest_pending_response(book)
+
+        handler = get_epub_handler(epub_file, lazy=True)
+        resource = handler.get_resource(resource_path) if handler else None
+        if resource is None:
+            return Response(
+                {"error": "Resource not found"}, status=status.HTTP_404_NOT_FOUND
+            )
+
+        size = resource["size"]
+        byte_range = parse_byte_range(request.headers.get("Range"), size)
+
+        if byte_range is False:
+            response = HttpResponse(status=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+            response["Content-Range"] = f"bytes */{size}"
+            return response
+
+        start, end = byte_range or (0, size - 1)
+        length = max(end - start + 1, 0)
+
+        response = StreamingHttpResponse(
+            _stream_resource(handler.open_resource(resource), start, length),
+            content_type=resource["media_type"],
+            status=status.HTTP_206_PARTIAL_CONTENT if byte_range else status.HTTP_200_OK,
+        )
+        response["Content-Length"] = str(length)
+        response["Accept-Ranges"] = "bytes"
+        response["Content-Security-Policy"] = RESOURCE_CONTENT_SECURITY_POLICY
+        if byte_range:
+            response["Content-Range"] = f"bytes {start}-{end}/{size}"
+
+        return add_book_cache_headers(
+            response, book, etag, max_age=resource_max_age, s_maxage=resource_max_age
+        )
+
+    except Book.DoesNotExist:
+        return Response({"error": "Book not found"}, status=status.HTTP_404_NOT_FOUND)
+    except Exception as e:
+        logger.error(f"Error getting EPUB resource: {e}")
+        return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
 def create_book(request):
@@ -308,51 +739,23 @@ def create_book(request):
         # Save the book first
         book = serializer.save(author=user)
 
-        # If EPUB file was uploaded, process it
+        # If EPUB file was uploaded, queue it for validation and parsing
         if book.content_type == "epub" and book.epub_file:
-            # Validate and parse EPUB file
-            with local_epub_path(book.epub_file) as epub_path:
-                if not epub_path:
-                    # Delete uploaded files from S3/MinIO before deleting the book record
-                    if book.epub_file:
-                        book.epub_file.delete(save=False)
-                    if book.featured_image:
-                        book.featured_image.delete(save=False)
-                    book.delete()
-                    return Response(
-                        {"error": "EPUB file not found"},
-                        status=status.HTTP_400_BAD_REQUEST,
-                    )
-                
-                epub_data, error_message = process_and_validate_epub(epub_path)
-            
-            if error_message:
+            job = enqueue_epub_ingest(book)
+
+            if job.status == "failed":
+                # Processed inline and rejected: drop the book like an invalid upload
                 logger.warning(
-                    f"Invalid EPUB file uploaded by user {user.username}: {error_message}"
+                    f"Invalid EPUB file uploaded by user {user.username}: {job.error}"
                 )
-                # Delete uploaded files from S3/MinIO before deleting the book record
-                if book.epub_file:
-                    book.epub_file.delete(save=False)
                 if book.featured_image:
+                    delete_image_variants(book.featured_image_variants, book.featured_image.storage)
                     book.featured_image.delete(save=False)
                 book.delete()
                 return Response(
-                    {"error": error_message},
+                    {"error": job.error},
                     status=status.HTTP_400_BAD_REQUEST,
                 )
-            
-            # Update book with parsed data
-            book.table_of_contents = epub_data.get("table_of_contents", [])
-            
-            # Extract full text to content field for search/preview
-            if not book.content:
-                book.content = epub_data.get("full_text", "")[:1000]
-            
-            book.save()
-            
-            logger.info(
-                f"Successfully processed EPUB file for book '{book.title}' (ID: {book.id})"
-            )
 
         # Handle hashtags
         hashtag_names = request.data.getlist("hashtags")
@@ -365,7 +768,9 @@ def create_book(request):
                     hashtag_objs.append(obj)
             book.hashtags.set(hashtag_objs)
 
-        return Response(BookSerializer(book).data)
+        data = BookSerializer(book).data
+        data["possible_duplicates"] = possible_duplicates_data(book, user)
+        return Response(data)
     logging.error(f"Book creation failed with errors: {serializer.errors} for user: {user.username}")
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -381,25 +786,6 @@ def update_book(request, pk):
             status=status.HTTP_403_FORBIDDEN,
         )
 
-    # If a new EPUB file was uploaded, validate and process it BEFORE saving
-    epub_data = None
-    if "epub_file" in request.FILES:
-        uploaded_epub = request.FILES["epub_file"]
-        
-        # Validate and parse the uploaded EPUB file
-        epub_data, error_message = process_and_validate_epub(uploaded_epub)
-        
-        if error_message:
-            logger.warning(
-                f"Invalid EPUB file uploaded for book {pk} by user {user.username}: {error_message}"
-            )
-            return Response(
-                {"error": error_message},
-                status=status.HTTP_400_BAD_REQUEST,
-            )
-        
-        logger.info(f"Successfully validated EPUB file for book update (ID: {pk})")
-
     serializer = BookSerializer(book, data=request.data, partial=True)
 
     if serializer.is_valid():
@@ -418,29 +804,36 @@ def update_book(request, pk):
             serializer.validated_data["reading_group"] = None
 
         # Save old files for deletion if they are being replaced
-        old_epub_file = book.epub_file if "epub_file" in request.FILES and book.epub_file else None
+        old_epub_name = book.epub_file.name if "epub_file" in request.FILES and book.epub_file else ""
         old_featured_image = book.featured_image if "featured_image" in request.FILES and book.featured_image else None
 
-        # Save the updated book
-        updated_book = serializer.save()
-
-        # If EPUB was processed, update book metadata
-        if epub_data:
-            updated_book.table_of_contents = epub_data.get("table_of_contents", [])
-            
-            # Update content preview if not set
-            if not updated_book.content:
-                updated_book.content = epub_data.get("full_text", "")[:1000]
-            
-            updated_book.save()
-            
-            logger.info(
-                f"Successfully updated EPUB metadata for book '{updated_book.title}' (ID: {updated_book.id})"
+        # Save the book and queue the new EPUB in one transaction, so that a
+        # file rejected by inline ingestion leaves the book as it was
+        job = None
+        previous_image_name = book.featured_image.name if book.featured_image else ""
+        with transaction.atomic():
+            updated_book = serializer.save()
+
+            # Queue the new EPUB; the old file is removed once it is processed
+            if "epub_file" in request.FILES and updated_book.epub_file:
+                job = enqueue_epub_ingest(updated_book, replaced_epub_name=old_epub_name)
+                if job.status == "failed":
+                    transaction.set_rollback(True)
+
+        if job is not None and job.status == "failed":
+            # The rolled back save may have stored a new image and its variants
+            if updated_book.featured_image and updated_book.featured_image.name != previous_image_name:
+                delete_image_variants(updated_book.featured_image_variants, updated_book.featured_image.storage)
+                updated_book.featured_image.delete(save=False)
+            logger.warning(
+                f"Invalid EPUB file uploaded for book {pk} by user {user.username}: {job.error}"
+            )
+            return Response(
+                {"error": job.error},
+                status=status.HTTP_400_BAD_REQUEST,
             )
 
         # Delete old files from S3/MinIO after successful update
-        if old_epub_file:
-            old_epub_file.delete(save=False)
         if old_featured_image:
             old_featured_image.delete(save=False)
 
@@ -457,11 +850,88 @@ def update_book(request, pk):
         elif "hashtags" in request.data:
             updated_book.hashtags.clear()
 
-        return Response(BookSerializer(updated_book).data)
+        data = BookSerializer(updated_book).data
+        if "epub_file" in request.FILES or "content" in serializer.validated_data:
+            data["possible_duplicates"] = possible_duplicates_data(updated_book, user)
+        return Response(data)
 
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def probe_epub_upload(request):
+    """
+    Read the metadata and table of contents of an EPUB file before upload.
+
+    Used by the book form to autofill title and author. Only the package
+    documents are read, nothing is stored.
+    """
+    epub_file = request.FILES.get("epub_file")
+    if not epub_file:
+        return Response(
+            {"error": "epub_file is required"}, status=status.HTTP_400_BAD_REQUEST
+        )
+
+    max_size = getattr(settings, "MAX_EPUB_FILE_SIZE", 50 * 1024 * 1024)
+    if epub_file.size > max_size:
+        return Response(
+            {"error": f"File size exceeds maximum allowed size of {max_size / (1024 * 1024)}MB"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    probe, error = probe_uploaded_epub(epub_file)
+    if error:
+        return Response({"error": error}, status=status.HTTP_400_BAD_REQUEST)
+
+    metadata = probe["metadata"]
+    return Response(
+        {
+            "title": "" if metadata["title"] == "Unknown" else metadata["title"],
+            "book_author": "" if metadata["author"] == "Unknown" else metadata["author"],
+            "description": metadata["description"],
+            "language": metadata["language"],
+            "chapter_count": len(probe["spine"]),
+            "table_of_contents": probe["table_of_contents"],
+        }
+    )
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def get_book_ingest_status(request, slug):
+    """
+    Get the EPUB processing status of a book and its latest ingestion job.
+    """
+    book = get_object_or_404(Book, slug=slug)
+    if book.author != request.user:
+        return Response(
+            {"error": "You are not the author of this book"},
+            status=status.HTTP_403_FORBIDDEN,
+        )
+
+    job = EpubIngestJob.objects.filter(book=book).order_by("-created_at").first()
+
+    return Response(
+        {
+            "book_slug": book.slug,
+            "ingest_status": book.ingest_status,
+            "job": {
+                "id": job.id,
+                "status": job.status,
+                "stage": job.stage,
+                "progress": job.progress,
+                "error": job.error,
+                "attempts": job.attempts,
+                "created_at": job.created_at,
+                "started_at": job.started_at,
+                "finished_at": job.finished_at,
+            } if job else None,
+            "possible_duplicates": possible_duplicates_data(book, request.user),
+        }
+    )
+
+
 @api_view(["DELETE"])
 @permission_classes([IsAuthenticated])
 def delete_book(request, pk):
@@ -473,11 +943,13 @@ def delete_book(request, pk):
             status=status.HTTP_403_FORBIDDEN,
         )
 
-    # Delete files from S3/MinIO before deleting the book
+    # Delete files from S3/MinIO before deleting the book; an EPUB file
+    # shared with other books is kept until the last of them is deleted
     if book.epub_file:
-        book.epub_file.delete(save=False)
+        release_epub_file(book.epub_file.storage, book.epub_file.name, book=book)
     if book.featured_image:
         book.featured_image.delete(save=False)
+    delete_image_variants(book.featured_image_variants, book.featured_image.storage)
 
     book.delete()
     return Response(
@@ -495,20 +967,7 @@ def search_books_by_hashtag(request):
         )
 
     user = request.user if request.user.is_authenticated else None
-    books = Book.objects.filter(hashtags__name=tag_name)
-
-    if user:
-        user_group_ids = UserToReadingGroupState.objects.filter(
-            user=user, in_reading_group=True
-        ).values_list("reading_group_id", flat=True)
-
-        books = books.filter(
-            models.Q(visibility="public")
-            | models.Q(visibility="personal", author=user)
-            | models.Q(visibility="group", reading_group_id__in=user_group_ids)
-        )
-    else:
-        books = books.filter(visibility="public")
+    books = filter_visible_books(Book.objects.filter(hashtags__name=tag_name), user)
 
     books = books.select_related("author", "reading_group").prefetch_related("hashtags").annotate(average_rating=Avg("bookreview__stars_amount")).distinct()
 
@@ -517,3 +976,56 @@ def search_books_by_hashtag(request):
     paginated_books = paginator.paginate_queryset(books, request)
     serializer = BookSerializerInfo(paginated_books, many=True)
     return paginator.get_paginated_response(serializer.data)
+
+
+@api_view(["GET"])
+def search_books(request):
+    """
+    Full-text search over book titles, authors, descriptions and texts.
+
+    Query params:
+        q: Search query (websearch syntax: "phrase", or, -word)
+        amount: Page size (default 20)
+
+    Books are ranked by relevance; each result lists its best matching
+    chapters (for EPUB books) under `matching_chapters`.
+    """
+    query = build_search_query(request.query_params.get("q", ""))
+    if query is None:
+        return Response(
+            {"error": "Parameter 'q' is required"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    if not is_search_supported():
+        return Response(
+            {"error": "Full-text search is not available on this database"},
+            status=status.HTTP_501_NOT_IMPLEMENTED,
+        )
+
+    try:
+        amount = int(request.query_params.get("amount", 20))
+    except (TypeError, ValueError):
+        return Response(
+            {"error": "Invalid amount"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    user = request.user if request.user.is_authenticated else None
+    books = (
+        rank_books(filter_visible_books(Book.objects.all(), user), query)
+        .defer("content", "table_of_contents", "search_vector")
+        .select_related("author", "reading_group")
+        .prefetch_related("hashtags")
+        .annotate(average_rating=Avg("bookreview__stars_amount"))
+    )
+
+    paginator = AnyListPagination(amount=amount)
+    paginated_books = paginator.paginate_queryset(books, request)
+    chapter_matches = search_chapters([book.id for book in paginated_books], query)
+
+    results = BookSerializerInfo(paginated_books, many=True).data
+    for book, data in zip(paginated_books, results):
+        data["rank"] = round(book.rank, 4)
+        data["matching_chapters"] = chapter_matches.get(book.id, [])
+    return paginator.get_paginated_response(results)
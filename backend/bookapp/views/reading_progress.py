@@ -15,6 +15,7 @@ from rest_framework.response import Response
 from urllib3 import request
 
 from ..models import Book, CustomUser, ReadingProgress
+from ..progress import compute_progress_percent
 from ..serializers import BookSerializerInfo, ReadingProgressSerializer
 from .utils import AnyListPagination
 
@@ -63,7 +64,8 @@ def update_reading_progress(request, slug):
     user = request.user
 
     try:
-        book = Book.objects.get(slug=slug)
+        # Progress math uses stored character counts, never the text itself
+        book = Book.objects.defer("content", "table_of_contents").get(slug=slug)
 
         progress, created = ReadingProgress.objects.get_or_create(user=user, book=book)
 
@@ -71,21 +73,19 @@ def update_reading_progress(request, slug):
             progress, data=request.data, partial=True
         )
         if serializer.is_valid():
+            data = serializer.validated_data
+
+            # TXT: character_offset / content_length.
+            # EPUB: chapter addressed by the CFI plus chapter_progress (0..1)
+            calculated_percent = compute_progress_percent(
+                book,
+                character_offset=data.get("character_offset", progress.character_offset),
+                cfi=data.get("current_cfi", progress.current_cfi),
+                chapter_progress=request.data.get("chapter_progress"),
+            )
 
-            saved_progress = serializer.save()
-
-            # Calculate progress_percent based on book content type
-            calculated_percent = None
-
-            if book.content_type == "plaintext" and book.content:
-                # For TXT books: calculate from character_offset / total_characters
-                total_chars = len(book.content)
-                if total_chars > 0 and saved_progress.character_offset >= 0:
-                    calculated_percent = (
-                        saved_progress.character_offset / total_chars
-                    ) * 100
-            elif book.content_type == "epub":
-                # For EPUB books: use progress_percent from request (sent by frontend)
+            if calculated_percent is None and book.content_type == "epub":
+                # Books without stored chapters: fall back to the client value
                 request_percent = request.data.get("progress_percent")
                 if request_percent is not None:
                     try:
@@ -95,19 +95,19 @@ def update_reading_progress(request, slug):
 
             logger.debug(f"Calculated progress percent for book slug '{slug}': {calculated_percent}")
 
-            # Update progress_percent if calculated
+            extra_fields = {}
             if calculated_percent is not None:
-                saved_progress.progress_percent = min(calculated_percent, 100)
+                extra_fields["progress_percent"] = min(calculated_percent, 100)
 
                 # Auto-complete if progress >= 95%
                 if (
-                    saved_progress.progress_percent >= 95
-                    and not saved_progress.is_completed
+                    extra_fields["progress_percent"] >= 95
+                    and not data.get("is_completed", progress.is_completed)
                 ):
-                    saved_progress.is_completed = True
-                    saved_progress.progress_percent = 100
+                    extra_fields["is_completed"] = True
+                    extra_fields["progress_percent"] = 100
 
-                saved_progress.save()
+            saved_progress = serializer.save(**extra_fields)
 
             return Response(ReadingProgressSerializer(saved_progress).data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -4,58 +4,15 @@ Shared utilities for views module.
 Contains helper functions and classes used across multiple view modules.
 """
 
-import os
-import tempfile
-from contextlib import contextmanager
+import hashlib
 
+from django.conf import settings
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.renderers import JSONRenderer
 
-
-@contextmanager
-def local_epub_path(epub_field_file):
-    """
-    Context manager for EPUB file path resolution.
-
-    Handles both local filesystem and remote storage (S3/MinIO) by creating
-    a temporary local copy when needed.
-
-    Args:
-        epub_field_file: Django FileField instance pointing to an EPUB file
-
-    Yields:
-        str: Path to the EPUB file (local or temporary)
-
-    Usage:
-        with local_epub_path(book.epub_file) as path:
-            # Use the path for EPUB processing
-            process_epub(path)
-    """
-    if not epub_field_file:
-        yield None
-        return
-
-    try:
-        yield epub_field_file.path
-        return
-    except Exception:
-        pass
-
-    temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".epub")
-    temp_path = temp_file.name
-    temp_file.close()
-
-    try:
-        with epub_field_file.open("rb") as source, open(temp_path, "wb") as dest:
-            for chunk in iter(lambda: source.read(8192), b""):
-                if not chunk:
-                    break
-                dest.write(chunk)
-        yield temp_path
-    finally:
-        try:
-            os.remove(temp_path)
-        except OSError:
-            pass
+from ..epub_storage import local_epub_path  # noqa: F401  (re-exported for views)
 
 
 class AnyListPagination(PageNumberPagination):
@@ -73,3 +30,149 @@ class AnyListPagination(PageNumberPagination):
         # Enforce maximum page size limit
         self.page_size = min(int(amount), self.max_page_size)
         super().__init__()
+
+
+class AnyMediaTypeRenderer(JSONRenderer):
+    """
+    Renderer accepting any media type.
+
+    Lets views that stream binary content answer clients sending e.g.
+    `Accept: image/png` instead of failing content negotiation with 406;
+    error payloads are still rendered as JSON.
+    """
+    media_type = "*/*"
+
+
+def book_content_etag(book, *parts) -> str:
+    """
+    Build a strong ETag for content derived from a book's EPUB file.
+
+    updated_at changes whenever the book (or its parsed data) is saved, so
+    no storage access is needed. EPUB files are stored by content hash and
+    may be shared by several books, so the book id is part of the key.
+
+    Args:
+        book: Book instance
+        *parts: Values identifying the resource, e.g. the endpoint and chapter id
+
+    Returns:
+        Quoted ETag value
+    """
+    key = ":".join(
+        [str(book.pk), book.epub_file.name or "", book.updated_at.isoformat()]
+        + [str(part) for part in parts]
+    )
+    return '"' + hashlib.sha256(key.encode("utf-8")).hexdigest()[:32] + '"'
+
+
+def chapter_content_etag(book, content_hash: str, *parts) -> str:
+    """
+    Build a strong ETag for a stored chapter from its content hash.
+
+    Unlike book_content_etag() it survives re-uploads of the book's EPUB
+    file as long as the chapter's source document did not change.
+
+    Args:
+        book: Book instance
+        content_hash: BookChapter.content_hash
+        *parts: Values identifying the response, e.g. the chapter id, file
+            name, chapter count and variant
+
+    Returns:
+        Quoted ETag value
+    """
+    key = ":".join([book.slug, book.title, content_hash] + [str(part) for part in parts])
+    return '"' + hashlib.sha256(key.encode("utf-8")).hexdigest()[:32] + '"'
+
+
+def conditional_book_response(request, book, etag, **cache_options):
+    """
+    Answer a conditional GET for book content without doing any work.
+
+    Args:
+        request: Incoming request
+        book: Book the content belongs to
+        etag: Value from book_content_etag()
+        **cache_options: max_age / s_maxage passed to add_book_cache_headers()
+
+    Returns:
+        304 response with cache headers if the client copy is current, else None
+    """
+    response = get_conditional_response(
+        request, etag=etag, last_modified=int(book.updated_at.timestamp())
+    )
+    if response is not None:
+        add_book_cache_headers(response, book, etag, **cache_options)
+    return response
+
+
+def add_book_cache_headers(response, book, etag, max_age=None, s_maxage=None):
+    """
+    Set validators and Cache-Control for book content responses.
+
+    Public books may be stored by shared caches (CDN, reverse proxy); other
+    books are private and always revalidated.
+
+    Args:
+        response: Response to update
+        book: Book the content belongs to
+        etag: Value from book_content_etag()
+        max_age: Browser cache lifetime, defaults to BOOK_CONTENT_CACHE_MAX_AGE
+        s_maxage: Shared cache lifetime, defaults to BOOK_CONTENT_CDN_MAX_AGE
+
+    Returns:
+        The same response
+    """
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(book.updated_at.timestamp())
+
+    if book.visibility == "public":
+        patch_cache_control(
+            response,
+            public=True,
+            max_age=max_age if max_age is not None else getattr(settings, "BOOK_CONTENT_CACHE_MAX_AGE", 300),
+            s_maxage=s_maxage if s_maxage is not None else getattr(settings, "BOOK_CONTENT_CDN_MAX_AGE", 3600),
+        )
+    else:
+        patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def parse_byte_range(range_header, size):
+    """
+    Parse a single-range HTTP Range header.
+
+    Multiple ranges and malformed headers are ignored (the full content is
+    sent), as allowed by RFC 9110.
+
+    Args:
+        range_header: Value of the Range header, may be empty
+        size: Size of the full content
+
+    Returns:
+        Tuple (start, end) with inclusive bounds, None to send the full
+        content, or False if the range cannot be satisfied
+    """
+    if not range_header or not range_header.startswith("bytes=") or "," in range_header:
+        return None
+
+    first, _, last = range_header[len("bytes="):].strip().partition("-")
+    try:
+        if first:
+            start = int(first)
+            end = int(last) if last else size - 1
+        else:
+            # Suffix range: the last N bytes
+            suffix = int(last)
+            if suffix == 0:
+                return False
+            start = max(size - suffix, 0)
+            end = size - 1
+    except ValueError:
+        return None
+
+    if start >= size:
+        return False
+    if start > end:
+        return None
+    return start, min(end, size - 1)
@@ -14,7 +14,7 @@ import {
 } from "@/components/ui/select";
 import InputError from "@/ui_components/InputError";
 import { useMutation, useQueryClient, useQuery } from "@tanstack/react-query";
-import { createBook, updateBook, getUserCreatedGroups, getBook } from "@/services";
+import { createBook, updateBook, getUserCreatedGroups, getBook, probeEpub } from "@/services";
 import { toast } from "react-toastify";
 import { useNavigate } from "react-router-dom";
 import SmallSpinner from "@/ui_components/SmallSpinner";
@@ -24,6 +24,17 @@ import { resolveMediaUrl } from "@/api";
 import Spinner from "@/ui_components/Spinner";
 import { useAuth } from "@/context/AuthContext";
 
+// Warns about catalog books whose text is nearly the same as the saved one
+const warnPossibleDuplicates = (savedBook) => {
+  const duplicates = savedBook?.possible_duplicates || [];
+  if (duplicates.length) {
+    toast.warning(
+      "Похожие книги уже есть в каталоге: " +
+        duplicates.map((duplicate) => `«${duplicate.title}»`).join(", ")
+    );
+  }
+};
+
 const CreateBookPage = ({ book }) => {
   const { isAuthenticated } = useAuth();
   // If book is passed (edit mode), load full book data with all fields including content
@@ -40,7 +51,7 @@ const CreateBookPage = ({ book }) => {
   // Use fullBook if available (edit mode), otherwise use passed book (which will be undefined for create mode)
   const bookData = fullBook || book;
 
-  const { register, handleSubmit, formState, setValue } = useForm({
+  const { register, handleSubmit, formState, setValue, getValues } = useForm({
     defaultValues: bookData || {},
   });
   const { errors } = formState;
@@ -93,9 +104,10 @@ const CreateBookPage = ({ book }) => {
 
   const updateMutation = useMutation({
     mutationFn: ({ data, id }) => updateBook(data, id),
-    onSuccess: () => {
+    onSuccess: (savedBook) => {
       navigate("/books");
       toast.success("Книга обновлена успешно!");
+      warnPossibleDuplicates(savedBook);
     },
 
     onError: (err) => {
@@ -105,8 +117,9 @@ const CreateBookPage = ({ book }) => {
 
   const mutation = useMutation({
     mutationFn: (data) => createBook(data),
-    onSuccess: () => {
+    onSuccess: (savedBook) => {
       toast.success("Книга создана успешно.");
+      warnPossibleDuplicates(savedBook);
       queryClient.invalidateQueries({ queryKey: ["books"] });
       navigate("/books");
     },
@@ -161,6 +174,17 @@ const CreateBookPage = ({ book }) => {
     const file = e.target.files?.[0];
     if (file) {
       setEpubFileName(file.name);
+
+      // Fill empty fields from the book's own metadata
+      probeEpub(file)
+        .then((metadata) => {
+          for (const field of ["title", "book_author", "description"]) {
+            if (metadata[field] && !getValues(field)) {
+              setValue(field, metadata[field]);
+            }
+          }
+        })
+        .catch((err) => toast.error(err.message));
     }
   };
 
@@ -2,6 +2,7 @@
 
 import Badge from '@/ui_components/Badge'
 import BookWriter from '@/ui_components/BookWriter'
+import BookCover from '@/ui_components/BookCover'
 import { useMutation, useQuery } from '@tanstack/react-query'
 import { useNavigate, useParams } from 'react-router-dom'
 import { createBookReview, deleteBook, getBook, getBookReviews, getReadingProgress } from '@/services'
@@ -158,10 +159,10 @@ const DetailPage = () => {
         <div className="flex flex-col md:flex-row gap-8 my-9">
           <div className="w-full md:w-[280px] flex-shrink-0">
             <div className="aspect-[2/3] overflow-hidden rounded-sm">
-              <img
+              <BookCover
+                book={book}
+                size="detail"
                 className="w-full h-full object-cover rounded-sm"
-                src={resolveMediaUrl(book.featured_image)}
-                alt={book.title}
               />
             </div>
           </div>
@@ -10,6 +10,7 @@ import CommentButton from '@/ui_components/CommentButton'
 import CommentForm from '@/ui_components/CommentForm'
 import CommentsSidebar from '@/ui_components/CommentsSidebar'
 import TableOfContents from '@/ui_components/TableOfContents'
+import BookSearchPanel from '@/ui_components/BookSearchPanel'
 
 import useBookComments from '@/hooks/useBookComments'
 import useEpubReader from '@/hooks/useEpubReader'
@@ -19,7 +20,7 @@ import { useTheme } from '@/context/ThemeContext'
 
 import { toast } from 'react-toastify'
 import { IoHomeOutline } from 'react-icons/io5'
-import { FiChevronLeft, FiChevronRight, FiList } from 'react-icons/fi'
+import { FiChevronLeft, FiChevronRight, FiList, FiSearch } from 'react-icons/fi'
 import { AiOutlinePlus, AiOutlineMinus } from 'react-icons/ai'
 import { BiMessageSquareDetail } from 'react-icons/bi'
 import { FiCheckCircle } from 'react-icons/fi'
@@ -28,6 +29,7 @@ import { HiMoon, HiSun } from 'react-icons/hi'
 const EpubReaderPage = () => {
   const { slug } = useParams()
   const [showCommentsSidebar, setShowCommentsSidebar] = useState(true)
+  const [showSearch, setShowSearch] = useState(false)
   const prevSidebarVisibilityRef = useRef(true)
   const queryClient = useQueryClient()
   const hasLoadedPosition = useRef(false)
@@ -109,6 +111,9 @@ const EpubReaderPage = () => {
     },
   })
 
+  // Position inside the current chapter (0..1), captured from relocated events
+  const chapterProgressRef = useRef(null)
+
   // Debounced progress update
   const progressUpdateTimerRef = useRef(null)
   const updateProgress = useCallback((newLocation) => {
@@ -123,6 +128,9 @@ const EpubReaderPage = () => {
     progressUpdateTimerRef.current = setTimeout(() => {
       // Only include progress_percent if locations are ready
       const data = { current_cfi: newLocation }
+      if (chapterProgressRef.current !== null) {
+        data.chapter_progress = chapterProgressRef.current
+      }
       if (locationsReadyRef.current) {
         data.progress_percent = currentPercentageRef.current
       }
@@ -234,6 +242,12 @@ const EpubReaderPage = () => {
         return
       }
       
+      // Position inside the current chapter, used by the server to compute progress
+      const displayed = location?.start?.displayed
+      if (displayed?.total) {
+        chapterProgressRef.current = (displayed.page - 1) / displayed.total
+      }
+
       // Get the most precise CFI available - prefer start.cfi which includes character offset
       const preciseCfi = location?.start?.cfi
       if (preciseCfi) {
@@ -421,6 +435,31 @@ const EpubReaderPage = () => {
     handleHighlightClick,
   )
 
+  // Jump to an in-book search hit: chapter ids are spine positions, and the
+  // hit's occurrence number selects the matching epub.js result in that chapter
+  const handleSearchHitClick = useCallback(
+    async (hit) => {
+      if (!rendition || hit.chapter_id === null) return
+
+      const epubBook = rendition.book
+      const section = epubBook.spine.get(hit.chapter_id)
+      if (!section) return
+
+      try {
+        await section.load(epubBook.load.bind(epubBook))
+        const matches = section.find(hit.match)
+        const target = matches[hit.chapter_hit] || matches[0]
+        await rendition.display(target ? target.cfi : section.href)
+      } catch (error) {
+        if (import.meta.env.DEV) {
+          console.error('Failed to open search hit:', error)
+        }
+        await rendition.display(section.href)
+      }
+    },
+    [rendition],
+  )
+
   // Log highlights state for debugging
   useEffect(() => {
     if (import.meta.env.DEV) {
@@ -571,6 +610,20 @@ const EpubReaderPage = () => {
               )}
             </button>
 
+            {/* In-book search toggle */}
+            <button
+              onClick={() => setShowSearch((prev) => !prev)}
+              className={`flex items-center gap-2 px-4 py-2 rounded-lg transition-colors ${
+                showSearch
+                  ? 'bg-[#4B6BFB] text-white hover:bg-[#3554D1]'
+                  : 'bg-[#F6F6F7] dark:bg-[#1F2136] text-[#3B3C4A] dark:text-[#BABABF] hover:bg-[#E8E8EA] dark:hover:bg-[#242535]'
+              }`}
+              title="Поиск по книге"
+            >
+              <FiSearch size={20} />
+              <span className="max-sm:hidden">Поиск</span>
+            </button>
+
             {/* TOC toggle */}
             <button
               onClick={toggleToc}
@@ -648,6 +701,14 @@ const EpubReaderPage = () => {
           isOpen={showToc}
         />
 
+        {/* In-book search sidebar */}
+        <BookSearchPanel
+          slug={slug}
+          onHitClick={handleSearchHitClick}
+          onClose={() => setShowSearch(false)}
+          isOpen={showSearch}
+        />
+
         {/* Navigation buttons */}
         <div className="absolute bottom-4 left-1/2 transform -translate-x-1/2 flex gap-4">
           <button
@@ -40,6 +40,26 @@ export async function searchBooksByHashtag(tag, page, amount) {
   }
 }
 
+export async function searchBooks(query, page, amount) {
+  try {
+    const response = await api.get(`books/search/?q=${encodeURIComponent(query)}&page=${page}&amount=${amount}`)
+    return response.data
+  } catch (err) {
+    throw new Error(err.message)
+  }
+}
+
+export async function findInBook(slug, query, page = 1, amount = 20) {
+  try {
+    const response = await api.get(`books/${slug}/find/`, {
+      params: { q: query, page, amount },
+    })
+    return response.data
+  } catch (err) {
+    throw new Error(err.message)
+  }
+}
+
 export async function getRecentReadingBooks(page, amount) {
   try {
     const response = await api.get(`books/reading/recent/${amount}/?page=${page}`)
@@ -58,9 +78,10 @@ export async function getBookPage(slug) {
   }
 }
 
-export async function getBookChapter(slug, chapterId) {
+// params: { format: 'html' | 'text' | 'both', segment: number }
+export async function getBookChapter(slug, chapterId, params = {}) {
   try {
-    const response = await api.get(`books/${slug}/chapters/${chapterId}/`)
+    const response = await api.get(`books/${slug}/chapters/${chapterId}/`, { params })
     return response.data
   } catch (err) {
     throw new Error(err.message)
@@ -76,6 +97,47 @@ export async function getBookChaptersList(slug) {
   }
 }
 
+// URL of an image, stylesheet or font inside a book's EPUB; `path` is relative
+// to the OPF document, i.e. resolved against the chapter's file_name
+export function getBookResourceUrl(slug, path) {
+  const encodedPath = path.split('/').map(encodeURIComponent).join('/')
+  return api.getUri({ url: `books/${slug}/resources/${encodedPath}` })
+}
+
+// Page of a plain text book: { offset, end_offset, next_offset, prev_offset, content_length, text }
+export async function getBookTextWindow(slug, offset = 0, length = 5000) {
+  try {
+    const response = await api.get(`books/${slug}/text/`, { params: { offset, length } })
+    return response.data
+  } catch (err) {
+    throw new Error(err.message)
+  }
+}
+
+export async function getBookIngestStatus(slug) {
+  try {
+    const response = await api.get(`books/${slug}/ingest_status/`)
+    return response.data
+  } catch (err) {
+    throw new Error(err.message)
+  }
+}
+
+// Metadata of an EPUB file before upload: { title, book_author, description, language, chapter_count, table_of_contents }
+export async function probeEpub(file) {
+  const formData = new FormData()
+  formData.append('epub_file', file)
+  try {
+    const response = await api.post('probe_epub/', formData)
+    return response.data
+  } catch (err) {
+    if (err.response) {
+      throw new Error(err.response?.data?.error || 'Failed to read EPUB file')
+    }
+    throw new Error(err.message)
+  }
+}
+
 export async function createBook(data) {
   try {
     const response = await api.post('create_book/', data)
@@ -30,11 +30,17 @@ export {
   getBooks,
   getPublicBooks,
   getBook,
+  searchBooks,
+  findInBook,
   searchBooksByHashtag,
   getRecentReadingBooks,
   getBookPage,
   getBookChapter,
   getBookChaptersList,
+  getBookIngestStatus,
+  getBookResourceUrl,
+  getBookTextWindow,
+  probeEpub,
   createBook,
   updateBook,
   deleteBook,
@@ -1,7 +1,7 @@
 import Badge from "./Badge";
 import CardFooter from "./CardFooter";
 import { Link } from "react-router-dom";
-import { resolveMediaUrl } from "@/api";
+import BookCover from "./BookCover";
 
 const BookCard = ({book, showVisibilityLabels = false}) => {
   const visibilityLabel =
@@ -15,8 +15,9 @@ const BookCard = ({book, showVisibilityLabels = false}) => {
     <div className="px-3 py-3 rounded-md w-[300px] h-auto flex flex-col gap-4 dark:border-gray-800 border shadow-lg">
       <Link to={`/books/${book.slug}`}>
       <div className="w-full h-[200px] border rounded-md overflow-hidden">
-        <img
-          src={resolveMediaUrl(book.featured_image)}
+        <BookCover
+          book={book}
+          size="card"
           className="w-full h-full object-cover rounded-lg"
         />
       </div>
@@ -0,0 +1,32 @@
+import { resolveMediaUrl } from "@/api";
+
+// Builds a 1x/2x srcset from the resized cover variants returned by the API
+const densitySrcSet = (variants, size, format) => {
+  const regular = variants?.[size]?.[format];
+  const retina = variants?.[`${size}_2x`]?.[format];
+  if (!regular) return undefined;
+  return retina
+    ? `${resolveMediaUrl(regular)} 1x, ${resolveMediaUrl(retina)} 2x`
+    : resolveMediaUrl(regular);
+};
+
+const BookCover = ({ book, size = "card", className, alt }) => {
+  const variants = book?.featured_image_variants;
+  const webpSrcSet = densitySrcSet(variants, size, "webp");
+  const jpegSrcSet = densitySrcSet(variants, size, "jpeg");
+
+  return (
+    <picture>
+      {webpSrcSet && <source type="image/webp" srcSet={webpSrcSet} />}
+      <img
+        src={resolveMediaUrl(variants?.[size]?.jpeg || book?.featured_image)}
+        srcSet={jpegSrcSet}
+        className={className}
+        alt={alt ?? book?.title}
+        loading="lazy"
+      />
+    </picture>
+  );
+};
+
+export default BookCover;
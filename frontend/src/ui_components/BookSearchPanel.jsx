@@ -0,0 +1,110 @@
+import { useState } from 'react';
+import { useQuery } from '@tanstack/react-query';
+import { IoCloseOutline } from 'react-icons/io5';
+import { findInBook } from '@/services';
+import SmallSpinner from '@/ui_components/SmallSpinner';
+
+const HITS_PER_PAGE = 20;
+
+const BookSearchPanel = ({ slug, onHitClick, onClose, isOpen }) => {
+  const [input, setInput] = useState('');
+  const [query, setQuery] = useState('');
+  const [page, setPage] = useState(1);
+
+  const { data, isFetching, isError } = useQuery({
+    queryKey: ['bookFind', slug, query, page],
+    queryFn: () => findInBook(slug, query, page, HITS_PER_PAGE),
+    enabled: isOpen && !!slug && query.length > 0,
+  });
+
+  if (!isOpen) return null;
+
+  const handleSubmit = (e) => {
+    e.preventDefault();
+    setQuery(input.trim());
+    setPage(1);
+  };
+
+  return (
+    <div
+      className="w-80 bg-white dark:bg-[#141624] border-l dark:border-gray-700 overflow-y-auto"
+      onWheel={(e) => e.stopPropagation()}
+    >
+      <div className="sticky top-0 bg-white dark:bg-[#141624] border-b dark:border-gray-700 px-4 py-3 z-10">
+        <div className="flex justify-between items-center mb-2">
+          <h2 className="text-lg font-semibold text-gray-800 dark:text-white">
+            Поиск по книге
+          </h2>
+          <button
+            onClick={onClose}
+            className="text-gray-500 hover:text-gray-700 dark:text-gray-400 dark:hover:text-gray-200"
+          >
+            <IoCloseOutline size={24} />
+          </button>
+        </div>
+        <form onSubmit={handleSubmit}>
+          <input
+            type="search"
+            value={input}
+            onChange={(e) => setInput(e.target.value)}
+            placeholder="Найти фразу..."
+            className="w-full px-3 py-2 rounded border border-[#E8E8EA] dark:border-[#242535] bg-white dark:bg-[#1F2136] text-sm text-gray-800 dark:text-gray-200"
+          />
+        </form>
+      </div>
+      <div className="p-4">
+        {isFetching ? (
+          <SmallSpinner />
+        ) : isError ? (
+          <p className="text-red-500 text-sm">Не удалось выполнить поиск</p>
+        ) : data ? (
+          <>
+            <p className="text-gray-500 dark:text-gray-400 text-xs mb-3">
+              Найдено: {data.count}
+              {data.truncated ? '+' : ''}
+            </p>
+            <ul className="space-y-2">
+              {data.results.map((hit) => (
+                <li key={`${hit.chapter_id}-${hit.start}`}>
+                  <button
+                    onClick={() => onHitClick(hit)}
+                    className="w-full text-left px-3 py-2 rounded hover:bg-gray-100 dark:hover:bg-gray-700 text-sm text-gray-700 dark:text-gray-300"
+                  >
+                    {hit.chapter_title && (
+                      <span className="block text-xs font-semibold text-[#4B6BFB] mb-1">
+                        {hit.chapter_title}
+                      </span>
+                    )}
+                    …{hit.before}
+                    <mark className="bg-yellow-200 dark:bg-yellow-600">{hit.match}</mark>
+                    {hit.after}…
+                  </button>
+                </li>
+              ))}
+            </ul>
+            {(data.previous || data.next) && (
+              <div className="flex justify-between mt-4 text-sm">
+                <button
+                  onClick={() => setPage((p) => p - 1)}
+                  disabled={!data.previous}
+                  className="text-[#4B6BFB] disabled:text-gray-400"
+                >
+                  Назад
+                </button>
+                <button
+                  onClick={() => setPage((p) => p + 1)}
+                  disabled={!data.next}
+                  className="text-[#4B6BFB] disabled:text-gray-400"
+                >
+                  Далее
+                </button>
+              </div>
+            )}
+          </>
+        ) : null}
+      </div>
+    </div>
+  );
+};
+
+export default BookSearchPanel;